@@ -1,5 +1,8 @@
 #define N_SERVOS 5 // We are not using the gripper
 #define N_NOTES_RELOAD 8
+#define MAX_WAYPOINTS 16 // Maximum length of a move sequence
+#define PROTOCOL_VERSION 1 // Version of the framed protocol, announced in the hello banner
+#define MAX_PAYLOAD (1 + MAX_WAYPOINTS * 2 * N_SERVOS) // Largest frame payload, a full move sequence
 
 #include <Arduino.h>
 #include <Servo.h>
@@ -44,6 +47,11 @@ const int steps_per_epoch = 6;
 const int pos_min[N_SERVOS] = {560, 750, 550, 550, 950};
 const int pos_max[N_SERVOS] = {2330, 2300, 2400, 2340, 2400};
 
+// Move sequence
+int waypoints[MAX_WAYPOINTS][N_SERVOS];
+byte n_waypoints = 0;     // Number of waypoints in the current sequence
+byte next_waypoint = 0;   // Index of the next waypoint to move to
+
 // Timings
 const long interval = 20;           // Servos operate on 50Hz -> delay of 20 ms
 unsigned long previousMillis = 0;   // Will store the previous time the servos were updated
@@ -56,6 +64,18 @@ bool launching = false;
 const unsigned char LAUNCH_FLAG = 1;
 const unsigned char MOVE_FLAG = 1 << 1;
 
+// Framed protocol
+// Every frame is SOF | seq | cmd | len | payload | crc, with a CRC-8 (polynomial 0x07) over
+// seq, cmd, len and the payload. Every frame from the host is answered with a frame with the same
+// sequence id. Notifications are sent with sequence id 0 once the host has sent a valid frame.
+const byte SOF = 0x7E;
+const byte NOTIFICATION_SEQ = 0;
+const byte NOTIFY = 'n';
+const byte NACK = '!';
+bool framed = false;              // Set once the host has sent a valid frame
+byte last_status = 0;             // Status after the last epoch, used for notifications
+byte frame_payload[MAX_PAYLOAD];
+
 
 bool time_to_update_servo() {
   unsigned long currentMillis = millis();
@@ -77,6 +97,7 @@ void update_servo_pos() {
 
   update_pose();
   update_launcher();
+  notify();
 }
 
 void update_launcher() {
@@ -176,56 +197,264 @@ void update_target_pose() {
   }
 }
 
-void read_target_pose() {
-  const int buffer_size = 2 * N_SERVOS;
-  byte buffer[buffer_size];
-
-  while ( Serial.available() < buffer_size ) continue;
+int clamp_pos(int pos, byte i) {
+  /*
+  Keep a target within the servo limits, otherwise the servo never reaches it
+  and Hubert would report that it is moving forever
+  */
+  if ( pos < pos_min[i] ) return pos_min[i];
+  if ( pos > pos_max[i] ) return pos_max[i];
+  return pos;
+}
 
-  // Read 10 bytes into the buffer
-  for (int i = 0; i < buffer_size; i++) {
+void read_bytes(byte *buffer, int n) {
+  for (int i = 0; i < n; i++) {
+    while ( Serial.available() < 1 ) continue;
     buffer[i] = Serial.read();
   }
+}
 
+void decode_pose(const byte *buffer, int pose[N_SERVOS]) {
   // Convert the 10 bytes into 5 integers in big endian format
-  for (int i = 0; i < N_SERVOS; i++) {
-    move_pos[i] = (buffer[i * 2] << 8) | buffer[i * 2 + 1];
+  for (byte i = 0; i < N_SERVOS; i++) {
+    pose[i] = clamp_pos((buffer[i * 2] << 8) | buffer[i * 2 + 1], i);
+  }
+}
+
+void encode_pose(byte *buffer) {
+  for (byte i = 0; i < N_SERVOS; i++) {
+    buffer[i * 2] = curr_pos[i] >> 8;
+    buffer[i * 2 + 1] = curr_pos[i] & 0xFF;
   }
+}
+
+void set_target_pose(const byte *buffer) {
+  decode_pose(buffer, move_pos);
+
+  // A single move cancels any ongoing sequence
+  n_waypoints = 0;
+  next_waypoint = 0;
 
   targetUpdate = true;
 }
 
-void write_curr_pose() {
-  for (int i = 0; i < N_SERVOS; i++) {
-    byte highByte = curr_pos[i] >> 8;
-    byte lowByte = curr_pos[i] & 0xFF;
-    Serial.write(highByte);
-    Serial.write(lowByte);
+void read_target_pose() {
+  byte buffer[2 * N_SERVOS];
+  read_bytes(buffer, 2 * N_SERVOS);
+  set_target_pose(buffer);
+}
+
+void read_sequence() {
+  /*
+  Read a sequence of waypoints. The first byte is the number of waypoints
+  followed by one pose per waypoint in the same format as a move
+  */
+  byte n;
+  read_bytes(&n, 1);
+
+  n_waypoints = 0;
+  next_waypoint = 0;
+  for ( byte w = 0; w < n; w++ ) {
+    byte buffer[2 * N_SERVOS];
+    read_bytes(buffer, 2 * N_SERVOS);
+    // Waypoints that do not fit in the queue are dropped
+    if ( n_waypoints < MAX_WAYPOINTS ) {
+      decode_pose(buffer, waypoints[n_waypoints]);
+      n_waypoints++;
+    }
   }
 }
 
-void send_status() {
+void set_sequence(const byte *buffer) {
+  /*
+  Set a sequence from a frame payload in the same format as read_sequence
+  */
+  n_waypoints = 0;
+  next_waypoint = 0;
+  for ( byte w = 0; w < buffer[0] && w < MAX_WAYPOINTS; w++ ) {
+    decode_pose(buffer + 1 + w * 2 * N_SERVOS, waypoints[w]);
+    n_waypoints++;
+  }
+}
+
+bool at_target() {
+  for ( byte i = 0; i < N_SERVOS; i++ ) {
+    if ( move_pos[i] != curr_pos[i] ) return false;
+  }
+  return true;
+}
+
+void advance_sequence() {
+  /*
+  Start moving towards the next waypoint once the previous one has been reached
+  */
+  if ( next_waypoint >= n_waypoints ) return;
+  if ( !at_target() ) return;
+
+  for ( byte i = 0; i < N_SERVOS; i++ ) move_pos[i] = waypoints[next_waypoint][i];
+  next_waypoint++;
+  targetUpdate = true;
+}
+
+void write_curr_pose() {
+  byte buffer[2 * N_SERVOS];
+  encode_pose(buffer);
+  Serial.write(buffer, 2 * N_SERVOS);
+}
+
+byte status_flag() {
   unsigned char status_flag = 0;
 
   if ( launching ) status_flag |= LAUNCH_FLAG;
 
-  bool moving = false;
-  for (int i = 0; i < N_SERVOS; i++) {
-    if ( move_pos[i] != curr_pos[i] ) moving = true;
-  }
+  // Hubert is moving until the last waypoint in a sequence has been reached
+  bool moving = !at_target() || next_waypoint < n_waypoints;
   if ( moving ) status_flag |= MOVE_FLAG;
 
-  Serial.write(status_flag);
+  return status_flag;
+}
+
+void send_status() {
+  Serial.write(status_flag());
+}
+
+void send_hello() {
+  /*
+  Announce the framed protocol. Hosts that do not know it never send a hello
+  */
+  Serial.write('H');
+  Serial.write('B');
+  Serial.write(PROTOCOL_VERSION);
+  Serial.write(N_SERVOS);
+}
+
+byte crc8(byte crc, byte data) {
+  crc ^= data;
+  for ( byte i = 0; i < 8; i++ ) {
+    if ( crc & 0x80 ) crc = (crc << 1) ^ 0x07;
+    else crc <<= 1;
+  }
+  return crc;
+}
+
+void write_frame(byte seq, byte cmd, const byte *payload, byte len) {
+  byte crc = 0;
+  crc = crc8(crc, seq);
+  crc = crc8(crc, cmd);
+  crc = crc8(crc, len);
+  for ( byte i = 0; i < len; i++ ) crc = crc8(crc, payload[i]);
+
+  Serial.write(SOF);
+  Serial.write(seq);
+  Serial.write(cmd);
+  Serial.write(len);
+  Serial.write(payload, len);
+  Serial.write(crc);
+}
+
+void notify() {
+  /*
+  Tell the host when a motion or a launch completes
+  */
+  byte status = status_flag();
+  if ( framed && (last_status & ~status) ) write_frame(NOTIFICATION_SEQ, NOTIFY, &status, 1);
+  last_status = status;
+}
+
+void read_frame() {
+  /*
+  Read and handle a frame, the start of frame byte has already been read
+  */
+  byte header[3];
+  read_bytes(header, 3);
+  byte seq = header[0];
+  byte cmd = header[1];
+  byte len = header[2];
+
+  byte crc = 0;
+  for ( byte i = 0; i < 3; i++ ) crc = crc8(crc, header[i]);
+
+  // Read the payload, anything that does not fit is read and dropped
+  for ( int i = 0; i < len; i++ ) {
+    byte b;
+    read_bytes(&b, 1);
+    crc = crc8(crc, b);
+    if ( i < MAX_PAYLOAD ) frame_payload[i] = b;
+  }
+  byte frame_crc;
+  read_bytes(&frame_crc, 1);
+
+  if ( crc != frame_crc || len > MAX_PAYLOAD ) {
+    write_frame(seq, NACK, NULL, 0);
+    return;
+  }
+  framed = true;
+
+  const byte pose_size = 2 * N_SERVOS;
+  byte reply[1 + 2 * N_SERVOS];
+
+  if ( cmd == 'm' && len == pose_size ) {
+    set_target_pose(frame_payload);
+    write_frame(seq, cmd, NULL, 0);
+  }
+  else if ( cmd == 'M' && len == pose_size ) {   // Move and reply with the status
+    set_target_pose(frame_payload);
+    reply[0] = status_flag();
+    write_frame(seq, cmd, reply, 1);
+  }
+  else if ( cmd == 'q' && len >= 1 && len == 1 + frame_payload[0] * pose_size ) {
+    set_sequence(frame_payload);
+    write_frame(seq, cmd, NULL, 0);
+  }
+  else if ( cmd == 'g' && len == 0 ) {
+    encode_pose(reply);
+    write_frame(seq, cmd, reply, pose_size);
+  }
+  else if ( cmd == 's' && len == 0 ) {
+    reply[0] = status_flag();
+    write_frame(seq, cmd, reply, 1);
+  }
+  else if ( cmd == 'S' && len == 0 ) {           // Status followed by the pose
+    reply[0] = status_flag();
+    encode_pose(reply + 1);
+    write_frame(seq, cmd, reply, 1 + pose_size);
+  }
+  else if ( cmd == 'l' && len == 0 ) {
+    start_launch_sequence();
+    write_frame(seq, cmd, NULL, 0);
+  }
+  else if ( cmd == 'r' && len == 0 ) {
+    // Acknowledge before the melody blocks the firmware
+    write_frame(seq, cmd, NULL, 0);
+    play_reload_melody();
+  }
+  else {
+    write_frame(seq, NACK, NULL, 0);
+  }
 }
 
 void readSerial() {
   if (Serial.available() > 0) {
     char command = Serial.read(); // Read the next character from the buffer
 
+    // Once the host speaks the framed protocol, a byte outside a frame is left over from a
+    // frame that lost a byte. Drop it instead of running it as a legacy command, hello is
+    // kept so that a host that reconnects can negotiate again
+    if ( framed && command != (char)SOF && command != 'h' ) return;
+
     switch (command) {
+      case SOF:                     // Frame: Read and handle a frame of the framed protocol
+        read_frame();
+        break;
+      case 'h':                     // Hello: Announce the framed protocol
+        send_hello();
+        break;
       case 'm':
         read_target_pose();         // Move: Read a new position from serial
         break;
+      case 'q':
+        read_sequence();            // Queue: Read a sequence of positions from serial
+        break;
       case 'g':                     // Get: Write current position to serial
         write_curr_pose();
         break;
@@ -293,6 +522,7 @@ void setup() {
 
 void loop() {
   readSerial();
+  advance_sequence();
   update_target_pose();
   update_servo_pos();
 }
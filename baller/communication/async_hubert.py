@@ -0,0 +1,290 @@
+import asyncio
+import serial
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Optional, Literal
+import numpy as np
+
+from baller.model.hubert import HubertModel
+from baller.communication.hubert import (
+    MAX_SEQUENCE_LENGTH,
+    Servo,
+    HubertCommand,
+    HubertStatus,
+    ServoBank,
+    decode_status,
+    encode_pulses,
+    decode_pulses,
+)
+from baller.communication.wait import PollSchedule, async_wait_until
+
+
+@dataclass
+class _Request:
+    cmd: HubertCommand
+    payload: bytes
+    reply_len: int
+    future: asyncio.Future = field(repr=False)
+
+
+def _fail(requests: list[_Request], error: BaseException):
+    for request in requests:
+        if not request.future.done():
+            request.future.set_exception(error)
+
+
+class AsyncHubert(HubertModel):
+    """
+    Coroutine based client for Hubert
+
+    All requests are put on a queue that is served by a single I/O task. The task writes every
+    queued request to the serial link in one go and then reads the fixed-length replies in the
+    same order, handing each reply to the coroutine that awaits it. Any number of tasks can
+    therefore share the link without taking a lock.
+    """
+
+    def __init__(
+            self,
+            port: str,
+            baudrate: int,
+            servos: list[Servo],
+            timeout: Optional[float] = None,
+            poll_schedule: PollSchedule = PollSchedule(),
+        ) -> None:
+        self.port = port
+        self.baudrate = baudrate
+        self.servos = servos
+        self.servo_bank = ServoBank(servos)
+        self.timeout = timeout
+        self.poll_schedule = poll_schedule
+
+        self.arduino: Optional[serial.Serial] = None
+
+        self.joint_angles = {f'j{i+1}': 0.0 for i in range(len(self.servos))}
+
+        # All blocking serial calls run on this single thread, which is shut down by close
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._queue: Optional[asyncio.Queue[_Request]] = None
+        self._io_task: Optional[asyncio.Task] = None
+
+    async def connect(self):
+        if self.arduino is not None:
+            raise RuntimeError("Hubert has already established a connection")
+
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="hubert-io")
+
+        loop = asyncio.get_running_loop()
+        self.arduino = await loop.run_in_executor(
+            self._executor,
+            lambda: serial.Serial(port=self.port, baudrate=self.baudrate, timeout=self.timeout),
+        )
+
+        # Wait for the serial connection to be ready
+        await asyncio.sleep(1.0)
+
+        # Clear all buffers
+        await loop.run_in_executor(self._executor, self.arduino.reset_input_buffer)
+        await loop.run_in_executor(self._executor, self.arduino.reset_output_buffer)
+
+        self._start_io()
+
+    async def close(self):
+        """
+        Stop the I/O task, close the serial connection and shut down the I/O thread
+
+        Requests that have not been answered yet fail with a ConnectionError, as do the ones
+        made after closing. Hubert can be connected again afterwards.
+        """
+        if self._io_task is not None:
+            self._io_task.cancel()
+            try:
+                await self._io_task
+            except asyncio.CancelledError:
+                pass
+            self._io_task = None
+
+        if self._queue is not None:
+            error = ConnectionError("Hubert was closed")
+            while not self._queue.empty():
+                request = self._queue.get_nowait()
+                if not request.future.done():
+                    request.future.set_exception(error)
+            self._queue = None
+
+        if self.arduino is not None:
+            self.arduino.close()
+            self.arduino = None
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    async def get_status(self) -> HubertStatus:
+        """
+        Return the status of Hubert
+        """
+        if self.arduino is None:
+            return HubertStatus.NOT_CONNECTED
+        bs = await self._request(HubertCommand.GET_STATUS, reply_len=1)
+        return decode_status(bs)
+
+    async def wait_unitl_idle(self, timeout: Optional[float] = None) -> float:
+        return await self.wait_for(HubertStatus.IDLE, timeout=timeout)
+
+    async def wait_for(self, status_flag: HubertStatus, timeout: Optional[float] = None, schedule: Optional[PollSchedule] = None) -> float:
+        """
+        Wait until Hubert reports status_flag
+        Return the time spent waiting in seconds
+        """
+        async def has_flag() -> bool:
+            return status_flag in await self.get_status()
+
+        return await async_wait_until(has_flag, schedule or self.poll_schedule, timeout=timeout)
+
+    async def set_pose(self, units: Literal['rad', 'deg'] = 'rad', **joints: float):
+        """
+        Send a new position to Hubert
+        """
+        await self._request(HubertCommand.SET_POSITION, *encode_pulses(self._update_joint_angles(units, joints)))
+
+    async def set_pose_sequence(self, poses: list[dict[str, float]], units: Literal['rad', 'deg'] = 'rad'):
+        """
+        Send a sequence of positions to Hubert in one message
+        """
+        if not 0 < len(poses) <= MAX_SEQUENCE_LENGTH:
+            raise ValueError(f"A sequence must have between 1 and {MAX_SEQUENCE_LENGTH} positions, got {len(poses)}")
+
+        joint_args = [len(poses).to_bytes(1, 'big')]
+        for joints in poses:
+            joint_args.extend(encode_pulses(self._update_joint_angles(units, joints)))
+
+        await self._request(HubertCommand.SET_SEQUENCE, *joint_args)
+
+    async def move_sequence(self, poses: list[dict[str, float]], units: Literal['rad', 'deg'] = 'rad', timeout: Optional[float] = None) -> float:
+        """
+        Move through a sequence of positions and wait until the last one is reached
+        Return the time spent waiting in seconds
+        """
+        wait_time = 0.0
+        for i in range(0, len(poses), MAX_SEQUENCE_LENGTH):
+            await self.set_pose_sequence(poses[i:i + MAX_SEQUENCE_LENGTH], units=units)
+            wait_time += await self.wait_unitl_idle(timeout=timeout)
+        return wait_time
+
+    async def get_pose(self, units: Literal['rad', 'deg'] = 'rad') -> dict[str, float]:
+        """
+        Get the current position of Hubert
+        """
+        bs = await self._request(HubertCommand.GET_POSITION, reply_len=2 * len(self.servos))
+
+        angles = self.servo_bank.pulses_to_angles(decode_pulses(bs, len(self.servos)), units=units)
+        return {f'j{i+1}': float(angle) for i, angle in enumerate(angles)}
+
+    async def launch(self) -> None:
+        """
+        Launch a projectile
+        """
+        await self._request(HubertCommand.LAUNCH)
+
+    async def play_reload_sound(self) -> None:
+        await self._request(HubertCommand.RELOAD)
+
+    def _update_joint_angles(self, units: Literal['rad', 'deg'], joints: dict[str, float]) -> list[int]:
+        """
+        Update the commanded joint angles and return the pulse lengths of the full pose
+        """
+        for j, v in joints.items():
+            if j not in self.joint_angles:
+                raise KeyError(f"The joint {j} is not a valid joint")
+            self.joint_angles[j] = v if units == 'rad' else np.deg2rad(v)
+
+        joint_angles = [self.joint_angles[f'j{i+1}'] for i in range(len(self.joint_angles))]
+
+        assert len(joint_angles) == len(self.servos)
+        return self.servo_bank.angles_to_pulses(joint_angles, units='rad').tolist()
+
+    async def _request(self, cmd: HubertCommand, *args: bytes, reply_len: int = 0) -> bytes:
+        """
+        Queue a command and wait for its reply
+        Commands without a reply resolve as soon as they have been written
+        """
+        if self._queue is None:
+            raise RuntimeError("Hubert is not connected")
+
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put(_Request(cmd, b''.join(args), reply_len, future))
+        return await future
+
+    def _start_io(self):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="hubert-io")
+        self._queue = asyncio.Queue()
+        self._io_task = asyncio.create_task(self._io_loop())
+
+    async def _io_loop(self):
+        """
+        Serve the request queue
+
+        Every request that is queued when the task wakes up is written in a single write.
+        The firmware answers in the order it receives commands, so the replies are read
+        back in the same order as the requests were written.
+        """
+        assert self._queue is not None
+        batch: list[_Request] = []
+        try:
+            while True:
+                batch = [await self._queue.get()]
+                await self._serve(batch)
+        except asyncio.CancelledError:
+            _fail(batch, ConnectionError("Hubert was closed"))
+            raise
+
+    async def _serve(self, batch: list[_Request]):
+        """
+        Write the batch and every request that is queued behind it, then read the replies
+        """
+        assert self._queue is not None
+        loop = asyncio.get_running_loop()
+
+        while not self._queue.empty():
+            batch.append(self._queue.get_nowait())
+
+        msg = bytearray()
+        for request in batch:
+            msg.append(request.cmd.value)
+            msg.extend(request.payload)
+
+        try:
+            await loop.run_in_executor(self._executor, self.arduino.write, bytes(msg))
+        except Exception as e:
+            _fail(batch, e)
+            return
+
+        awaiting = deque(batch)
+        while awaiting:
+            request = awaiting.popleft()
+            if request.reply_len == 0:
+                if not request.future.done():
+                    request.future.set_result(b'')
+                continue
+
+            try:
+                bs = await loop.run_in_executor(self._executor, self.arduino.read, request.reply_len)
+            except Exception as e:
+                # The link is broken, nothing that is in flight will be answered
+                _fail([request, *awaiting], e)
+                return
+            if len(bs) == request.reply_len:
+                if not request.future.done():
+                    request.future.set_result(bs)
+                continue
+
+            # A short read means the replies can no longer be matched to the requests
+            # Fail everything that is in flight and start over with an empty input buffer
+            _fail([request, *awaiting], TimeoutError(f"Expected {request.reply_len} bytes from Hubert for {request.cmd.name}, got {len(bs)}"))
+            awaiting.clear()
+            try:
+                await loop.run_in_executor(self._executor, self.arduino.reset_input_buffer)
+            except Exception:
+                pass
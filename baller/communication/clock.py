@@ -0,0 +1,65 @@
+import time
+from threading import Lock
+
+
+class Clock:
+    """
+    The wall clock
+
+    Everything that waits for Hubert takes its time from a clock, so that the host and the
+    firmware emulator can share a clock that runs faster than real time.
+    """
+
+    def monotonic(self) -> float:
+        """
+        Return the current time in seconds
+        """
+        return time.monotonic()
+
+    def sleep(self, seconds: float) -> None:
+        time.sleep(seconds)
+
+
+class ScaledClock(Clock):
+    """
+    A clock that runs speedup times faster than the wall clock
+    """
+
+    def __init__(self, speedup: float = 1.0) -> None:
+        assert speedup > 0, "The speedup must be positive"
+        self.speedup = speedup
+        self.start = time.monotonic()
+
+    def monotonic(self) -> float:
+        return (time.monotonic() - self.start) * self.speedup
+
+    def sleep(self, seconds: float) -> None:
+        time.sleep(seconds / self.speedup)
+
+
+class VirtualClock(Clock):
+    """
+    A clock that only moves when someone sleeps on it or advances it
+
+    Sleeping returns immediately, which makes runs against the emulator deterministic and
+    as fast as the host code allows.
+    """
+
+    def __init__(self, start: float = 0.0) -> None:
+        self.now = start
+        self.lock = Lock()
+
+    def monotonic(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float) -> None:
+        self.advance(seconds)
+
+    def advance(self, seconds: float) -> None:
+        if seconds <= 0:
+            return
+        with self.lock:
+            self.now += seconds
+
+
+SYSTEM_CLOCK = Clock()
@@ -0,0 +1,505 @@
+import os
+import math
+import time
+from threading import Lock, Thread, Event
+from typing import Optional
+import numpy as np
+
+from baller.communication.clock import Clock, VirtualClock, SYSTEM_CLOCK
+from baller.communication.protocol import (
+    PROTOCOL_VERSION, SOF, HEADER_SIZE, NOTIFICATION_SEQ, HELLO_MAGIC, Frame, crc8, encode_frame,
+)
+from baller.communication.firmware import (
+    N_SERVOS, MAX_WAYPOINTS, INIT_POS, POS_MIN, POS_MAX, STEPS_PER_EPOCH, INTERVAL,
+    LAUNCHER_MIN, LAUNCHER_MAX, LAUNCHER_STEPS_PER_EPOCH, LAUNCH_FLAG, MOVE_FLAG,
+    RELOAD_NOTES_DURATION, NOTIFY, NACK, reload_melody_duration,
+)
+
+
+def _arduino_round(x: float) -> int:
+    """
+    Round half away from zero like round() on the Arduino
+    """
+    return int(math.floor(x + 0.5)) if x >= 0 else int(math.ceil(x - 0.5))
+
+
+class HubertEmulator:
+    """
+    Software model of the firmware in arduino/hubert/hubert.ino
+
+    The emulator behaves like the serial port of the Arduino. Bytes written to it are handled
+    as commands and replies are returned by read. The firmware main loop is replayed every time
+    the emulator is accessed, up to the time given by clock, so motions progress in 20 ms epochs
+    exactly like on the board.
+    """
+
+    def __init__(self, clock: Clock = SYSTEM_CLOCK, baudrate: Optional[int] = None, timeout: Optional[float] = None, boot_time: float = 0.0) -> None:
+        """
+        Parameters:
+        - clock (Clock):        The clock that drives the firmware
+        - baudrate (int):       If given, every transferred byte takes the time of one serial frame
+                                (10 bits) on the clock. Otherwise the link is infinitely fast
+        - timeout (float):      Unused, accepted to match the signature of serial.Serial
+        - boot_time (float):    ms, bytes sent before this are lost like they are while the
+                                bootloader of a freshly reset Arduino runs
+        """
+        self.clock = clock
+        self.start = clock.monotonic()
+        self.byte_time = None if baudrate is None else 10 / baudrate
+        self.timeout = timeout
+        self.boot_time = boot_time
+
+        self.curr_pos = list(INIT_POS)
+        self.move_pos = list(INIT_POS)
+        self.curr_pos_float = [np.float32(p) for p in INIT_POS]
+        self.servo_vel = [np.float32(0.0)] * N_SERVOS
+        self.target_update = False
+
+        self.waypoints: list[list[int]] = []
+        self.next_waypoint = 0
+
+        self.launching = False
+        self.launcher_pos = LAUNCHER_MIN
+        self.launcher_target = LAUNCHER_MIN
+        self.launcher_vel = 0
+
+        self.previous_millis = 0.0      # Time of the last epoch
+        self.loop_time = 0.0            # Time of the next iteration of the main loop
+        self.busy_until = 0.0           # The main loop is blocked until this time
+        self.blocked = False            # True while a loop iteration is blocked by a command
+
+        self.framed = False             # Set once the host has sent a valid frame
+        self.last_status = 0            # Status after the last epoch, used for notifications
+
+        self.rx = bytearray()           # Bytes sent to the firmware
+        self.tx = bytearray()           # Bytes sent from the firmware
+
+        # Link statistics
+        self.n_writes = 0
+        self.n_reads = 0
+        self.bytes_received = 0
+        self.bytes_sent = 0
+
+        self.lock = Lock()
+
+    # Serial port interface
+
+    def write(self, data: bytes) -> int:
+        self._transfer(len(data))
+        self.n_writes += 1
+        self.bytes_received += len(data)
+        with self.lock:
+            if self.millis() < self.boot_time:
+                return len(data)
+            self._run()
+            # The main loop picks up new bytes right away
+            self.loop_time = min(self.loop_time, self.millis())
+            self.rx.extend(data)
+            self._run()
+        return len(data)
+
+    def read(self, size: int = 1) -> bytes:
+        with self.lock:
+            self._run()
+            bs = bytes(self.tx[:size])
+            del self.tx[:size]
+        self._transfer(len(bs))
+        self.n_reads += 1
+        self.bytes_sent += len(bs)
+        return bs
+
+    @property
+    def in_waiting(self) -> int:
+        with self.lock:
+            self._run()
+            return len(self.tx)
+
+    def reset_input_buffer(self):
+        with self.lock:
+            self.tx.clear()
+
+    def reset_output_buffer(self):
+        pass
+
+    def close(self):
+        pass
+
+    def millis(self) -> float:
+        """
+        The firmware time in milliseconds
+        """
+        return (self.clock.monotonic() - self.start) * 1000
+
+    def _transfer(self, n: int):
+        if self.byte_time is not None and n > 0:
+            self.clock.sleep(n * self.byte_time)
+
+    # Firmware
+
+    @property
+    def status_flag(self) -> int:
+        status_flag = 0
+        if self.launching:
+            status_flag |= LAUNCH_FLAG
+        if not self._at_target() or self.next_waypoint < len(self.waypoints):
+            status_flag |= MOVE_FLAG
+        return status_flag
+
+    def _run(self):
+        """
+        Replay the main loop up to the current time
+        """
+        now = self.millis()
+        while True:
+            t = max(self.loop_time, self.busy_until)
+            if t > now:
+                return
+            self.loop_time = t
+
+            if self.blocked:
+                # Finish the loop iteration that was blocked by a command
+                self.blocked = False
+            elif not self._read_serial():
+                # The firmware busy-waits for the rest of a command, nothing else happens
+                self.loop_time = now
+                return
+            elif self.busy_until > self.loop_time:
+                # The command blocks the rest of the loop iteration
+                self.blocked = True
+                continue
+
+            self._advance_sequence()
+            self._update_target_pose()
+            if self.loop_time - self.previous_millis > INTERVAL:
+                self.previous_millis = self.loop_time
+                self._update_pose()
+                self._update_launcher()
+                self._notify()
+
+            if not self.rx:
+                # Nothing to do until the next epoch
+                self.loop_time = self.previous_millis + INTERVAL + 1
+
+    def _read_serial(self) -> bool:
+        """
+        Handle the next command, return False if it has not been fully received
+        """
+        if not self.rx:
+            return True
+
+        if self.rx[0] == SOF:
+            return self._read_frame()
+        if self.framed and self.rx[0] != ord('h'):
+            # Left over from a frame that lost a byte, the firmware drops it until the next frame
+            del self.rx[:1]
+            return True
+
+        cmd = chr(self.rx[0])
+        pose_size = 2 * N_SERVOS
+        if cmd == 'm':
+            if len(self.rx) < 1 + pose_size:
+                return False
+            self._move(self.rx[1:1 + pose_size])
+            del self.rx[:1 + pose_size]
+        elif cmd == 'q':
+            if len(self.rx) < 2 or len(self.rx) < 2 + self.rx[1] * pose_size:
+                return False
+            n = self.rx[1]
+            self._queue(self.rx[1:2 + n*pose_size])
+            del self.rx[:2 + n*pose_size]
+        elif cmd == 'g':
+            self.tx.extend(self._pose_bytes())
+            del self.rx[:1]
+        elif cmd == 's':
+            self.tx.append(self.status_flag)
+            del self.rx[:1]
+        elif cmd == 'l':
+            self._start_launch_sequence()
+            del self.rx[:1]
+        elif cmd == 'r':
+            self._play_reload_melody()
+            del self.rx[:1]
+        elif cmd == 'h':
+            self.tx.extend(HELLO_MAGIC + bytes([PROTOCOL_VERSION, N_SERVOS]))
+            del self.rx[:1]
+        else:
+            # Unknown commands are ignored
+            del self.rx[:1]
+        return True
+
+    def _read_frame(self) -> bool:
+        """
+        Handle the next frame, return False if it has not been fully received
+        """
+        if len(self.rx) < 1 + HEADER_SIZE:
+            return False
+        seq, cmd, length = self.rx[1:1 + HEADER_SIZE]
+        size = 1 + HEADER_SIZE + length + 1
+        if len(self.rx) < size:
+            return False
+
+        body = bytes(self.rx[1:size - 1])
+        crc = self.rx[size - 1]
+        del self.rx[:size]
+
+        if crc8(body) != crc:
+            self._write_frame(seq, NACK)
+            return True
+
+        self.framed = True
+        payload = body[HEADER_SIZE:]
+        pose_size = 2 * N_SERVOS
+
+        if cmd == ord('m') and length == pose_size:
+            self._move(payload)
+            self._write_frame(seq, cmd)
+        elif cmd == ord('M') and length == pose_size:
+            self._move(payload)
+            self._write_frame(seq, cmd, bytes([self.status_flag]))
+        elif cmd == ord('q') and length >= 1 and length == 1 + payload[0] * pose_size:
+            self._queue(payload)
+            self._write_frame(seq, cmd)
+        elif cmd == ord('g') and length == 0:
+            self._write_frame(seq, cmd, self._pose_bytes())
+        elif cmd == ord('s') and length == 0:
+            self._write_frame(seq, cmd, bytes([self.status_flag]))
+        elif cmd == ord('S') and length == 0:
+            self._write_frame(seq, cmd, bytes([self.status_flag]) + self._pose_bytes())
+        elif cmd == ord('l') and length == 0:
+            self._start_launch_sequence()
+            self._write_frame(seq, cmd)
+        elif cmd == ord('r') and length == 0:
+            # Acknowledge before the melody blocks the firmware
+            self._write_frame(seq, cmd)
+            self._play_reload_melody()
+        else:
+            self._write_frame(seq, NACK)
+        return True
+
+    def _write_frame(self, seq: int, cmd: int, payload: bytes = b''):
+        self.tx.extend(encode_frame(Frame(seq, cmd, payload)))
+
+    def _notify(self):
+        """
+        Send a notification when a motion or a launch completes
+        """
+        status_flag = self.status_flag
+        if self.framed and self.last_status & ~status_flag:
+            self._write_frame(NOTIFICATION_SEQ, NOTIFY, bytes([status_flag]))
+        self.last_status = status_flag
+
+    def _move(self, bs: bytes):
+        self.move_pos = self._decode_pose(bs)
+        # A single move cancels any ongoing sequence
+        self.waypoints = []
+        self.next_waypoint = 0
+        self.target_update = True
+
+    def _queue(self, bs: bytes):
+        pose_size = 2 * N_SERVOS
+        poses = [self._decode_pose(bs[1 + w*pose_size:1 + (w+1)*pose_size]) for w in range(bs[0])]
+        self.waypoints = poses[:MAX_WAYPOINTS]
+        self.next_waypoint = 0
+
+    def _pose_bytes(self) -> bytes:
+        return b''.join(p.to_bytes(2, 'big') for p in self.curr_pos)
+
+    def _play_reload_melody(self):
+        self.busy_until = self.loop_time + reload_melody_duration()
+
+    def _decode_pose(self, bs: bytes) -> list[int]:
+        pose = [(bs[2*i] << 8) | bs[2*i + 1] for i in range(N_SERVOS)]
+        return [min(max(p, POS_MIN[i]), POS_MAX[i]) for i, p in enumerate(pose)]
+
+    def _at_target(self) -> bool:
+        return self.move_pos == self.curr_pos
+
+    def _advance_sequence(self):
+        if self.next_waypoint >= len(self.waypoints) or not self._at_target():
+            return
+        self.move_pos = list(self.waypoints[self.next_waypoint])
+        self.next_waypoint += 1
+        self.target_update = True
+
+    def _update_target_pose(self):
+        if not self.target_update:
+            return
+        self.target_update = False
+
+        steps_to_pos = [m - c for m, c in zip(self.move_pos, self.curr_pos)]
+        self.curr_pos_float = [np.float32(c) for c in self.curr_pos]
+        max_dist = max(abs(d) for d in steps_to_pos)
+
+        if max_dist == 0:
+            self.servo_vel = [np.float32(0.0)] * N_SERVOS
+            return
+
+        epochs = np.float32(max_dist) / np.float32(STEPS_PER_EPOCH)
+        self.servo_vel = [np.float32(d) / epochs for d in steps_to_pos]
+
+    def _update_pose(self):
+        for i in range(N_SERVOS):
+            if abs(self.move_pos[i] - self.curr_pos[i]) <= STEPS_PER_EPOCH:
+                self.curr_pos[i] = self.move_pos[i]
+            else:
+                self.curr_pos_float[i] = np.float32(self.curr_pos_float[i] + self.servo_vel[i])
+                self.curr_pos[i] = _arduino_round(float(self.curr_pos_float[i]))
+
+            self.curr_pos[i] = min(max(self.curr_pos[i], POS_MIN[i]), POS_MAX[i])
+
+    def _start_launch_sequence(self):
+        if self.launching:
+            return
+        self.launching = True
+        self.launcher_target = LAUNCHER_MAX
+        self.launcher_vel = LAUNCHER_STEPS_PER_EPOCH
+
+    def _update_launcher(self):
+        if not self.launching:
+            return
+
+        if abs(self.launcher_target - self.launcher_pos) <= LAUNCHER_STEPS_PER_EPOCH:
+            self.launcher_pos = self.launcher_target
+            if self.launcher_target == LAUNCHER_MAX:
+                # Go back
+                self.launcher_target = LAUNCHER_MIN
+                self.launcher_vel = -LAUNCHER_STEPS_PER_EPOCH
+            else:
+                # Reset the launch sequence
+                self.launching = False
+        else:
+            self.launcher_pos += self.launcher_vel
+
+        self.launcher_pos = min(max(self.launcher_pos, LAUNCHER_MIN), LAUNCHER_MAX)
+
+
+class LegacyEmulator(HubertEmulator):
+    """
+    Firmware from before the framed protocol and sequences, it ignores hello and queue
+    """
+
+    def _read_serial(self) -> bool:
+        if self.rx[:1] in (b'h', b'q'):
+            del self.rx[:1]
+            return True
+        return super()._read_serial()
+
+
+class EmulatorServer:
+    """
+    Serve an emulator on a pseudo terminal so that an unmodified Hubert can connect to it
+
+    Ex:
+        with EmulatorServer(HubertEmulator(clock=ScaledClock(10.0))) as server:
+            hubert = Hubert(server.port, baudrate=57600, servos=servos, timeout=0.1)
+            hubert.connect()
+    """
+
+    def __init__(self, emulator: HubertEmulator, poll_interval: float = 0.001) -> None:
+        self.emulator = emulator
+        self.poll_interval = poll_interval
+
+        self.master: Optional[int] = None
+        self.slave: Optional[int] = None
+        self.port: Optional[str] = None
+
+        self._stop = Event()
+        self._thread: Optional[Thread] = None
+
+    def start(self) -> str:
+        """
+        Start serving and return the path of the serial device
+        """
+        # Pseudo terminals only exist on Unix, the emulator itself works everywhere
+        import tty
+
+        if self._thread is not None:
+            raise RuntimeError("The emulator server is already running")
+
+        self.master, self.slave = os.openpty()
+        tty.setraw(self.slave)
+        self.port = os.ttyname(self.slave)
+
+        self._stop.clear()
+        self._thread = Thread(target=self._serve, name="hubert-emulator", daemon=True)
+        self._thread.start()
+        return self.port
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+
+        os.close(self.master)
+        os.close(self.slave)
+        self.master = self.slave = self.port = None
+
+    def __enter__(self) -> "EmulatorServer":
+        self.start()
+        return self
+
+    def __exit__(self, *_):
+        self.stop()
+
+    def _serve(self):
+        import select
+
+        while not self._stop.is_set():
+            readable, _, _ = select.select([self.master], [], [], self.poll_interval)
+            if readable:
+                self.emulator.write(os.read(self.master, 1024))
+
+            # Replies can become available later, for example after the reload melody
+            n = self.emulator.in_waiting
+            if n > 0:
+                os.write(self.master, self.emulator.read(n))
+
+
+def run_benchmark(n_moves: int = 50, seed: int = 0, framed: bool = True) -> dict[str, float]:
+    """
+    Drive a Hubert connected to an emulator with a virtual clock through random moves and launches
+
+    The result only depends on the host code and the firmware model, so it can be compared between
+    runs to find regressions in the time it takes to complete a motion or in the serial traffic.
+    """
+    from baller.communication.hubert import Hubert, Servo
+
+    clock = VirtualClock()
+    emulator = HubertEmulator(clock=clock, baudrate=57600)
+    # Servos that map degrees directly to pulses
+    servos = [Servo([0, 3000], [0, 3000]) for _ in range(N_SERVOS)]
+    hubert = Hubert("emulator", 57600, servos, clock=clock, framed=framed)
+    hubert.connect(transport=emulator)
+
+    rng = np.random.default_rng(seed)
+    wall_start = time.perf_counter()
+    move_time = 0.0
+    launch_time = 0.0
+    for _ in range(n_moves):
+        pose = {f'j{i+1}': float(rng.integers(POS_MIN[i], POS_MAX[i] + 1)) for i in range(N_SERVOS)}
+        hubert.set_pose(units='deg', **pose)
+        move_time += hubert.wait_unitl_idle()
+        hubert.launch()
+        launch_time += hubert.wait_unitl_idle()
+    wall_time = time.perf_counter() - wall_start
+
+    return {
+        'moves': n_moves,
+        'virtual_time': clock.monotonic(),
+        'mean_move_wait': move_time / n_moves,
+        'mean_launch_wait': launch_time / n_moves,
+        'writes': emulator.n_writes,
+        'reads': emulator.n_reads,
+        'bytes_to_hubert': emulator.bytes_received,
+        'bytes_from_hubert': emulator.bytes_sent,
+        'wall_time': wall_time,
+    }
+
+
+if __name__ == '__main__':
+    for framed in (False, True):
+        print("Framed protocol" if framed else "Legacy protocol")
+        for key, value in run_benchmark(framed=framed).items():
+            print(f"{key:>18}: {value:.4f}" if isinstance(value, float) else f"{key:>18}: {value}")
@@ -0,0 +1,34 @@
+# Constants mirrored from arduino/hubert/hubert.ino, free of dependencies so that the serial
+# driver can use them on every platform
+N_SERVOS = 5
+MAX_WAYPOINTS = 16
+
+INIT_POS = (1600, 2200, 1410, 1500, 2100)
+POS_MIN = (560, 750, 550, 550, 950)
+POS_MAX = (2330, 2300, 2400, 2340, 2400)
+
+STEPS_PER_EPOCH = 6             # Pulse steps per epoch for the joint that moves the furthest
+INTERVAL = 20                   # ms, an epoch starts when more than INTERVAL ms have passed
+
+LAUNCHER_MIN = 600
+LAUNCHER_MAX = 1400
+LAUNCHER_STEPS_PER_EPOCH = 40
+
+LAUNCH_FLAG = 1
+MOVE_FLAG = 1 << 1
+
+RELOAD_NOTES_DURATION = (4, 8, 8, 4, 4, 4, 4, 4)
+
+NOTIFY = ord('n')
+NACK = ord('!')
+
+
+def reload_melody_duration() -> int:
+    """
+    The time in ms that the firmware is blocked while playing the reload melody
+    """
+    duration = INTERVAL
+    for note in RELOAD_NOTES_DURATION:
+        note_duration = 1000 // note
+        duration += int(note_duration * 1.30)
+    return duration
@@ -1,11 +1,32 @@
 import serial
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass
 from enum import Enum, auto, IntFlag
-from typing import Optional, Literal
+from typing import Callable, Optional, Literal, Union
 import numpy as np
 from threading import Lock
 import time
 
 from baller.model.hubert import HubertModel
+from baller.communication.wait import PollSchedule, wait_until
+from baller.communication.clock import Clock, SYSTEM_CLOCK
+from baller.communication.telemetry import TelemetryService
+from baller.communication.metrics import LinkMetrics
+from baller.communication.motion import MotionModel
+from baller.communication.firmware import reload_melody_duration
+from baller.communication.protocol import (
+    PROTOCOL_VERSION,
+    LEGACY_PROTOCOL,
+    NOTIFICATION_SEQ,
+    HELLO_SIZE,
+    Frame,
+    HubertProtocolError,
+    encode_frame,
+    read_frame,
+    decode_hello,
+)
 
 
 class HubertStatus(IntFlag):
@@ -21,6 +42,63 @@ class HubertCommand(Enum):
     GET_STATUS = ord('s')       # Get the current status of Hubert (s for status)
     LAUNCH = ord('l')           # Start the launch of a projectile
     RELOAD = ord('r')           # Reload: Play the reload sound
+    SET_SEQUENCE = ord('q')     # Queue a sequence of positions that are moved through in order
+    HELLO = ord('h')            # Ask the firmware which protocol it speaks
+    MOVE_AND_STATUS = ord('M')  # Set a new position and reply with the status (framed protocol only)
+    STATUS_AND_POSE = ord('S')  # Reply with the status followed by the position (framed protocol only)
+    NOTIFY = ord('n')           # Sent by the firmware when a motion or launch completes (framed protocol only)
+    NACK = ord('!')             # Sent by the firmware when it rejects a frame (framed protocol only)
+
+
+# Commands that leave Hubert in the same state when they are sent twice, so they can be sent
+# again when their reply is lost or corrupt
+IDEMPOTENT_COMMANDS = frozenset((
+    HubertCommand.SET_POSITION,
+    HubertCommand.GET_POSITION,
+    HubertCommand.GET_STATUS,
+    HubertCommand.MOVE_AND_STATUS,
+    HubertCommand.STATUS_AND_POSE,
+))
+
+MAX_SEQUENCE_LENGTH = 16        # The number of waypoints that fit in the firmware queue
+FRAME_RETRIES = 2               # Times an idempotent command is sent again after a protocol error
+HELLO_TIMEOUT = 0.2             # s, legacy firmware does not answer a hello so do not wait long for it
+READY_TIMEOUT = 5.0             # s, the bootloader of an Arduino that resets on connect takes up to a couple of seconds
+PROBE_INTERVAL = 0.05           # s, time between handshake attempts while Hubert is not ready
+STATUS_MASK = 0b11              # Status bits the firmware can report
+
+
+class HubertConnectionError(ConnectionError):
+    """
+    Raised when Hubert does not answer the handshake or is not the Hubert that was configured
+    """
+
+
+def decode_status(bs: bytes) -> HubertStatus:
+    """
+    Convert a status byte from Hubert to a status flag
+    """
+    status_flag = HubertStatus(int.from_bytes(bs, byteorder='big'))
+
+    # If any status message was in the status flag return the flag
+    if status_flag:
+        return status_flag
+    # Oterwise return the idel flag
+    return HubertStatus.IDLE
+
+
+def encode_pulses(pulses: list[int]) -> list[bytes]:
+    """
+    Encode pulse lengths as two byte big endian integers
+    """
+    return [p.to_bytes(2, 'big') for p in pulses]
+
+
+def decode_pulses(bs: bytes, n: int) -> list[int]:
+    """
+    Decode n two byte big endian pulse lengths
+    """
+    return [int.from_bytes(bs[2*i:2*i+2], byteorder='big') for i in range(n)]
 
 
 class Servo:
@@ -39,21 +117,47 @@ class Servo:
 
         assert np.all(np.diff(self.rev_pulses) > 0), "Pulses could not be converted to an increasing list"
 
-    def angle_to_pulse(self, angle: float, units: Literal['rad', 'deg'] = 'deg') -> int:
+        # Piecewise linear angle -> pulse mapping, one segment between each pair of breakpoints
+        self.angle_breaks = np.asarray(self.angles, dtype=float)
+        self.pulse_breaks = np.asarray(self.pulses, dtype=float)
+        self.pulse_slopes = np.diff(self.pulse_breaks) / np.diff(self.angle_breaks)
+
+        # Pulse -> angle lookup table with one entry for every integer pulse in the servo range
+        self.pulse_min = int(np.floor(self.rev_pulses[0]))
+        self.pulse_max = int(np.ceil(self.rev_pulses[-1]))
+        self.angle_table = np.interp(np.arange(self.pulse_min, self.pulse_max + 1), self.rev_pulses, self.rev_angles)
+
+    def angle_to_pulse(self, angle: Union[float, np.ndarray], units: Literal['rad', 'deg'] = 'deg') -> Union[int, np.ndarray]:
         """
-        Convert an angle to a pulse by interpolating the angle
+        Convert an angle, or an array of angles, to a pulse by interpolating the angle
         """
+        angle = np.asarray(angle, dtype=float)
         angle = angle if units == 'rad' else np.deg2rad(angle)
-        pulse_len = np.interp(angle, self.angles, self.pulses)
-        return int(np.round(pulse_len))
-    
-    def pulse_to_angle(self, pulse: int, units: Literal['rad', 'deg'] = 'deg') -> float:
+
+        # Angles outside of the range are clipped to the closest end point
+        angle = np.clip(angle, self.angle_breaks[0], self.angle_breaks[-1])
+        i = np.clip(np.searchsorted(self.angle_breaks, angle, side='right') - 1, 0, len(self.angle_breaks) - 2)
+        pulse_len = np.round(self.pulse_breaks[i] + self.pulse_slopes[i] * (angle - self.angle_breaks[i])).astype(int)
+
+        if pulse_len.ndim == 0:
+            return int(pulse_len)
+        return pulse_len
+
+    def pulse_to_angle(self, pulse: Union[int, np.ndarray], units: Literal['rad', 'deg'] = 'deg') -> Union[float, np.ndarray]:
         """
-        Convert a pulse to an angle by interpolating the pulse
+        Convert a pulse, or an array of pulses, to an angle
+        Integer pulses are looked up in the precomputed table, other pulses are interpolated
         """
-        angle = np.interp(pulse, self.rev_pulses, self.rev_angles)
+        pulse = np.asarray(pulse)
+        if np.issubdtype(pulse.dtype, np.integer):
+            angle = self.angle_table[np.clip(pulse, self.pulse_min, self.pulse_max) - self.pulse_min]
+        else:
+            angle = np.interp(pulse, self.rev_pulses, self.rev_angles)
         angle = angle if units == 'rad' else np.rad2deg(angle)
-        return float(angle)
+
+        if np.ndim(angle) == 0:
+            return float(angle)
+        return angle
     
     def servo_range(self, units: Literal['rad', 'deg'] = 'deg') -> tuple[float, float]:
         min_a = np.min(self.angles)
@@ -64,33 +168,293 @@ class Servo:
         return min_a, max_a
 
 
+def _concat(arrays: list[np.ndarray]) -> np.ndarray:
+    return np.concatenate(arrays) if len(arrays) > 0 else np.zeros(0)
+
+
+class ServoBank:
+    """
+    The servos of every joint in Hubert, with their mappings packed into flat arrays
+
+    Poses are arrays with one column per joint. A single pose has the shape (n_joints,) and a
+    batch of N poses has the shape (N, n_joints). Each conversion is a single vectorized call
+    regardless of the number of poses.
+    """
+
+    def __init__(self, servos: list[Servo]) -> None:
+        self.servos = servos
+
+        # Angle -> pulse: The breakpoints of every servo are concatenated and each servo is shifted
+        # by an offset so that its breakpoints do not overlap with the other servos. A single
+        # searchsorted over the shifted breakpoints then finds the segment for every joint at once
+        self.angle_min = np.array([s.angle_breaks[0] for s in servos], dtype=float)
+        self.angle_max = np.array([s.angle_breaks[-1] for s in servos], dtype=float)
+        stride = np.max(self.angle_max - self.angle_min, initial=0.0) + 1.0
+        self.angle_offsets = np.arange(len(servos)) * stride - self.angle_min
+
+        self.angle_breaks = _concat([s.angle_breaks for s in servos])
+        self.shifted_breaks = _concat([s.angle_breaks + o for s, o in zip(servos, self.angle_offsets)])
+        self.pulse_breaks = _concat([s.pulse_breaks for s in servos])
+        # Pad each servo with one slope so the slopes line up with the breakpoints
+        self.pulse_slopes = _concat([np.append(s.pulse_slopes, 0.0) for s in servos])
+
+        n_breaks = np.array([len(s.angle_breaks) for s in servos], dtype=int)
+        self.segment_first = np.cumsum(n_breaks) - n_breaks
+        self.segment_last = self.segment_first + n_breaks - 2
+
+        # Pulse -> angle: The lookup tables of every servo are concatenated
+        self.pulse_min = np.array([s.pulse_min for s in servos], dtype=int)
+        self.pulse_max = np.array([s.pulse_max for s in servos], dtype=int)
+        table_len = self.pulse_max - self.pulse_min + 1
+        self.table_offsets = np.cumsum(table_len) - table_len
+        self.angle_table = _concat([s.angle_table for s in servos])
+
+    def __len__(self) -> int:
+        return len(self.servos)
+
+    def angles_to_pulses(self, angles: Union[np.ndarray, list[float]], units: Literal['rad', 'deg'] = 'rad') -> np.ndarray:
+        """
+        Convert poses of shape (..., n_joints) from angles to integer pulses
+        """
+        angles = np.asarray(angles, dtype=float)
+        angles = angles if units == 'rad' else np.deg2rad(angles)
+        assert angles.shape[-1:] == (len(self),), f"Expected {len(self)} joint angles per pose, got shape {angles.shape}"
+
+        angles = np.clip(angles, self.angle_min, self.angle_max)
+        i = np.searchsorted(self.shifted_breaks, angles + self.angle_offsets, side='right') - 1
+        i = np.clip(i, self.segment_first, self.segment_last)
+        pulses = self.pulse_breaks[i] + self.pulse_slopes[i] * (angles - self.angle_breaks[i])
+        return np.round(pulses).astype(int)
+
+    def pulses_to_angles(self, pulses: Union[np.ndarray, list[int]], units: Literal['rad', 'deg'] = 'rad') -> np.ndarray:
+        """
+        Convert poses of shape (..., n_joints) from integer pulses to angles
+        """
+        pulses = np.asarray(pulses, dtype=int)
+        assert pulses.shape[-1:] == (len(self),), f"Expected {len(self)} pulses per pose, got shape {pulses.shape}"
+
+        i = self.table_offsets + np.clip(pulses, self.pulse_min, self.pulse_max) - self.pulse_min
+        angles = self.angle_table[i]
+        return angles if units == 'rad' else np.rad2deg(angles)
+
+
+# Commands that only read the state of Hubert
+QUERY_COMMANDS = frozenset({
+    HubertCommand.GET_POSITION,
+    HubertCommand.GET_STATUS,
+    HubertCommand.STATUS_AND_POSE,
+    HubertCommand.HELLO,
+})
+
+
+@dataclass(frozen=True)
+class HubertTelemetry:
+    status: HubertStatus
+    angles: tuple[float, ...]   # rad
+    generation: int             # Number of state changing commands sent before the sample
+
+
 class Hubert(HubertModel):
 
-    def __init__(self, port: str, baudrate: int, servos: list[Servo], timeout: Optional[float] = None) -> None:
+    def __init__(
+            self,
+            port: str,
+            baudrate: int,
+            servos: list[Servo],
+            timeout: Optional[float] = None,
+            poll_schedule: PollSchedule = PollSchedule(),
+            clock: Clock = SYSTEM_CLOCK,
+            framed: bool = True,
+            metrics: Optional[LinkMetrics] = None,
+            predict: bool = True,
+        ) -> None:
+        """
+        Parameters:
+        - port (str):                   The serial port Hubert is connected to
+        - baudrate (int):               Baudrate of the serial connection
+        - servos (list[Servo]):         The servo of every joint
+        - timeout (float):              Read timeout of the serial connection
+        - poll_schedule (PollSchedule): How often to poll the status while waiting
+        - clock (Clock):                Clock used for waiting
+        - framed (bool):                Use the framed protocol if the firmware supports it
+        - metrics (LinkMetrics):        Where to record link statistics, nothing is recorded if None
+        - predict (bool):               Sleep until a motion is predicted to be done before polling the status
+        """
         self.port = port
         self.baudrate = baudrate
         self.servos = servos
+        self.servo_bank = ServoBank(servos)
         self.timeout = timeout
+        self.poll_schedule = poll_schedule
+        self.clock = clock
 
         self.arduino: Optional[serial.Serial] = None
 
         self.joint_angles = {f'j{i+1}': 0.0 for i in range(len(self.servos))}
 
         self.arduino_lock = Lock()
+        self.time_to_ready: Optional[float] = None      # s, measured by connect
+        self.metrics = metrics if metrics is not None else LinkMetrics(enabled=False)
+
+        # Follows every command to predict when motions are done and the pose along the way
+        self.motion = MotionModel(clock)
+        self.predict = predict
+
+        # Waits behind the futures returned by submit_pose and submit_launch
+        self._waiters = ThreadPoolExecutor(max_workers=4, thread_name_prefix="hubert-wait")
+
+        # Protocol state
+        self.framed = framed
+        self.protocol_version = LEGACY_PROTOCOL
+        self._seq = 0
+        self.notifications: deque[HubertStatus] = deque(maxlen=32)
+        self._notified_status: Optional[HubertStatus] = None    # Latest status notified since the last reply
+
+        # Telemetry
+        self.telemetry: Optional[TelemetryService[HubertTelemetry]] = None
+        self.telemetry_max_age = 0.0
+        self._generation = 0
+
+    def connect(self, ready_timeout: float = READY_TIMEOUT, probe_interval: float = PROBE_INTERVAL, transport=None) -> float:
+        """
+        Open the serial connection and wait until Hubert answers
+
+        Hubert is probed with a hello, and with a status request for firmware that does not
+        know hello, until it gives a valid answer. Probes that are lost while the Arduino
+        boots are simply retried.
+
+        Parameters:
+        - ready_timeout (float):    Give up if Hubert has not answered after this many seconds
+        - probe_interval (float):   Time between probes
+        - transport:                Use this instead of opening port, anything that behaves like serial.Serial
 
-    def connect(self):
+        Returns:
+        - time_to_ready (float):    Seconds from opening the port until Hubert answered
+
+        Raises:
+        - HubertConnectionError:    If Hubert did not answer in time or has the wrong number of servos
+        """
         if self.status != HubertStatus.NOT_CONNECTED:
             raise RuntimeError("Hubert has already established a connection")
-        
-        self.arduino = serial.Serial(port=self.port, baudrate=self.baudrate, timeout=self.timeout)
-        
-        # Wait for the serial connection to be ready
-        time.sleep(1.0)
 
-        # Clear all buffers
-        self.arduino.reset_input_buffer()
+        start = self.clock.monotonic()
+        if transport is None:
+            transport = serial.Serial(port=self.port, baudrate=self.baudrate, timeout=self.timeout)
+        self.arduino = transport
         self.arduino.reset_output_buffer()
-        
+
+        try:
+            while not self._probe():
+                elapsed = self.clock.monotonic() - start
+                if elapsed >= ready_timeout:
+                    raise HubertConnectionError(f"Hubert on {self.port} did not answer within {ready_timeout:.1f} s")
+                # Drop anything the bootloader printed before trying again
+                self.arduino.reset_input_buffer()
+                self.clock.sleep(min(probe_interval, ready_timeout - elapsed))
+        except Exception:
+            self.arduino.close()
+            self.arduino = None
+            raise
+
+        self.time_to_ready = self.clock.monotonic() - start
+
+        # Give the motion model a starting point
+        self.status_and_pose()
+        return self.time_to_ready
+
+    def _probe(self) -> bool:
+        """
+        Make one handshake attempt and return True if Hubert answered
+        """
+        if self.framed and self._negotiate_protocol():
+            return True
+
+        timeout = self.arduino.timeout
+        self.arduino.timeout = HELLO_TIMEOUT
+        try:
+            with self._link():
+                self._send(HubertCommand.GET_STATUS)
+                bs = self._read(1)
+        finally:
+            self.arduino.timeout = timeout
+
+        if len(bs) != 1 or bs[0] & ~STATUS_MASK:
+            return False
+
+        if self.framed:
+            # The firmware may have finished booting after the hello was sent
+            self._negotiate_protocol()
+        return True
+
+    def _negotiate_protocol(self) -> bool:
+        """
+        Switch to the framed protocol if the firmware announces it
+        Return True if the firmware answered the hello
+        """
+        timeout = self.arduino.timeout
+        self.arduino.timeout = HELLO_TIMEOUT
+        try:
+            with self._link():
+                self._send(HubertCommand.HELLO)
+                version, n_servos = decode_hello(self._read(HELLO_SIZE))
+        finally:
+            self.arduino.timeout = timeout
+
+        if version == LEGACY_PROTOCOL:
+            return False
+        if n_servos != len(self.servos):
+            raise HubertConnectionError(f"Hubert has {n_servos} servos but {len(self.servos)} servos were configured")
+        self.protocol_version = min(version, PROTOCOL_VERSION)
+        return True
+
+    def start_telemetry(self, rate: float = 20.0, max_age: Optional[float] = None):
+        """
+        Sample the status and pose of Hubert on a background thread
+
+        While telemetry runs, status, get_pose and the waits are answered from the latest
+        sample as long as it is at most max_age seconds old and no command has been sent
+        since it was taken. Otherwise they fall back to asking Hubert.
+
+        Parameters:
+        - rate (float):     Samples per second
+        - max_age (float):  The oldest sample that is used, two sample periods if None
+        """
+        if self.telemetry is not None:
+            raise RuntimeError("Telemetry is already running")
+        self.telemetry = TelemetryService(self._sample_telemetry, rate=rate, clock=self.clock, name="hubert-telemetry")
+        self.telemetry_max_age = 2.0 / rate if max_age is None else max_age
+        self.telemetry.start()
+
+    def stop_telemetry(self):
+        if self.telemetry is not None:
+            self.telemetry.stop()
+            self.telemetry = None
+
+    def close(self):
+        """
+        Stop telemetry and the threads that wait behind submitted poses and launches
+        """
+        self.stop_telemetry()
+        self._waiters.shutdown()
+
+    def _sample_telemetry(self) -> HubertTelemetry:
+        with self._link():
+            generation = self._generation
+            bs = self._status_and_pose_bytes()
+            self._observe(bs)
+        angles = self.servo_bank.pulses_to_angles(decode_pulses(bs[1:], len(self.servos)), units='rad')
+        return HubertTelemetry(decode_status(bs[:1]), tuple(float(a) for a in angles), generation)
+
+    def _cached_telemetry(self) -> Optional[HubertTelemetry]:
+        """
+        Return the latest telemetry sample if it is fresh enough to answer a query
+        """
+        if self.telemetry is None:
+            return None
+        snapshot = self.telemetry.latest(max_age=self.telemetry_max_age)
+        if snapshot is None or snapshot.value.generation != self._generation:
+            return None
+        return snapshot.value
 
     @property
     def status(self) -> HubertStatus:
@@ -99,72 +463,338 @@ class Hubert(HubertModel):
         """
         if self.arduino is None:
             return HubertStatus.NOT_CONNECTED
+        cached = self._cached_telemetry()
+        if cached is not None:
+            return cached.status
         # Ask arduino for status
-        with self.arduino_lock:
-            self._send(HubertCommand.GET_STATUS)
-            bs = self._read(1)
-        status_flag = HubertStatus(int.from_bytes(bs, byteorder='big'))
-        
-        # If any status message was in the status flag return the flag
-        if status_flag:
-            return status_flag
-        # Oterwise return the idel flag
-        return HubertStatus.IDLE
+        with self._link():
+            bs = self._transact(HubertCommand.GET_STATUS, reply_len=1)
+            if HubertStatus.MOVING not in decode_status(bs):
+                self.motion.settle()
+        return decode_status(bs)
+
+    def status_and_pose(self, units: Literal['rad', 'deg'] = 'rad') -> tuple[HubertStatus, dict[str, float]]:
+        """
+        Return the status and the current position of Hubert
+        The framed protocol answers both in a single reply
+        """
+        cached = self._cached_telemetry()
+        if cached is not None:
+            return cached.status, self._angles_to_pose(cached.angles, units)
+
+        with self._link():
+            bs = self._status_and_pose_bytes()
+            self._observe(bs)
+        return decode_status(bs[:1]), self._decode_pose(bs[1:], units)
+
+    def _observe(self, bs: bytes):
+        """
+        Resynchronise the motion model with a status and pose reply if Hubert is at rest
+        """
+        if HubertStatus.MOVING not in decode_status(bs[:1]):
+            self.motion.reset(decode_pulses(bs[1:], len(self.servos)))
+
+    def predicted_pose(self, units: Literal['rad', 'deg'] = 'rad') -> Optional[dict[str, float]]:
+        """
+        Return the pose Hubert is predicted to have right now without asking Hubert
+        Return None if the motion model does not know the pose
+        """
+        pulses = self.motion.pose_at()
+        if pulses is None:
+            return None
+        return self._angles_to_pose(tuple(float(a) for a in self.servo_bank.pulses_to_angles(pulses, units='rad')), units)
+
+    def _status_and_pose_bytes(self) -> bytes:
+        n = 2 * len(self.servos)
+        if self.protocol_version == LEGACY_PROTOCOL:
+            bs = self._transact(HubertCommand.GET_STATUS, reply_len=1)
+            return bs + self._transact(HubertCommand.GET_POSITION, reply_len=n)
+        return self._transact(HubertCommand.STATUS_AND_POSE, reply_len=1 + n)
+
+    def poll_notifications(self) -> Optional[HubertStatus]:
+        """
+        Handle any notifications the firmware has sent
+        Return the latest status notified since the last reply, or None if there is none
+        """
+        if self.protocol_version == LEGACY_PROTOCOL or self.arduino is None:
+            return None
+        with self._link():
+            while self.arduino.in_waiting > 0:
+                frame = read_frame(self._read)
+                if frame.cmd == HubertCommand.NOTIFY.value:
+                    self._notify(frame)
+            return self._notified_status
     
-    def wait_unitl_idle(self) -> None:
-        self.wait_for(HubertStatus.IDLE)
+    def wait_unitl_idle(self, timeout: Optional[float] = None) -> float:
+        return self.wait_for(HubertStatus.IDLE, timeout=timeout)
+
+    def wait_for(self, status_flag: HubertStatus, timeout: Optional[float] = None, schedule: Optional[PollSchedule] = None) -> float:
+        """
+        Block until Hubert reports status_flag, polling according to the poll schedule
+        Return the time spent waiting in seconds
+        Raise a WaitTimeout if the flag was not reported within timeout seconds
+        """
+        predicted_end = self.motion.idle_time if status_flag == HubertStatus.IDLE else None
+        return self._wait_status(lambda status: status_flag in status, timeout, schedule, predicted_end)
+
+    def wait_while(self, status_flag: HubertStatus, timeout: Optional[float] = None, schedule: Optional[PollSchedule] = None) -> float:
+        """
+        Block until Hubert no longer reports status_flag
+        Return the time spent waiting in seconds
+        Raise a WaitTimeout if the flag did not clear within timeout seconds
+        """
+        predicted_end = {
+            HubertStatus.MOVING: self.motion.move_end,
+            HubertStatus.LAUNCHING: self.motion.launch_end,
+        }.get(status_flag)
+        return self._wait_status(lambda status: status_flag not in status, timeout, schedule, predicted_end)
+
+    def _wait_status(self, done: Callable[[HubertStatus], bool], timeout: Optional[float], schedule: Optional[PollSchedule], predicted_end: Optional[float] = None) -> float:
+        """
+        Wait until done returns True for the status of Hubert
+
+        If the motion model predicts when that happens, sleep until then without touching the
+        serial link. The status read that follows normally confirms it right away.
+        """
+        slept = 0.0
+        if self.predict and predicted_end is not None:
+            slept = predicted_end - self.clock.monotonic()
+            if timeout is not None:
+                slept = min(slept, timeout)
+            if slept > 0:
+                self.clock.sleep(slept)
+                timeout = None if timeout is None else timeout - slept
+            slept = max(slept, 0.0)
+
+        def condition() -> bool:
+            # A completion notification answers the question without another round trip
+            notified = self.poll_notifications()
+            if notified is not None and done(notified):
+                return True
+            return done(self.status)
+
+        return slept + wait_until(condition, schedule or self.poll_schedule, timeout=timeout, clock=self.clock)
+
+    def submit_pose(self, units: Literal['rad', 'deg'] = 'rad', timeout: Optional[float] = None, **joints: float) -> Future:
+        """
+        Send a new position to Hubert without waiting for it to be reached
+
+        Returns a future that resolves to the time spent waiting in seconds once Hubert has
+        stopped moving, or fails with a WaitTimeout after timeout seconds. A launch that is in
+        progress at the same time does not hold the future back.
+        """
+        self.set_pose(units=units, **joints)
+        return self._waiters.submit(self.wait_while, HubertStatus.MOVING, timeout)
+
+    def submit_launch(self, timeout: Optional[float] = None) -> Future:
+        """
+        Launch a projectile without waiting for the launch to finish
 
-    def wait_for(self, status_flag: HubertStatus) -> None:
-        time.sleep(0.1)
-        while status_flag not in self.status:
-            time.sleep(1)
+        Returns a future that resolves to the time spent waiting in seconds once the launcher
+        is back, or fails with a WaitTimeout after timeout seconds. A motion that is in progress
+        at the same time does not hold the future back.
+        """
+        self.launch()
+        return self._waiters.submit(self.wait_while, HubertStatus.LAUNCHING, timeout)
     
     def set_pose(self, units: Literal['rad', 'deg'] = 'rad', **joints: float):
         """
         Send a new position to Hubert
         """
-        # Update joint angles
-        for j, v in joints.items():
-            if j not in self.joint_angles:
-                raise KeyError(f"The joint {j} is not a valid joint")
-            self.joint_angles[j] = v if units == 'rad' else np.deg2rad(v)
+        pulses = self._update_joint_angles(units, joints)
 
-        joint_angles = [self.joint_angles[f'j{i+1}'] for i in range(len(self.joint_angles))]
+        with self._link():
+            self._transact(HubertCommand.SET_POSITION, *encode_pulses(pulses))
+            self.motion.move(pulses)
 
-        assert len(joint_angles) == len(self.servos)
-        pulse_len = self._convert_angle_to_pulse(joint_angles)
-        joint_args = [j.to_bytes(2, 'big') for j in pulse_len]
+    def move_and_status(self, units: Literal['rad', 'deg'] = 'rad', **joints: float) -> HubertStatus:
+        """
+        Send a new position to Hubert and return the status after the position was received
+        The framed protocol answers in a single round trip
+        """
+        pulses = self._update_joint_angles(units, joints)
+        joint_args = encode_pulses(pulses)
+
+        with self._link():
+            if self.protocol_version == LEGACY_PROTOCOL:
+                self._transact(HubertCommand.SET_POSITION, *joint_args)
+                self.motion.move(pulses)
+                bs = self._transact(HubertCommand.GET_STATUS, reply_len=1)
+            else:
+                bs = self._transact(HubertCommand.MOVE_AND_STATUS, *joint_args, reply_len=1)
+                self.motion.move(pulses)
+        return decode_status(bs)
 
-        with self.arduino_lock:
-            self._send(HubertCommand.SET_POSITION, *joint_args)
+    @property
+    def supports_sequences(self) -> bool:
+        """
+        Sequences were added to the firmware together with hello, firmware that did not
+        answer it would read the bytes of a sequence as commands
+        """
+        return self.protocol_version != LEGACY_PROTOCOL
+
+    def set_pose_sequence(self, poses: list[dict[str, float]], units: Literal['rad', 'deg'] = 'rad'):
+        """
+        Send a sequence of positions to Hubert in one message
+        Hubert moves through the positions on its own and is not idle until the last one is reached
+        Joints that are left out of a position keep their value from the previous position
+        """
+        if not self.supports_sequences:
+            raise RuntimeError("The firmware of Hubert does not support sequences")
+        if not 0 < len(poses) <= MAX_SEQUENCE_LENGTH:
+            raise ValueError(f"A sequence must have between 1 and {MAX_SEQUENCE_LENGTH} positions, got {len(poses)}")
+
+        waypoints = [self._update_joint_angles(units, joints) for joints in poses]
+        joint_args = [len(poses).to_bytes(1, 'big')]
+        for pulses in waypoints:
+            joint_args.extend(encode_pulses(pulses))
+
+        with self._link():
+            self._transact(HubertCommand.SET_SEQUENCE, *joint_args)
+            self.motion.queue(waypoints)
+
+    def move_sequence(self, poses: list[dict[str, float]], units: Literal['rad', 'deg'] = 'rad', timeout: Optional[float] = None) -> float:
+        """
+        Move through a sequence of positions and wait until the last one is reached
+        Sequences longer than the firmware queue are sent in several parts, and firmware without
+        sequences is sent one position at a time
+        Return the time spent waiting in seconds
+        """
+        if not self.supports_sequences:
+            return super().move_sequence(poses, units=units, timeout=timeout)
+
+        wait_time = 0.0
+        for i in range(0, len(poses), MAX_SEQUENCE_LENGTH):
+            self.set_pose_sequence(poses[i:i + MAX_SEQUENCE_LENGTH], units=units)
+            wait_time += self.wait_unitl_idle(timeout=timeout)
+        return wait_time
 
     def get_pose(self, units: Literal['rad', 'deg'] = 'rad') -> dict[str, float]:
         """
         Get the current position of Hubert
         """
-        with self.arduino_lock:
-            self._send(HubertCommand.GET_POSITION)
-            bs = self._read(2 * len(self.servos))
+        cached = self._cached_telemetry()
+        if cached is not None:
+            return self._angles_to_pose(cached.angles, units)
 
-        joint_angles = {}
+        with self._link():
+            bs = self._transact(HubertCommand.GET_POSITION, reply_len=2 * len(self.servos))
 
-        for i in range(len(self.servos)):
-            b = bs[2*i:2*i+2]
-            pulse_len = int.from_bytes(b, byteorder='big')
-            angle = self.servos[i].pulse_to_angle(pulse_len, units=units)
-            joint_angles[f'j{i+1}'] = angle
-        return joint_angles
+        return self._decode_pose(bs, units)
         
     def launch(self) -> None:
         """
         Launch a projectile
         """
-        with self.arduino_lock:
-            self._send(HubertCommand.LAUNCH)
+        with self._link():
+            self._transact(HubertCommand.LAUNCH)
+            self.motion.launch()
 
     def play_reload_sound(self) -> None:
+        with self._link():
+            self._transact(HubertCommand.RELOAD)
+            # The melody blocks the firmware main loop
+            self.motion.block(reload_melody_duration() / 1000)
+
+    @contextmanager
+    def _link(self):
+        """
+        Hold the arduino lock, recording how long it took to get it
+        """
+        if not self.metrics.enabled:
+            with self.arduino_lock:
+                yield
+            return
+
+        start = self.clock.monotonic()
         with self.arduino_lock:
-            self._send(HubertCommand.RELOAD)
+            self.metrics.record_lock_wait(self.clock.monotonic() - start)
+            yield
+
+    def _transact(self, cmd: HubertCommand, *args: bytes, reply_len: int = 0) -> bytes:
+        """
+        Send a command and return its reply using the negotiated protocol
+        """
+        if cmd not in QUERY_COMMANDS:
+            # Telemetry sampled before this command no longer describes Hubert
+            self._generation += 1
+
+        start = self.clock.monotonic() if self.metrics.enabled else 0.0
+
+        if self.protocol_version == LEGACY_PROTOCOL:
+            self._send(cmd, *args)
+            reply = self._read(reply_len) if reply_len > 0 else b''
+        else:
+            reply = self._transact_frame(cmd, *args, reply_len=reply_len)
+
+        if self.metrics.enabled:
+            self.metrics.record_command(cmd.name, self.clock.monotonic() - start)
+        return reply
+
+    def _transact_frame(self, cmd: HubertCommand, *args: bytes, reply_len: int = 0) -> bytes:
+        """
+        Send a command as a frame and return its reply
+
+        When the reply is lost, corrupt or rejected, the input is flushed so that the next read
+        starts on a fresh frame, and idempotent commands are sent again up to FRAME_RETRIES times.
+        """
+        retries = FRAME_RETRIES if cmd in IDEMPOTENT_COMMANDS else 0
+        while True:
+            seq = self._send_frame(cmd, *args)
+            try:
+                return self._read_reply(seq, cmd, reply_len)
+            except HubertProtocolError:
+                self.arduino.reset_input_buffer()
+                if retries == 0:
+                    raise
+                retries -= 1
+
+    def _send_frame(self, cmd: HubertCommand, *args: bytes) -> int:
+        """
+        Send a command as a frame and return its sequence id
+        """
+        assert self.arduino_lock.locked(), "You must lock the arduino before comunicaiton"
+
+        # Sequence ids run from 1 to 255, 0 is reserved for notifications
+        self._seq = self._seq % 255 + 1
+        msg = encode_frame(Frame(self._seq, cmd.value, b''.join(args)))
+        self.arduino.write(msg)
+        self.metrics.record_write(len(msg))
+        return self._seq
+
+    def _read_reply(self, seq: int, cmd: HubertCommand, reply_len: int) -> bytes:
+        """
+        Read frames until the reply to the frame with sequence id seq arrives
+        """
+        while True:
+            frame = read_frame(self._read)
+
+            if frame.seq == NOTIFICATION_SEQ and frame.cmd == HubertCommand.NOTIFY.value:
+                self._notify(frame)
+                continue
+            if frame.seq != seq:
+                # A late reply to an earlier request that timed out
+                continue
+            if frame.cmd == HubertCommand.NACK.value:
+                raise HubertProtocolError(f"Hubert rejected {cmd.name}")
+            if frame.cmd != cmd.value or len(frame.payload) != reply_len:
+                raise HubertProtocolError(f"Unexpected reply to {cmd.name}: {frame}")
+
+            # Notifications that arrived before the reply are older than the command
+            self._notified_status = None
+            return frame.payload
+
+    def _notify(self, frame: Frame):
+        status = decode_status(frame.payload)
+        self.notifications.append(status)
+        self._notified_status = status
+
+    def _decode_pose(self, bs: bytes, units: Literal['rad', 'deg']) -> dict[str, float]:
+        angles = self.servo_bank.pulses_to_angles(decode_pulses(bs, len(self.servos)), units=units)
+        return {f'j{i+1}': float(angle) for i, angle in enumerate(angles)}
+
+    def _angles_to_pose(self, angles: tuple[float, ...], units: Literal['rad', 'deg']) -> dict[str, float]:
+        return {f'j{i+1}': angle if units == 'rad' else float(np.rad2deg(angle)) for i, angle in enumerate(angles)}
 
     def _send(self, cmd: HubertCommand, *args: bytes):
         """
@@ -177,6 +807,7 @@ class Hubert(HubertModel):
             msg.extend(arg)
 
         self.arduino.write(msg)
+        self.metrics.record_write(len(msg))
 
     def _read(self, n: int) -> bytes:
         """
@@ -184,10 +815,25 @@ class Hubert(HubertModel):
         """
         assert self.arduino_lock.locked(), "You must lock the arduino before comunicaiton"
         bs = self.arduino.read(size=n)
+        self.metrics.record_read(n, len(bs))
         return bs
 
+    def _update_joint_angles(self, units: Literal['rad', 'deg'], joints: dict[str, float]) -> list[int]:
+        """
+        Update the commanded joint angles and return the pulse lengths of the full pose
+        """
+        for j, v in joints.items():
+            if j not in self.joint_angles:
+                raise KeyError(f"The joint {j} is not a valid joint")
+            self.joint_angles[j] = v if units == 'rad' else np.deg2rad(v)
+
+        joint_angles = [self.joint_angles[f'j{i+1}'] for i in range(len(self.joint_angles))]
+
+        assert len(joint_angles) == len(self.servos)
+        return self._convert_angle_to_pulse(joint_angles)
+
     def _convert_angle_to_pulse(self, joint_angles: list[float]) -> list[int]:
-        return [servo.angle_to_pulse(angle, units='rad') for servo, angle in zip(self.servos, joint_angles)]
+        return self.servo_bank.angles_to_pulses(joint_angles, units='rad').tolist()
 
 
 if __name__ == '__main__':
@@ -200,7 +846,7 @@ if __name__ == '__main__':
     ]
     com = Hubert("COM3", baudrate=57600, servos=servos, timeout=0.1)
     print(com.status.name)
-    com.connect()
+    print(f"Ready after {com.connect():.3f} s")
     print(com.status.name)
     com.set_pose(j1=90)
     time.sleep(0.1)
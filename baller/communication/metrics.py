@@ -0,0 +1,143 @@
+import json
+from bisect import bisect_left
+from typing import Optional
+
+
+def log_buckets(low: float = 1e-4, high: float = 10.0, per_decade: int = 4) -> list[float]:
+    """
+    Upper bounds of histogram buckets spaced evenly on a log scale from low to high
+    """
+    bounds = [low]
+    factor = 10 ** (1 / per_decade)
+    while bounds[-1] < high * (1 - 1e-9):
+        bounds.append(bounds[-1] * factor)
+    return bounds
+
+
+LATENCY_BUCKETS = log_buckets()     # s, 0.1 ms to 10 s
+
+
+class Histogram:
+    """
+    Fixed bucket histogram
+
+    Recording a value is a binary search and an increment, so it is cheap enough to do
+    for every message on the serial link. Values above the last bound go in an overflow bucket.
+    """
+
+    def __init__(self, bounds: list[float] = LATENCY_BUCKETS) -> None:
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.min = float('inf')
+        self.max = float('-inf')
+
+    def record(self, value: float):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.total += value
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count > 0 else 0.0
+
+    def percentile(self, q: float) -> float:
+        """
+        Return the upper bound of the bucket that holds the q:th percentile, 0 <= q <= 100
+        The result never exceeds the largest recorded value
+        """
+        if self.count == 0:
+            return 0.0
+        rank = q / 100 * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if seen >= rank and n > 0:
+                return min(self.bounds[i], self.max) if i < len(self.bounds) else self.max
+        return self.max
+
+    def to_dict(self) -> dict:
+        return {
+            'count': self.count,
+            'mean': self.mean,
+            'min': self.min if self.count > 0 else 0.0,
+            'max': self.max if self.count > 0 else 0.0,
+            'p50': self.percentile(50),
+            'p90': self.percentile(90),
+            'p99': self.percentile(99),
+            'buckets': {f'{b:.6g}': n for b, n in zip(self.bounds + [float('inf')], self.counts) if n > 0},
+        }
+
+
+class LinkMetrics:
+    """
+    Counters for the serial link to Hubert
+
+    Hubert records into this while it holds the link lock, so the counters need no lock of
+    their own. Every record method returns immediately when the metrics are disabled.
+    """
+
+    def __init__(self, enabled: bool = True) -> None:
+        self.enabled = enabled
+        self.reset()
+
+    def reset(self):
+        self.latency: dict[str, Histogram] = {}     # Round trip time per command
+        self.lock_wait = Histogram()                # Time spent waiting for the link lock
+        self.bytes_out = 0
+        self.bytes_in = 0
+        self.writes = 0
+        self.reads = 0
+        self.short_reads = 0                        # Reads that timed out before all bytes arrived
+
+    def record_command(self, cmd: str, seconds: float):
+        if not self.enabled:
+            return
+        histogram = self.latency.get(cmd)
+        if histogram is None:
+            histogram = self.latency[cmd] = Histogram()
+        histogram.record(seconds)
+
+    def record_write(self, n: int):
+        if not self.enabled:
+            return
+        self.writes += 1
+        self.bytes_out += n
+
+    def record_read(self, requested: int, received: int):
+        if not self.enabled:
+            return
+        self.reads += 1
+        self.bytes_in += received
+        if received < requested:
+            self.short_reads += 1
+
+    def record_lock_wait(self, seconds: float):
+        if not self.enabled:
+            return
+        self.lock_wait.record(seconds)
+
+    def to_dict(self) -> dict:
+        return {
+            'latency': {cmd: h.to_dict() for cmd, h in sorted(self.latency.items())},
+            'lock_wait': self.lock_wait.to_dict(),
+            'bytes_out': self.bytes_out,
+            'bytes_in': self.bytes_in,
+            'writes': self.writes,
+            'reads': self.reads,
+            'short_reads': self.short_reads,
+        }
+
+    def dump(self, path: Optional[str] = None) -> str:
+        """
+        Return the metrics as JSON and write them to path if it is given
+        """
+        s = json.dumps(self.to_dict(), indent=2)
+        if path is not None:
+            with open(path, 'w') as f:
+                f.write(s)
+        return s
+
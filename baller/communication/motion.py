@@ -0,0 +1,204 @@
+import math
+from dataclasses import dataclass
+from typing import Optional, Sequence
+import numpy as np
+
+from baller.communication.clock import Clock, SYSTEM_CLOCK
+from baller.communication.firmware import (
+    N_SERVOS, POS_MIN, POS_MAX, STEPS_PER_EPOCH, INTERVAL, LAUNCHER_MIN, LAUNCHER_MAX, LAUNCHER_STEPS_PER_EPOCH,
+)
+
+
+EPOCH = (INTERVAL + 1) / 1000   # s, the firmware starts an epoch when more than INTERVAL ms have passed
+LAUNCH_EPOCHS = 2 * math.ceil((LAUNCHER_MAX - LAUNCHER_MIN) / LAUNCHER_STEPS_PER_EPOCH)
+LAUNCH_TIME = LAUNCH_EPOCHS * EPOCH
+
+
+def move_epochs(start: Sequence[int], end: Sequence[int]) -> int:
+    """
+    The number of epochs the firmware needs to move from start to end
+
+    The joint with the longest way to go moves STEPS_PER_EPOCH pulses per epoch and snaps to
+    its target once it is at most STEPS_PER_EPOCH pulses away. The other joints are scaled
+    to arrive in the same epoch.
+    """
+    steps = int(np.max(np.abs(np.asarray(end) - np.asarray(start)), initial=0))
+    return math.ceil(steps / STEPS_PER_EPOCH)
+
+
+def move_time(start: Sequence[int], end: Sequence[int]) -> float:
+    """
+    Upper bound in seconds of the time the firmware needs to move from start to end
+    """
+    return move_epochs(start, end) * EPOCH
+
+
+@dataclass(frozen=True)
+class Segment:
+    """
+    A move from start to end commanded at start_time
+
+    The firmware runs its first epoch at most one EPOCH after the command, so the move is
+    done at the latest at end_time.
+    """
+    start_time: float       # s
+    start: np.ndarray       # pulses
+    end: np.ndarray         # pulses
+    epochs: int
+
+    @property
+    def end_time(self) -> float:
+        return self.start_time + self.epochs * EPOCH
+
+    def pose_at(self, t: float) -> np.ndarray:
+        if self.epochs == 0 or t >= self.end_time:
+            return self.end
+        k = max(math.floor((t - self.start_time) / EPOCH), 0)
+        return np.round(self.start + (self.end - self.start) * k / self.epochs).astype(int)
+
+
+class MotionModel:
+    """
+    Predict the motion of Hubert from the commands sent to it
+
+    The firmware moves every servo synchronously at a fixed rate, so the time a move takes
+    and the pose along the way follow from the pulses alone. The model needs to know the
+    pose once, after that it follows every move, sequence, launch and reload melody.
+    Predicted times are upper bounds, they are at most one epoch late.
+    """
+
+    def __init__(self, clock: Clock = SYSTEM_CLOCK) -> None:
+        self.clock = clock
+        self.pose: Optional[np.ndarray] = None      # pulses, the pose before the first segment, None if unknown
+        self.segments: list[Segment] = []
+        self.target: Optional[np.ndarray] = None    # pulses, the pose at the end of the last commanded move
+        self.launch_end: Optional[float] = None     # s, when the latest launch is done
+
+    @property
+    def known(self) -> bool:
+        return self.pose is not None
+
+    def reset(self, pulses: Sequence[int]):
+        """
+        Set the pose of Hubert, which has to be at rest
+        """
+        self.pose = self._clip(pulses)
+        self.target = self.pose
+        self.segments = []
+
+    def forget(self):
+        self.pose = None
+        self.segments = []
+
+    def settle(self):
+        """
+        Hubert reported that it is not moving, so it is at the last commanded pose
+        """
+        if self.target is not None:
+            self.reset(self.target)
+
+    def pose_at(self, t: Optional[float] = None) -> Optional[np.ndarray]:
+        """
+        Return the predicted pose in pulses at time t, or None if the pose is unknown
+        """
+        if self.pose is None:
+            return None
+        t = self.clock.monotonic() if t is None else t
+        for segment in self.segments:
+            if t < segment.end_time:
+                return segment.pose_at(t)
+        return self.segments[-1].end if self.segments else self.pose
+
+    def move(self, pulses: Sequence[int], t: Optional[float] = None):
+        """
+        A single move, which cancels any ongoing sequence and starts from the current pose
+        """
+        t = self.clock.monotonic() if t is None else t
+        end = self._clip(pulses)
+        self.target = end
+
+        start = self.pose_at(t)
+        if start is None:
+            return
+        self.pose = start
+        self.segments = [Segment(t, start, end, move_epochs(start, end))]
+
+    def queue(self, poses: Sequence[Sequence[int]], t: Optional[float] = None):
+        """
+        A sequence, which starts once the current move is done and replaces any queued waypoints
+        """
+        t = self.clock.monotonic() if t is None else t
+        ends = [self._clip(p) for p in poses]
+        self.target = ends[-1]
+
+        start = self.pose_at(t)
+        if start is None:
+            return
+
+        # The move in progress is finished first, waypoints that have not started are replaced
+        current = next((s for s in self.segments if s.start_time <= t < s.end_time), None)
+        if current is None:
+            self.pose = start
+            self.segments = []
+            start_time = t
+        else:
+            self.pose = current.start
+            self.segments = [current]
+            start_time, start = current.end_time, current.end
+
+        for end in ends:
+            segment = Segment(start_time, start, end, move_epochs(start, end))
+            self.segments.append(segment)
+            start_time, start = segment.end_time, end
+
+    def launch(self, t: Optional[float] = None):
+        """
+        A launch, the firmware ignores it while a launch is in progress
+        """
+        t = self.clock.monotonic() if t is None else t
+        if self.launch_end is None or t >= self.launch_end:
+            self.launch_end = t + LAUNCH_TIME
+
+    def block(self, seconds: float, t: Optional[float] = None):
+        """
+        The firmware main loop is blocked for seconds, everything in progress is delayed
+        """
+        t = self.clock.monotonic() if t is None else t
+        segments = []
+        for s in self.segments:
+            if s.end_time <= t:
+                segments.append(s)
+            elif s.start_time <= t:
+                # The pose freezes, the rest of the move starts when the firmware is free again
+                done = max(math.floor((t - s.start_time) / EPOCH), 0)
+                segments.append(Segment(t + seconds, s.pose_at(t), s.end, s.epochs - done))
+            else:
+                segments.append(Segment(s.start_time + seconds, s.start, s.end, s.epochs))
+        self.segments = segments
+        if self.launch_end is not None and self.launch_end > t:
+            self.launch_end += seconds
+
+    @property
+    def move_end(self) -> Optional[float]:
+        """
+        When every commanded move is done, None if that is unknown
+        """
+        if self.pose is None:
+            return None
+        return self.segments[-1].end_time if self.segments else -math.inf
+
+    @property
+    def idle_time(self) -> Optional[float]:
+        """
+        When Hubert is idle, None if that is unknown
+        """
+        move_end = self.move_end
+        if move_end is None:
+            return None
+        return max(move_end, self.launch_end if self.launch_end is not None else -math.inf)
+
+    def _clip(self, pulses: Sequence[int]) -> np.ndarray:
+        pulses = np.asarray(pulses, dtype=int)
+        if len(pulses) == N_SERVOS:
+            pulses = np.clip(pulses, POS_MIN, POS_MAX)
+        return pulses
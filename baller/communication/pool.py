@@ -0,0 +1,205 @@
+import math
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from threading import Lock
+from typing import Callable, Optional
+import numpy as np
+
+from baller.communication.clock import Clock, SYSTEM_CLOCK
+from baller.communication.hubert import Hubert, HubertStatus
+from baller.communication.motion import LAUNCH_TIME, move_time
+
+
+Target = tuple[float, float, float]
+
+
+@dataclass
+class Arm:
+    """
+    One Hubert in a pool
+
+    aim maps a target in world coordinates to the joint angles (rad) that hit it from this
+    arm, or None if the arm can not reach it. It holds the calibration of the arm, such as
+    where it stands and the velocity of its launcher.
+    """
+    name: str
+    hubert: Hubert
+    aim: Callable[[Target], Optional[dict[str, float]]]
+    pose: Optional[dict[str, float]] = None     # rad, the pose after every queued shot
+    ready_at: float = 0.0                       # s, clock time when every queued shot is estimated to be done
+    shots: int = 0                              # Number of shots assigned to the arm
+    executor: ThreadPoolExecutor = field(init=False, repr=False)
+
+    def __post_init__(self):
+        # Shots on one arm run in order, shots on different arms run concurrently
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"hubert-{self.name}")
+
+
+@dataclass
+class Shot:
+    target: Target
+    arm: Optional[str]              # None if no arm can reach the target
+    eta: float = math.inf           # s, estimated clock time when the shot has been fired
+    future: Optional[Future] = field(default=None, repr=False)
+
+
+def travel_time(hubert: Hubert, start: dict[str, float], end: dict[str, float]) -> float:
+    """
+    Estimate the time in seconds it takes Hubert to move from start to end
+    """
+    joints = sorted(start)
+    pulses = hubert.servo_bank.angles_to_pulses(np.array([[start[j] for j in joints], [end[j] for j in joints]]), units='rad')
+    return move_time(pulses[0], pulses[1])
+
+
+class HubertPool:
+    """
+    Drive several Huberts from one controller
+
+    I/O on different arms runs concurrently on one thread per arm. The dispatcher assigns
+    every target to the arm that is estimated to fire at it first, taking into account the
+    shots that are already queued on each arm.
+    """
+
+    def __init__(self, arms: list[Arm], clock: Clock = SYSTEM_CLOCK, wait_timeout: Optional[float] = None) -> None:
+        """
+        Parameters:
+        - arms (list[Arm]):         The arms in the pool
+        - clock (Clock):            Clock used for the time estimates
+        - wait_timeout (float):     Give up waiting for a motion after this many seconds
+        """
+        assert len(set(arm.name for arm in arms)) == len(arms), "The arms must have unique names"
+        self.arms = {arm.name: arm for arm in arms}
+        self.clock = clock
+        self.wait_timeout = wait_timeout
+        self.dispatch_lock = Lock()
+
+        # Queries must not queue up behind the shots on the arm threads
+        self.io_executor = ThreadPoolExecutor(max_workers=max(len(arms), 1), thread_name_prefix="hubert-pool")
+
+    def map(self, fn: Callable[[Hubert], object]) -> dict[str, object]:
+        """
+        Call fn on every Hubert concurrently and return the results by arm name
+        """
+        futures = {name: self.io_executor.submit(fn, arm.hubert) for name, arm in self.arms.items()}
+        return {name: future.result() for name, future in futures.items()}
+
+    def connect(self) -> dict[str, float]:
+        """
+        Connect every Hubert and return the time to ready of each arm
+        """
+        return self.map(lambda hubert: hubert.connect())
+
+    def statuses(self) -> dict[str, HubertStatus]:
+        return self.map(lambda hubert: hubert.status)
+
+    @property
+    def status(self) -> HubertStatus:
+        """
+        The combined status of the pool
+
+        The pool is moving or launching if any arm is, idle if every arm is idle and not
+        connected if any arm is not connected.
+        """
+        statuses = list(self.statuses().values())
+        if any(HubertStatus.NOT_CONNECTED in s for s in statuses):
+            return HubertStatus.NOT_CONNECTED
+
+        status = HubertStatus(0)
+        for s in statuses:
+            status |= s & (HubertStatus.MOVING | HubertStatus.LAUNCHING)
+        return status if status else HubertStatus.IDLE
+
+    def assign(self, target: Target) -> Shot:
+        """
+        Pick the arm that is estimated to fire at target first and reserve it
+        The shot is not started, see dispatch
+        """
+        now = self.clock.monotonic()
+        best: Optional[tuple[float, Arm, dict[str, float]]] = None
+        for arm in self.arms.values():
+            joints = arm.aim(target)
+            if joints is None:
+                continue
+            if arm.pose is None:
+                arm.pose = arm.hubert.get_pose(units='rad')
+            pose = {**arm.pose, **joints}
+            eta = max(arm.ready_at, now) + travel_time(arm.hubert, arm.pose, pose) + LAUNCH_TIME
+            if best is None or eta < best[0]:
+                best = (eta, arm, pose)
+
+        if best is None:
+            return Shot(target, None)
+
+        eta, arm, pose = best
+        arm.pose = pose
+        arm.ready_at = eta
+        arm.shots += 1
+        return Shot(target, arm.name, eta)
+
+    def dispatch(self, targets: list[Target]) -> list[Shot]:
+        """
+        Assign every target to an arm and start shooting
+        Each shot has a future that completes when the projectile has been launched
+        """
+        shots = []
+        with self.dispatch_lock:
+            for target in targets:
+                shot = self.assign(target)
+                if shot.arm is not None:
+                    arm = self.arms[shot.arm]
+                    shot.future = arm.executor.submit(self._shoot, arm.hubert, dict(arm.pose))
+                shots.append(shot)
+        return shots
+
+    def wait(self, shots: list[Shot]) -> float:
+        """
+        Wait until every dispatched shot is done and return the time spent waiting in seconds
+        """
+        start = self.clock.monotonic()
+        for shot in shots:
+            if shot.future is not None:
+                shot.future.result()
+        return self.clock.monotonic() - start
+
+    def close(self):
+        for arm in self.arms.values():
+            arm.executor.shutdown(wait=True)
+        self.io_executor.shutdown(wait=True)
+
+    def _shoot(self, hubert: Hubert, pose: dict[str, float]):
+        hubert.set_pose(units='rad', **pose)
+        hubert.wait_unitl_idle(timeout=self.wait_timeout)
+        hubert.launch()
+        hubert.wait_unitl_idle(timeout=self.wait_timeout)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+
+if __name__ == '__main__':
+    from baller.communication.clock import ScaledClock
+    from baller.communication.emulator import HubertEmulator, N_SERVOS
+    from baller.communication.hubert import Servo
+
+    # Emulated arms that stand 0.3 m apart and aim with j1 only, to show how hits per minute
+    # scale with the number of arms
+    rng = np.random.default_rng(0)
+    targets = [(1.0, float(y), 0.2) for y in rng.uniform(-0.6, 0.6, size=24)]
+
+    for n_arms in (1, 2, 3):
+        clock = ScaledClock(speedup=20.0)
+        arms = []
+        for i in range(n_arms):
+            base = 0.3 * (i - (n_arms - 1) / 2)
+            hubert = Hubert(f"emulator{i}", 57600, [Servo([-90, 90], [600, 2400]) for _ in range(N_SERVOS)], clock=clock)
+            hubert.connect(transport=HubertEmulator(clock=clock))
+            arms.append(Arm(f"arm{i}", hubert, lambda t, base=base: {'j1': float(np.arctan2(t[1] - base, t[0]))}))
+
+        with HubertPool(arms, clock=clock) as pool:
+            shots = pool.dispatch(targets)
+            elapsed = pool.wait(shots)
+        print(f"{n_arms} arms: {len(targets)} shots in {elapsed:.1f} s, {60 * len(targets) / elapsed:.1f} shots per minute")
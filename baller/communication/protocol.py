@@ -0,0 +1,97 @@
+from dataclasses import dataclass
+from typing import Callable
+
+
+# Framed protocol
+#
+# Every frame is
+#   SOF | seq | cmd | len | payload (len bytes) | crc
+# where crc is a CRC-8 (polynomial 0x07) over seq, cmd, len and the payload.
+# Every request is answered by a frame with the same sequence id. Frames sent by the
+# firmware on its own, such as completion notifications, use sequence id 0.
+
+PROTOCOL_VERSION = 1
+LEGACY_PROTOCOL = 0
+
+SOF = 0x7E
+HEADER_SIZE = 3                 # seq, cmd and len
+MAX_PAYLOAD = 255
+
+NOTIFICATION_SEQ = 0
+
+HELLO_MAGIC = b'HB'             # The firmware answers a legacy hello with HB, version, number of servos
+HELLO_SIZE = len(HELLO_MAGIC) + 2
+
+
+class HubertProtocolError(RuntimeError):
+    """
+    Raised when a frame is corrupt, missing or rejected by the firmware
+    """
+
+
+@dataclass(frozen=True)
+class Frame:
+    seq: int
+    cmd: int
+    payload: bytes = b''
+
+
+def crc8(data: bytes, crc: int = 0) -> int:
+    """
+    CRC-8 with polynomial 0x07, the same implementation as in the firmware
+    """
+    for b in data:
+        crc ^= b
+        for _ in range(8):
+            crc = ((crc << 1) ^ 0x07) & 0xFF if crc & 0x80 else (crc << 1) & 0xFF
+    return crc
+
+
+def encode_frame(frame: Frame) -> bytes:
+    if len(frame.payload) > MAX_PAYLOAD:
+        raise ValueError(f"A frame payload can be at most {MAX_PAYLOAD} bytes, got {len(frame.payload)}")
+    body = bytes([frame.seq, frame.cmd, len(frame.payload)]) + frame.payload
+    return bytes([SOF]) + body + bytes([crc8(body)])
+
+
+def read_frame(read: Callable[[int], bytes]) -> Frame:
+    """
+    Read one frame using read, which behaves like serial.Serial.read
+
+    Bytes before the start of frame marker are skipped so the reader resynchronises
+    after a dropped or corrupted byte.
+
+    Raises:
+    - HubertProtocolError:  If the link times out or the checksum does not match
+    """
+    while True:
+        b = read(1)
+        if len(b) == 0:
+            raise HubertProtocolError("Timed out waiting for a frame")
+        if b[0] == SOF:
+            break
+
+    header = read(HEADER_SIZE)
+    if len(header) < HEADER_SIZE:
+        raise HubertProtocolError("Timed out reading a frame header")
+
+    seq, cmd, length = header
+    rest = read(length + 1)
+    if len(rest) < length + 1:
+        raise HubertProtocolError(f"Timed out reading a frame with {length} bytes of payload")
+
+    payload, crc = rest[:-1], rest[-1]
+    if crc8(header + payload) != crc:
+        raise HubertProtocolError(f"Checksum mismatch in frame {seq}")
+
+    return Frame(seq, cmd, bytes(payload))
+
+
+def decode_hello(bs: bytes) -> tuple[int, int]:
+    """
+    Decode the answer to a hello request into the protocol version and the number of servos
+    Legacy firmware does not answer, which gives the legacy protocol version and zero servos
+    """
+    if len(bs) != HELLO_SIZE or bs[:len(HELLO_MAGIC)] != HELLO_MAGIC:
+        return LEGACY_PROTOCOL, 0
+    return bs[len(HELLO_MAGIC)], bs[len(HELLO_MAGIC) + 1]
@@ -0,0 +1,221 @@
+import struct
+from dataclasses import dataclass
+from typing import BinaryIO, Iterator, Literal, Optional
+
+from baller.communication.clock import Clock, SYSTEM_CLOCK
+
+
+# Session file
+#
+# The file starts with MAGIC followed by one record per write or read on the serial link
+#   direction (1 byte, w or r) | timestamp (float64) | duration (float32) | length (uint16) | data
+# where timestamp is the time in seconds since the start when the call returned and duration
+# is how long the call took.
+# A read that timed out is recorded with the bytes it did return, possibly none.
+
+MAGIC = b'HBSESS1\n'
+RECORD_HEADER = struct.Struct('<cdfH')
+
+WRITE = b'w'
+READ = b'r'
+
+
+class SessionMismatchError(RuntimeError):
+    """
+    Raised when the host writes something else than what was recorded
+    """
+
+
+@dataclass(frozen=True)
+class SessionEvent:
+    direction: Literal[b'w', b'r']
+    timestamp: float    # s since the start of the session when the call returned
+    duration: float     # s, time spent in the call
+    data: bytes
+
+
+def write_event(f: BinaryIO, event: SessionEvent):
+    f.write(RECORD_HEADER.pack(event.direction, event.timestamp, event.duration, len(event.data)))
+    f.write(event.data)
+
+
+def read_session(f: BinaryIO) -> Iterator[SessionEvent]:
+    if f.read(len(MAGIC)) != MAGIC:
+        raise ValueError("Not a Hubert session file")
+    while True:
+        header = f.read(RECORD_HEADER.size)
+        if len(header) < RECORD_HEADER.size:
+            return
+        direction, timestamp, duration, length = RECORD_HEADER.unpack(header)
+        yield SessionEvent(direction, timestamp, duration, f.read(length))
+
+
+def load_session(path: str) -> list[SessionEvent]:
+    with open(path, 'rb') as f:
+        return list(read_session(f))
+
+
+class RecordingTransport:
+    """
+    Wrap a serial connection and record every byte that passes through it
+
+    Everything else, such as timeout and the buffer resets, is passed on to the wrapped
+    connection unchanged.
+    """
+
+    def __init__(self, transport, path: str, clock: Clock = SYSTEM_CLOCK) -> None:
+        """
+        Parameters:
+        - transport:        The serial connection, anything that behaves like serial.Serial
+        - path (str):       The session file to write
+        - clock (Clock):    Clock used for the timestamps
+        """
+        self.transport = transport
+        self.clock = clock
+        self.start = clock.monotonic()
+        self.file = open(path, 'wb')
+        self.file.write(MAGIC)
+
+    def write(self, data: bytes) -> int:
+        start = self.clock.monotonic()
+        n = self.transport.write(data)
+        self._record(WRITE, start, bytes(data))
+        return n
+
+    def read(self, size: int = 1) -> bytes:
+        start = self.clock.monotonic()
+        bs = self.transport.read(size)
+        self._record(READ, start, bs)
+        return bs
+
+    def close(self):
+        if not self.file.closed:
+            self.file.close()
+        self.transport.close()
+
+    def _record(self, direction: bytes, start: float, data: bytes):
+        now = self.clock.monotonic()
+        write_event(self.file, SessionEvent(direction, now - self.start, now - start, data))
+
+    def __getattr__(self, name: str):
+        return getattr(self.transport, name)
+
+    def __setattr__(self, name: str, value):
+        if name == 'timeout':
+            setattr(self.transport, name, value)
+        else:
+            super().__setattr__(name, value)
+
+
+class ReplayTransport:
+    """
+    Play back a recorded session in place of a serial connection
+
+    Every write from the host is checked against the recording. A recorded reply becomes
+    available as long after the write that preceded it as it did in the recording, divided
+    by speed, so the latency of the robot is reproduced however fast the host code runs.
+
+    The host has to send the same bytes as when the session was recorded, which includes the
+    number of status polls. Host code that polls should therefore run on the same kind of
+    clock as during the recording, a VirtualClock for sessions recorded against the emulator.
+    """
+
+    def __init__(self, path: str, clock: Clock = SYSTEM_CLOCK, speed: float = 1.0, strict: bool = True) -> None:
+        """
+        Parameters:
+        - path (str):       The session file to play back
+        - clock (Clock):    Clock used to wait for replies
+        - speed (float):    How much faster than recorded the replies arrive
+        - strict (bool):    Raise a SessionMismatchError if the host writes something else than was recorded
+        """
+        assert speed > 0, "The speed must be positive"
+        self.events = load_session(path)
+        self.clock = clock
+        self.speed = speed
+        self.strict = strict
+        self.timeout: Optional[float] = None
+
+        self.position = 0                   # Index of the next event
+        self.pending = bytearray()          # Bytes of the current read event that have not been read
+        self.written = bytearray()          # Bytes written by the host that are not yet matched to a write event
+        self.recorded_write_time = 0.0      # s, recorded time of the latest write
+        self.replay_write_time = clock.monotonic()
+
+    def write(self, data: bytes) -> int:
+        self.written.extend(data)
+        while self.written:
+            event = self._next_event()
+            if event is None or event.direction != WRITE:
+                if self.strict:
+                    raise SessionMismatchError(f"The host wrote {bytes(self.written)!r} which is not in the session")
+                break
+            n = min(len(event.data), len(self.written))
+            if self.strict and bytes(self.written[:n]) != event.data[:n]:
+                raise SessionMismatchError(f"The host wrote {bytes(self.written)!r}, the session has {event.data!r}")
+            if n < len(event.data):
+                # Wait for the rest of the recorded write
+                break
+            del self.written[:n]
+            self.position += 1
+            # A write blocks while the bytes go out on the link
+            if event.duration > 0:
+                self.clock.sleep(event.duration / self.speed)
+            self.recorded_write_time = event.timestamp
+            self.replay_write_time = self.clock.monotonic()
+        return len(data)
+
+    def read(self, size: int = 1) -> bytes:
+        bs = bytearray()
+        while len(bs) < size:
+            if not self.pending:
+                event = self._next_event()
+                if event is None or event.direction != READ:
+                    break
+                self._wait_for(event)
+                self.position += 1
+                if len(event.data) == 0:
+                    # A timeout in the recording
+                    break
+                self.pending.extend(event.data)
+            n = min(size - len(bs), len(self.pending))
+            bs.extend(self.pending[:n])
+            del self.pending[:n]
+        return bytes(bs)
+
+    @property
+    def in_waiting(self) -> int:
+        if self.pending:
+            return len(self.pending)
+        # The host read next in the recording, so the reply had arrived when it looked
+        event = self._next_event()
+        if event is None or event.direction != READ:
+            return 0
+        self._wait_for(event)
+        return len(event.data)
+
+    @property
+    def done(self) -> bool:
+        """
+        True when the whole session has been played back
+        """
+        return self.position >= len(self.events) and not self.pending
+
+    def reset_input_buffer(self):
+        pass
+
+    def reset_output_buffer(self):
+        pass
+
+    def close(self):
+        pass
+
+    def _next_event(self) -> Optional[SessionEvent]:
+        return self.events[self.position] if self.position < len(self.events) else None
+
+    def _due(self, event: SessionEvent) -> float:
+        return self.replay_write_time + (event.timestamp - self.recorded_write_time) / self.speed
+
+    def _wait_for(self, event: SessionEvent):
+        remaining = self._due(event) - self.clock.monotonic()
+        if remaining > 0:
+            self.clock.sleep(remaining)
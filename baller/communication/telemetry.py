@@ -0,0 +1,109 @@
+from dataclasses import dataclass
+from threading import Event, Thread
+from typing import Callable, Generic, Optional, TypeVar
+
+from baller.communication.clock import Clock, SYSTEM_CLOCK
+
+
+T = TypeVar('T')
+
+
+@dataclass(frozen=True)
+class Snapshot(Generic[T]):
+    value: T
+    timestamp: float    # s, clock time when the value was sampled
+
+
+class TelemetryService(Generic[T]):
+    """
+    Sample a value on a background thread at a fixed rate
+
+    Readers never take a lock. Every sample is stored as a new immutable Snapshot that
+    replaces the previous one with a single reference assignment, so a reader always
+    sees either the old or the new snapshot in full.
+    """
+
+    def __init__(self, sample: Callable[[], T], rate: float = 20.0, clock: Clock = SYSTEM_CLOCK, name: str = "telemetry") -> None:
+        """
+        Parameters:
+        - sample (Callable):    Called once per period to produce a new value
+        - rate (float):         Samples per second
+        - clock (Clock):        Clock used for timestamps and for sleeping between samples
+        - name (str):           Name of the background thread
+        """
+        assert rate > 0, "The sample rate must be positive"
+        self.sample = sample
+        self.rate = rate
+        self.clock = clock
+        self.name = name
+
+        self.snapshot: Optional[Snapshot[T]] = None
+        self.errors = 0
+        self.last_error: Optional[Exception] = None
+
+        self._stop = Event()
+        self._thread: Optional[Thread] = None
+
+    @property
+    def period(self) -> float:
+        return 1.0 / self.rate
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        if self.running:
+            raise RuntimeError("The telemetry service is already running")
+        self._stop.clear()
+        self._thread = Thread(target=self._run, name=self.name, daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None):
+        """
+        Stop the background thread and wait for it to finish its current sample
+        """
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def sample_once(self) -> Snapshot[T]:
+        """
+        Take a sample now and publish it
+        """
+        snapshot = Snapshot(self.sample(), self.clock.monotonic())
+        self.snapshot = snapshot
+        return snapshot
+
+    def latest(self, max_age: Optional[float] = None) -> Optional[Snapshot[T]]:
+        """
+        Return the latest snapshot, or None if there is none or it is older than max_age seconds
+        """
+        snapshot = self.snapshot
+        if snapshot is None:
+            return None
+        if max_age is not None and self.clock.monotonic() - snapshot.timestamp > max_age:
+            return None
+        return snapshot
+
+    def _run(self):
+        while not self._stop.is_set():
+            start = self.clock.monotonic()
+            try:
+                self.sample_once()
+            except Exception as e:
+                # Keep sampling, readers notice the missing samples through the snapshot age
+                self.errors += 1
+                self.last_error = e
+
+            remaining = self.period - (self.clock.monotonic() - start)
+            if remaining > 0:
+                self.clock.sleep(remaining)
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *_):
+        self.stop()
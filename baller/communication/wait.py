@@ -0,0 +1,111 @@
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Iterator, Optional
+import asyncio
+import time
+
+from baller.communication.clock import Clock, SYSTEM_CLOCK
+
+
+class WaitTimeout(TimeoutError):
+    """
+    Raised when a wait did not complete before its deadline
+    """
+
+    def __init__(self, timeout: float, elapsed: float) -> None:
+        super().__init__(f"Condition was not met within {timeout:.3f} s (waited {elapsed:.3f} s)")
+        self.timeout = timeout
+        self.elapsed = elapsed
+
+
+@dataclass(frozen=True)
+class PollSchedule:
+    """
+    Adaptive polling schedule used when waiting for Hubert
+
+    The first poll happens after initial_delay seconds. After that the interval between
+    polls starts at min_interval and is multiplied by backoff after every poll until it
+    reaches max_interval. Short motions are therefore detected quickly while long
+    motions do not flood the serial link with status requests.
+    """
+    initial_delay: float = 0.0      # s, delay before the first poll
+    min_interval: float = 0.01      # s, interval after the first poll
+    max_interval: float = 0.1       # s, the interval never grows past this
+    backoff: float = 1.5            # Growth factor of the interval
+
+    def __post_init__(self):
+        assert self.initial_delay >= 0, "The initial delay can not be negative"
+        assert 0 < self.min_interval <= self.max_interval, "Intervals must satisfy 0 < min_interval <= max_interval"
+        assert self.backoff >= 1, "The backoff factor must be at least 1"
+
+    def intervals(self) -> Iterator[float]:
+        """
+        Yield the sleep time before each poll, indefinitely
+        """
+        yield self.initial_delay
+        interval = self.min_interval
+        while True:
+            yield interval
+            interval = min(interval * self.backoff, self.max_interval)
+
+
+def wait_until(condition: Callable[[], bool], schedule: PollSchedule = PollSchedule(), timeout: Optional[float] = None, clock: Clock = SYSTEM_CLOCK) -> float:
+    """
+    Poll condition according to schedule until it returns True
+
+    Parameters:
+    - condition (Callable):     Called once per poll, the wait ends when it returns True
+    - schedule (PollSchedule):  When to poll
+    - timeout (float):          Give up after this many seconds. Wait forever if None
+    - clock (Clock):            The clock used to sleep and measure time
+
+    Returns:
+    - elapsed (float):          The time spent waiting in seconds
+
+    Raises:
+    - WaitTimeout:              If the condition was not met before the timeout
+    """
+    start = clock.monotonic()
+    deadline = None if timeout is None else start + timeout
+
+    for interval in schedule.intervals():
+        if deadline is not None:
+            # Never sleep past the deadline, poll one last time at the deadline instead
+            interval = min(interval, max(deadline - clock.monotonic(), 0.0))
+        if interval > 0:
+            clock.sleep(interval)
+
+        if condition():
+            return clock.monotonic() - start
+
+        if deadline is not None and clock.monotonic() >= deadline:
+            raise WaitTimeout(timeout, clock.monotonic() - start)
+
+    raise RuntimeError("The poll schedule ended before the condition was met")
+
+
+async def async_wait_until(condition: Callable[[], Awaitable[bool]], schedule: PollSchedule = PollSchedule(), timeout: Optional[float] = None) -> float:
+    """
+    Coroutine version of wait_until, condition is awaited once per poll
+
+    Returns:
+    - elapsed (float):          The time spent waiting in seconds
+
+    Raises:
+    - WaitTimeout:              If the condition was not met before the timeout
+    """
+    start = time.monotonic()
+    deadline = None if timeout is None else start + timeout
+
+    for interval in schedule.intervals():
+        if deadline is not None:
+            interval = min(interval, max(deadline - time.monotonic(), 0.0))
+        if interval > 0:
+            await asyncio.sleep(interval)
+
+        if await condition():
+            return time.monotonic() - start
+
+        if deadline is not None and time.monotonic() >= deadline:
+            raise WaitTimeout(timeout, time.monotonic() - start)
+
+    raise RuntimeError("The poll schedule ended before the condition was met")
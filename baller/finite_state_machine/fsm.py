@@ -1,14 +1,21 @@
 import cv2
+from concurrent.futures import Future
 from dataclasses import dataclass
 from enum import Enum, IntEnum, auto
 import numpy as np
 import time
+from typing import Optional
 
 from baller.communication.hubert import Hubert
 from baller.image_analysis.image_analysis import get_target_position, get_magazine_count
 from baller.image_analysis.pixel_coordinates_to_spatial import pixel_to_spatial
 from baller.image_analysis.calibrate import calibrate_camera
-from baller.inverse_kinematics.ik import target_pos_to_joint_angles
+from baller.inverse_kinematics.batch import solve_batch
+from baller.inverse_kinematics.cache import IKCache
+from baller.inverse_kinematics.multistart import MultiStartSolver
+from baller.inverse_kinematics.reachability import reachability_map
+from baller.finite_state_machine.schedule import schedule
+from baller.trajectory_solver.trajectory_solver import BallisticsModel, default_model
 from baller.model.pose_model import StaticPose
 from baller.image_analysis.gestures import thumb_recognizer
 from baller.utils.hubert.forward_kinematics import launcher_pos
@@ -47,11 +54,21 @@ class QuitMainLoop(Exception):
 
 class FSM:
 
-    def __init__(self, hubert: Hubert, target_plane: float, interactive: int = 0, verbose: int = 0, posefile: str = "pose.yml") -> None:
+    def __init__(self, hubert: Hubert, target_plane: float, interactive: int = 0, verbose: int = 0, posefile: str = "pose.yml", wait_timeout: Optional[float] = None, ik_cache: Optional[IKCache] = None, multistart: Optional[MultiStartSolver] = None, model: Optional[BallisticsModel] = None) -> None:
         self.camera = cv2.VideoCapture(0)
         
         self.hubert = hubert
         self.target_plane = target_plane
+        self.wait_timeout = wait_timeout
+        self.ik_cache = ik_cache     # Targets tend to recur at the same spots across reloads
+        self.model = model if model is not None else default_model()
+        # Re-solves targets that the first solve misses, started now so the first miss does not wait for the workers.
+        # A solver passed in belongs to the caller, one created here is shut down by close
+        self._owns_multistart = multistart is None
+        self.multistart = multistart if multistart is not None else MultiStartSolver()
+        self.multistart.warm()
+        # Every target lies in the target plane, build its map now instead of during the first shot cycle
+        self.reachability = reachability_map(self.target_plane, *self._joint_limits(), self.model)
 
         self.interactive = interactive
         self.verbose = verbose
@@ -60,6 +77,8 @@ class FSM:
         self.state = OperationState.IDLE
         self.magazine_count = 0
         self.targets: list[Target] = []
+        self.solutions: list[tuple[float, float, float, float]] = []    # Joint angles and miss distance of every target, in the same order
+        self._next_refined = False      # True once the solution of the next shot has been through multi-start
         self.pixel_to_meter_ratio = 0
         self.camera_offset = 0
 
@@ -68,8 +87,7 @@ class FSM:
 
     def calibrate(self):
         # Reset the pose
-        self.pose_model.take_pose('home')
-        self.hubert.wait_unitl_idle()
+        self._take_pose('home')
 
         frame = self.read_frame()
 
@@ -90,7 +108,7 @@ class FSM:
     def targeting(self):
         # Reset the pose
         self.hubert.set_pose(j1=0.0, j4=0.0, j5=10.0, units='deg')
-        self.hubert.wait_unitl_idle()
+        self._wait_until_idle("targeting pose")
 
         frame = self.read_frame()
 
@@ -113,6 +131,20 @@ class FSM:
             VerbosityLevel.Debug,
         )
 
+        # Drop the targets that can not be hit before spending any time on them
+        reachable = [t for t in self.targets if self._reachable(t)]
+        if len(reachable) < len(self.targets):
+            self._print(
+                f"Skipping {len(self.targets) - len(reachable)} unreachable targets",
+                VerbosityLevel.Info,
+            )
+        self.targets = reachable
+
+        # Plan every target at once
+        self.solutions = self._solve_all(self.targets)
+        self._schedule()
+        self._next_refined = False
+
     def run(self):
         """
         Run the main loop
@@ -126,13 +158,22 @@ class FSM:
                 self.run()
             else:
                 print("Returning home")
-                self.pose_model.take_pose('home')
+                self._take_pose('home')
                 print("Quiting Hubert")
+                self.close()
         except Exception as e:
             self._print(f"Unknown exception:\n{e}")
             self._wait_for_interaction("Waitng before quiting", interactivity_level=InteractivityLevel.Manual)
+            self.close()
             raise e
 
+    def close(self):
+        """
+        Shut down the workers of the multi-start solver if the FSM created it
+        """
+        if self._owns_multistart:
+            self.multistart.close()
+
     def _loop(self):
         while True:
             if self.state == OperationState.IDLE:
@@ -174,13 +215,11 @@ class FSM:
             "Press enter to start Hubert",
             interactivity_level=InteractivityLevel.Autonomous,
         )
-        self.pose_model.take_pose('home')
-        self.hubert.wait_unitl_idle()
+        self._take_pose('home')
         self.calibrate()
     
     def reloading(self):
-        self.pose_model.take_pose('reload')
-        self.hubert.wait_unitl_idle()
+        self._take_pose('reload')
         self.hubert.play_reload_sound()
 
         if self.interactive > InteractivityLevel.Autonomous:
@@ -194,7 +233,7 @@ class FSM:
         """
         Check the magazine
         """
-        self.pose_model.take_pose("check_magazine")
+        self._take_pose("check_magazine")
         frame = self.read_frame()
         self.magazine_count = get_magazine_count(frame)
 
@@ -212,17 +251,16 @@ class FSM:
         """
         self.magazine_count -= 1
 
+        # Only the first shot after targeting gets here unrefined, later ones are refined during the launch before them
+        self._refine_next()
         target = self.targets.pop()
+        j1, j2, j3, dist = self.solutions.pop()
+        self._next_refined = False
 
         self._print(
             f"Going for target at: {target}",
             VerbosityLevel.Debug,
         )
-        pose = self.hubert.get_pose(units='rad')
-        shoulder_limits = (0.0, np.deg2rad(60.0))
-        elbow_limits = self.hubert.servos[2].servo_range(units='rad')
-        j1, j2, j3, dist = target_pos_to_joint_angles(target.x, target.y, target.z, j1=pose['j1'], j2=pose['j2'], j3=pose['j3'], j2_limits=shoulder_limits, j3_limits=elbow_limits)
-
         if dist > 0.01:
             print(f"No solution found. Will miss target with {dist*100} cm")
 
@@ -233,8 +271,8 @@ class FSM:
 
         self._wait_for_interaction(interactivity_level=InteractivityLevel.Manual)
 
-        self.hubert.set_pose(j1=j1, j2=j2, j3=j3, units='rad')
-        self.hubert.wait_unitl_idle()
+        aiming = self.hubert.submit_pose(j1=j1, j2=j2, j3=j3, units='rad', timeout=self.wait_timeout)
+        self._wait_future(aiming, "aiming")
     
         x, y, z = launcher_pos(j1=j1, j2=j2, j3=j3)    
         self._print(
@@ -247,8 +285,107 @@ class FSM:
             interactivity_level=InteractivityLevel.Assisted,
         )
 
-        self.hubert.launch()
-        self.hubert.wait_unitl_idle()
+        launch = self.hubert.submit_launch(timeout=self.wait_timeout)
+        # The launcher can not move on until it is back, use the time to prepare the next shot
+        self._refine_next()
+        self._wait_future(launch, "launch")
+
+    def _solve_all(self, targets: list[Target]) -> list[tuple[float, float, float, float]]:
+        """
+        Solve for the joint angles that hit every target, starting the search at the current pose
+
+        Misses are left for _refine_next, which runs while the shot before them is launched.
+        """
+        if len(targets) == 0:
+            return []
+        pose = self.hubert.get_pose(units='rad')
+        shoulder_limits, elbow_limits = self._joint_limits()
+        xs, ys, zs = [t.x for t in targets], [t.y for t in targets], [t.z for t in targets]
+        if self.ik_cache is not None:
+            return self.ik_cache.solve_batch(xs, ys, zs, j2=pose['j2'], j3=pose['j3'], j2_limits=shoulder_limits, j3_limits=elbow_limits, model=self.model)
+        solution = solve_batch(xs, ys, zs, j2=pose['j2'], j3=pose['j3'], j2_limits=shoulder_limits, j3_limits=elbow_limits, model=self.model)
+        return [solution[i] for i in range(len(solution))]
+
+    def _refine_next(self):
+        """
+        Solve the next target again from many starting points if the first solve missed it,
+        since that solve can get stuck in a local minimum
+        """
+        if self._next_refined or len(self.targets) == 0:
+            return
+        self._next_refined = True
+
+        target, solution = self.targets[-1], self.solutions[-1]
+        if solution[3] <= 0.01:
+            return
+        shoulder_limits, elbow_limits = self._joint_limits()
+        self.solutions[-1] = self.multistart.solve(target.x, target.y, target.z, shoulder_limits, elbow_limits, best=solution, model=self.model)
+        self._print(
+            f"Multi-start for {target}: miss {solution[3]*100:.1f} cm -> {self.solutions[-1][3]*100:.1f} cm",
+            verbosity_level=VerbosityLevel.Debug,
+        )
+
+    def _schedule(self):
+        """
+        Order the targets to minimize the time spent moving between them
+
+        Shots are popped from the end of the list, so the first shot is put last. If the
+        magazine runs out before the targets do, the path ends in the check magazine pose.
+        """
+        if len(self.targets) < 2:
+            return
+        pose = self.hubert.get_pose(units='rad')
+        joints = sorted(pose)
+
+        def to_pulses(p: dict[str, float]) -> np.ndarray:
+            return self.hubert.servo_bank.angles_to_pulses([p[j] for j in joints], units='rad')
+
+        shots = [to_pulses({**pose, 'j1': j1, 'j2': j2, 'j3': j3}) for j1, j2, j3, _ in self.solutions]
+        end = None
+        if self.magazine_count <= len(self.targets) and 'check_magazine' in self.pose_model.posedict:
+            check = self.pose_model.posedict['check_magazine'][0]
+            end = to_pulses({j: np.deg2rad(check.get(j, np.rad2deg(pose[j]))) for j in joints})
+
+        order = schedule(to_pulses(pose), np.array(shots), end)[::-1]
+        self.targets = [self.targets[i] for i in order]
+        self.solutions = [self.solutions[i] for i in order]
+        self._print(f"Shooting order: {self.targets[::-1]}", VerbosityLevel.Debug)
+
+    def _joint_limits(self) -> tuple[tuple[float, float], tuple[float, float]]:
+        """
+        The shoulder and elbow limits used when aiming, in radians
+        """
+        return (0.0, np.deg2rad(60.0)), tuple(self.hubert.servos[2].servo_range(units='rad'))
+
+    def _reachable(self, target: Target) -> bool:
+        if target.x == self.target_plane:
+            return bool(self.reachability.reachable(target.y, target.z))
+        shoulder_limits, elbow_limits = self._joint_limits()
+        return bool(reachability_map(target.x, shoulder_limits, elbow_limits, self.model).reachable(target.y, target.z))
+
+    def _take_pose(self, posename: str) -> float:
+        """
+        Take a static pose and report how long it took
+        """
+        wait_time = self.pose_model.take_pose(posename, timeout=self.wait_timeout)
+        self._print(f"Pose {posename} took {wait_time:.3f} s", verbosity_level=VerbosityLevel.Debug)
+        return wait_time
+
+    def _wait_until_idle(self, reason: str) -> float:
+        """
+        Wait for Hubert to become idle and report how long it took
+        """
+        wait_time = self.hubert.wait_unitl_idle(timeout=self.wait_timeout)
+        self._print(f"Waited {wait_time:.3f} s for {reason}", verbosity_level=VerbosityLevel.Debug)
+        return wait_time
+
+    def _wait_future(self, future: Future, reason: str) -> float:
+        """
+        Wait for an operation submitted to Hubert to complete and report how long it took
+        """
+        wait_time = future.result()
+        self._print(f"Waited {wait_time:.3f} s for {reason}", verbosity_level=VerbosityLevel.Debug)
+        return wait_time
 
     def _print(self, msg: str, verbosity_level: VerbosityLevel = VerbosityLevel.Error):
         """
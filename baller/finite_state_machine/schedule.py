@@ -0,0 +1,165 @@
+from typing import Optional
+import numpy as np
+
+from baller.communication.firmware import STEPS_PER_EPOCH
+from baller.communication.motion import EPOCH
+
+
+EXACT_LIMIT = 10        # Orders of at most this many shots are solved exactly
+
+
+def travel_times(pulses: np.ndarray) -> np.ndarray:
+    """
+    The time in seconds the firmware needs to move between every pair of poses
+
+    Every joint moves at the same pulse rate and they all arrive together, so the time of a
+    move is set by the joint with the largest pulse delta, see motion.move_time.
+
+    Parameters:
+    - pulses (np.ndarray):  Poses of shape (n, n_servos)
+
+    Returns:
+    - times (np.ndarray):   Shape (n, n), times[i, j] is the time to move from pose i to pose j
+    """
+    pulses = np.asarray(pulses, dtype=int)
+    steps = np.max(np.abs(pulses[:, None, :] - pulses[None, :, :]), axis=2)
+    return np.ceil(steps / STEPS_PER_EPOCH) * EPOCH
+
+
+def path_time(times: np.ndarray, order: list[int], end: bool = False) -> float:
+    """
+    The time to move from the start through the shots in order, and on to the end if there is one
+
+    times is indexed like in order_shots: 0 is the start, 1..n are the shots and n + 1 the end.
+    """
+    nodes = [0] + [i + 1 for i in order] + ([len(times) - 1] if end else [])
+    return float(sum(times[a, b] for a, b in zip(nodes[:-1], nodes[1:])))
+
+
+def order_shots(times: np.ndarray, end: bool = False) -> list[int]:
+    """
+    The order of the shots that minimizes the total travel time
+
+    Parameters:
+    - times (np.ndarray):   Travel times between the start (row 0), the n shots (rows 1..n) and,
+                            if end is True, the pose Hubert goes to after the last shot (row n + 1)
+    - end (bool):           Whether the last row is an end pose
+
+    Returns:
+    - order (list[int]):    The shots by index 0..n-1 in the order they should be fired
+
+    Up to EXACT_LIMIT shots are ordered exactly with Held-Karp, more with nearest neighbour
+    followed by 2-opt.
+    """
+    n = len(times) - 1 - int(end)
+    if n <= 1:
+        return list(range(n))
+    if n <= EXACT_LIMIT:
+        return held_karp(times, end)
+    return two_opt(times, nearest_neighbour(times, end), end)
+
+
+def held_karp(times: np.ndarray, end: bool = False) -> list[int]:
+    """
+    Exact shortest path from the start through every shot, O(n^2 2^n)
+    """
+    n = len(times) - 1 - int(end)
+    shots = times[1:n + 1, 1:n + 1]
+    full = (1 << n) - 1
+
+    # best[mask, j] is the shortest path from the start through the shots in mask, ending at j
+    best = np.full((1 << n, n), np.inf)
+    parent = np.full((1 << n, n), -1, dtype=int)
+    for j in range(n):
+        best[1 << j, j] = times[0, j + 1]
+
+    for mask in range(1, full + 1):
+        for j in range(n):
+            if not mask & (1 << j) or np.isinf(best[mask, j]):
+                continue
+            # Extend the path to every shot that is not in it yet
+            rest = [k for k in range(n) if not mask & (1 << k)]
+            for k in rest:
+                candidate = best[mask, j] + shots[j, k]
+                if candidate < best[mask | (1 << k), k]:
+                    best[mask | (1 << k), k] = candidate
+                    parent[mask | (1 << k), k] = j
+
+    last = best[full] + (times[1:n + 1, n + 1] if end else 0.0)
+    j = int(np.argmin(last))
+    order = []
+    mask = full
+    while j >= 0:
+        order.append(j)
+        mask, j = mask & ~(1 << j), parent[mask, j]
+    return order[::-1]
+
+
+def nearest_neighbour(times: np.ndarray, end: bool = False) -> list[int]:
+    """
+    Always move on to the closest shot that has not been fired
+    """
+    n = len(times) - 1 - int(end)
+    left = set(range(n))
+    order = []
+    node = 0
+    while left:
+        k = min(left, key=lambda k: times[node, k + 1])
+        order.append(k)
+        left.remove(k)
+        node = k + 1
+    return order
+
+
+def two_opt(times: np.ndarray, order: list[int], end: bool = False) -> list[int]:
+    """
+    Reverse parts of the order as long as that makes the path shorter
+    """
+    n = len(order)
+    nodes = [0] + [i + 1 for i in order] + ([len(times) - 1] if end else [])
+    last = len(nodes) - (1 if end else 0)
+
+    improved = True
+    while improved:
+        improved = False
+        for i in range(1, n):
+            for j in range(i + 1, last):
+                # Reverse nodes[i:j + 1], which replaces the edges into nodes[i] and out of nodes[j]
+                before = times[nodes[i - 1], nodes[i]]
+                after = times[nodes[i - 1], nodes[j]]
+                if j + 1 < len(nodes):
+                    before += times[nodes[j], nodes[j + 1]]
+                    after += times[nodes[i], nodes[j + 1]]
+                if after < before - 1e-12:
+                    nodes[i:j + 1] = nodes[i:j + 1][::-1]
+                    improved = True
+    return [node - 1 for node in nodes[1:n + 1]]
+
+
+def schedule(start: np.ndarray, shots: np.ndarray, end: Optional[np.ndarray] = None) -> list[int]:
+    """
+    Order the shots, given as poses in pulses, to minimize the predicted motion time from start to end
+    """
+    poses = [np.asarray(start)[None], np.asarray(shots).reshape(-1, len(start))]
+    if end is not None:
+        poses.append(np.asarray(end)[None])
+    return order_shots(travel_times(np.concatenate(poses)), end=end is not None)
+
+
+if __name__ == '__main__':
+    import time
+
+    rng = np.random.default_rng(0)
+    start = np.full(5, 1500)
+    for n in (4, 8, 10, 20, 40):
+        shots = rng.integers(600, 2400, size=(n, 5))
+        shots[:, 3:] = start[3:]
+        times = travel_times(np.concatenate([start[None], shots]))
+
+        t = time.perf_counter()
+        order = order_shots(times)
+        elapsed = time.perf_counter() - t
+        print(
+            f"{n:>2} shots: {path_time(times, list(range(n))):.2f} s in detection order, "
+            f"{path_time(times, order):.2f} s scheduled, in {1000 * elapsed:.1f} ms"
+        )
@@ -0,0 +1,227 @@
+from dataclasses import dataclass
+from typing import Optional, Union
+import numpy as np
+from scipy.optimize import brentq
+
+import baller.trajectory_solver.trajectory_solver as ts
+from baller.utils.hubert.constants import L2, L3, L4, L5, L6, L7, L8, L9, LAUNCH_PLANE_OFFSET
+
+
+PITCH_MARGIN = 0.1      # rad, keep the pitch this far inside (-90, 90) degrees like the optimizer
+GRID_SIZE = 64          # Number of elbow angles that are checked for sign changes
+
+
+@dataclass(frozen=True)
+class IKSolution:
+    j1: float       # rad, body
+    j2: float       # rad, shoulder
+    j3: float       # rad, elbow
+    dist: float     # m, how far from the target the projectile passes
+
+
+def calculate_yaw_angle(x: float, y: float) -> float:
+    """
+    Given the target positions x- and y-coordinate, return the required yaw angle of Hubert (The body angle)
+
+    Parameters:
+    - x (float): The targets x-coordinate in world coordinates in meters
+    - y (float): The targets y-coordinate in world coordinates in meters
+
+    Returns:
+    - yaw (float):  The yaw angle of Hubert in radians
+    """
+    assert np.all(x > LAUNCH_PLANE_OFFSET), "This function assumes the target plane is far away. The given x-coordinate does not satisfy this condition"
+
+    r_sq = x**2 + y**2
+    sina = (LAUNCH_PLANE_OFFSET*x + y * np.sqrt(r_sq - LAUNCH_PLANE_OFFSET**2)) / r_sq
+    return np.arcsin(sina)
+
+
+@dataclass(frozen=True)
+class LaunchGeometry:
+    """
+    Where and how the launcher points for a set of shoulder and elbow angles, in the vertical
+    plane of the launch
+    """
+    r: np.ndarray           # m, horizontal distance of the launcher from the body axis
+    z: np.ndarray           # m, height of the launcher
+    slope: np.ndarray       # tan of the pitch
+    drop: np.ndarray        # g / (2 V0^2 cos^2 pitch), nan where the launcher points backwards
+
+
+def launch_geometry(j2: Union[float, np.ndarray], j3: Union[float, np.ndarray], model: Optional[ts.BallisticsModel] = None) -> LaunchGeometry:
+    if model is None:
+        model = ts.default_model()
+    pitch = ts.launcher_pitch(j2, j3, model)
+    cos_pitch = np.cos(pitch)
+    return LaunchGeometry(
+        r=L6 + L7 * np.cos(j2) + L8 * np.sin(j2) + L9 * np.sin(j2 + j3),
+        z=L2 + L3 + L7 * np.sin(j2) - L8 * np.cos(j2) - L9 * np.cos(j2 + j3),
+        slope=np.tan(pitch),
+        drop=np.where(cos_pitch > 0, model.g / (2 * model.v0**2 * cos_pitch**2), np.nan),
+    )
+
+
+def impact_height(
+        j1: Union[float, np.ndarray],
+        j2: Union[float, np.ndarray],
+        j3: Union[float, np.ndarray],
+        target_plane: Union[float, np.ndarray],
+        model: Optional[ts.BallisticsModel] = None,
+    ) -> Union[float, np.ndarray]:
+    """
+    Height at which a projectile launched from the pose (j1, j2, j3) passes x = target_plane
+
+    With the yaw from calculate_yaw_angle the projectile always passes the target plane at
+    the right y-coordinate, so the height is the only thing left to solve for. In the vertical
+    plane of the launch the launcher sits at distance r and height z, and the projectile flies
+    d = (target_plane - (L4 - L5) sin j1) / cos j1 - r along the ground.
+
+    Returns nan where the projectile does not reach the target plane.
+    """
+    return impact_height_from(launch_geometry(j2, j3, model), j1, target_plane)
+
+
+def impact_height_from(
+        geometry: LaunchGeometry,
+        j1: Union[float, np.ndarray],
+        target_plane: Union[float, np.ndarray],
+    ) -> Union[float, np.ndarray]:
+    """
+    impact_height for a precomputed launch geometry, which can be shared by many targets
+    """
+    d = (target_plane - (L4 - L5) * np.sin(j1)) / np.cos(j1) - geometry.r
+    height = geometry.z + geometry.slope * d - geometry.drop * d**2
+    return np.where(d > 0, height, np.nan)
+
+
+def elbow_range(
+        j2: Union[float, np.ndarray],
+        j3_limits: tuple[Optional[float], Optional[float]],
+        model: Optional[ts.BallisticsModel] = None,
+    ) -> tuple[Union[float, np.ndarray], Union[float, np.ndarray]]:
+    """
+    The elbow angles that respect j3_limits and keep the pitch inside (-90, 90) degrees
+    """
+    pitch_offset = ts.PITCH_OFFSET if model is None else model.pitch_offset
+    low = PITCH_MARGIN - j2 - pitch_offset
+    high = np.pi - PITCH_MARGIN - j2 - pitch_offset
+    if j3_limits[0] is not None:
+        low = np.maximum(low, j3_limits[0])
+    if j3_limits[1] is not None:
+        high = np.minimum(high, j3_limits[1])
+    return low, high
+
+
+def elbow_grid(
+        j2: np.ndarray,
+        j3_limits: tuple[Optional[float], Optional[float]],
+        grid_size: int = GRID_SIZE,
+        model: Optional[ts.BallisticsModel] = None,
+    ) -> np.ndarray:
+    """
+    Evenly spaced elbow angles over the allowed range for every shoulder angle in j2
+
+    Returns an array of shape (len(j2), grid_size), rows without allowed elbow angles are nan.
+    """
+    low, high = elbow_range(j2, j3_limits, model)
+    j3s = low[:, None] + (high - low)[:, None] * np.linspace(0, 1, grid_size)
+    j3s[low >= high] = np.nan
+    return j3s
+
+
+def refine_roots(
+        yaw: float,
+        j2: float,
+        x: float,
+        z: float,
+        j3s: np.ndarray,
+        errors: np.ndarray,
+        model: Optional[ts.BallisticsModel] = None,
+    ) -> list[float]:
+    """
+    Refine every sign change of errors along the elbow grid j3s with Brent's method
+    """
+    def error(j3: float) -> float:
+        return float(impact_height(yaw, j2, j3, x, model)) - z
+
+    roots = [float(j3) for j3 in j3s[errors == 0]]
+    for i in np.flatnonzero(errors[:-1] * errors[1:] < 0):
+        roots.append(brentq(error, j3s[i], j3s[i + 1], xtol=1e-10))
+    return sorted(roots)
+
+
+def solve_elbow(
+        yaw: float,
+        j2: float,
+        x: float,
+        z: float,
+        j3_limits: tuple[Optional[float], Optional[float]] = (None, None),
+        grid_size: int = GRID_SIZE,
+        model: Optional[ts.BallisticsModel] = None,
+    ) -> list[float]:
+    """
+    Return every elbow angle that hits height z in the target plane x with the shoulder at j2
+
+    The impact height is evaluated on a grid over the allowed elbow angles and every sign
+    change is refined with Brent's method. There are usually two branches, a flat and a
+    lobbed shot.
+    """
+    j3s = elbow_grid(np.array([j2], dtype=float), j3_limits, grid_size, model)[0]
+    errors = impact_height(yaw, j2, j3s, x, model) - z
+    return refine_roots(yaw, j2, x, z, j3s, errors, model)
+
+
+def solve(
+        x: float,
+        z: float,
+        yaw: float,
+        j2: float,
+        j3: float,
+        j2_limits: tuple[Optional[float], Optional[float]] = (None, None),
+        j3_limits: tuple[Optional[float], Optional[float]] = (None, None),
+        grid_size: int = GRID_SIZE,
+        model: Optional[ts.BallisticsModel] = None,
+    ) -> list[IKSolution]:
+    """
+    Return every branch that hits height z in the target plane x with the body at yaw,
+    sorted by how close it is to the pose (j2, j3)
+
+    The shoulder is kept at j2 if there is a solution there. Otherwise the shoulder angle
+    within j2_limits that is closest to j2 and has a solution is used. If there is no
+    solution at all the single pose that passes closest to the target is returned, with the
+    distance it misses by.
+    """
+    j2_low = -np.pi / 2 if j2_limits[0] is None else j2_limits[0]
+    j2_high = np.pi / 2 if j2_limits[1] is None else j2_limits[1]
+    j2 = float(np.clip(j2, j2_low, j2_high))
+
+    # The whole (shoulder, elbow) grid is evaluated at once, the current shoulder first
+    shoulders = np.concatenate([[j2], np.linspace(j2_low, j2_high, grid_size)])
+    if model is None:
+        model = ts.default_model()
+    j3s = elbow_grid(shoulders, j3_limits, grid_size, model)
+    errors = impact_height(yaw, shoulders[:, None], j3s, x, model) - z
+
+    crossings = np.any(errors[:, :-1] * errors[:, 1:] <= 0, axis=1)
+    if crossings[0]:
+        shoulder = 0
+    elif np.any(crossings):
+        candidates = np.flatnonzero(crossings)
+        shoulder = candidates[np.argmin(np.abs(shoulders[candidates] - j2))]
+    else:
+        return [closest_miss(yaw, shoulders, j3s, errors)]
+
+    elbows = refine_roots(yaw, shoulders[shoulder], x, z, j3s[shoulder], errors[shoulder], model)
+    solutions = [IKSolution(yaw, float(shoulders[shoulder]), elbow, 0.0) for elbow in elbows]
+    return sorted(solutions, key=lambda s: (s.j2 - j2)**2 + (s.j3 - j3)**2)
+
+
+def closest_miss(yaw: float, shoulders: np.ndarray, j3s: np.ndarray, errors: np.ndarray) -> IKSolution:
+    """
+    The pose on the search grid that passes closest to the target
+    """
+    if np.all(np.isnan(errors)):
+        return IKSolution(yaw, float(shoulders[0]), 0.0, np.inf)
+    i, k = np.unravel_index(np.nanargmin(np.abs(errors)), errors.shape)
+    return IKSolution(yaw, float(shoulders[i]), float(j3s[i, k]), float(abs(errors[i, k])))
@@ -0,0 +1,182 @@
+from dataclasses import dataclass
+from typing import Optional, Union
+import numpy as np
+
+import baller.trajectory_solver.trajectory_solver as ts
+from baller.inverse_kinematics import analytic
+
+
+CHUNK_SIZE = 256        # Targets evaluated at once, bounds the memory of the search grid
+BISECTIONS = 40         # Halvings of the bracket around every root
+
+
+@dataclass(frozen=True)
+class BatchSolution:
+    """
+    Joint angles for N targets, every field is an array of shape (N,)
+    """
+    j1: np.ndarray          # rad, body
+    j2: np.ndarray          # rad, shoulder
+    j3: np.ndarray          # rad, elbow
+    dist: np.ndarray        # m, how far from the target the projectile passes
+    feasible: np.ndarray    # bool, True where the target is hit within the limits
+
+    def __len__(self) -> int:
+        return len(self.j1)
+
+    def __getitem__(self, i: int) -> tuple[float, float, float, float]:
+        """
+        The solution for target i in the form returned by target_pos_to_joint_angles
+        """
+        return float(self.j1[i]), float(self.j2[i]), float(self.j3[i]), float(self.dist[i])
+
+
+def solve_batch(
+        xs: np.ndarray,
+        ys: np.ndarray,
+        zs: np.ndarray,
+        j2: Union[float, np.ndarray] = 0.0,
+        j3: Union[float, np.ndarray] = 0.0,
+        j2_limits: tuple[Optional[float], Optional[float]] = (None, None),
+        j3_limits: tuple[Optional[float], Optional[float]] = (None, None),
+        grid_size: int = analytic.GRID_SIZE,
+        model: Optional[ts.BallisticsModel] = None,
+    ) -> BatchSolution:
+    """
+    Solve for many targets at once, with the same search as analytic.solve
+
+    Parameters:
+    - xs, ys, zs:           The target positions in the absolute coordinate system
+    - j2, j3:               The current shoulder and elbow angles, one for all targets or one per target
+    - j2_limits:            Limits of the shoulder joint
+    - j3_limits:            Limits of the elbow joint
+    - grid_size (int):      Number of shoulder and elbow angles in the search grid
+    - model:                The launch speed and gravity, see BallisticsModel, with one V0 for all targets
+
+    Returns:
+    - BatchSolution:        Where a target can not be hit, the pose on the grid that passes closest to it
+    """
+    if model is None:
+        model = ts.default_model()
+    xs, ys, zs = (np.atleast_1d(np.asarray(a, dtype=float)) for a in (xs, ys, zs))
+    j2, j3 = (np.broadcast_to(np.asarray(a, dtype=float), xs.shape) for a in (j2, j3))
+
+    j2_low = -np.pi / 2 if j2_limits[0] is None else j2_limits[0]
+    j2_high = np.pi / 2 if j2_limits[1] is None else j2_limits[1]
+    j2 = np.clip(j2, j2_low, j2_high)
+    yaws = analytic.calculate_yaw_angle(xs, ys)
+
+    # The shoulder grid and its elbow grids are shared by every target
+    grid_shoulders = np.linspace(j2_low, j2_high, grid_size)
+    grid_elbows = analytic.elbow_grid(grid_shoulders, j3_limits, grid_size, model)
+    grid = analytic.launch_geometry(grid_shoulders[:, None], grid_elbows, model)
+
+    shoulders = np.empty(xs.shape)
+    elbows = np.empty(xs.shape)
+    dist = np.empty(xs.shape)
+    for start in range(0, len(xs), CHUNK_SIZE):
+        chunk = slice(start, start + CHUNK_SIZE)
+        shoulders[chunk], elbows[chunk], dist[chunk] = _solve_chunk(
+            xs[chunk], zs[chunk], yaws[chunk], j2[chunk], j3[chunk], grid_shoulders, grid_elbows, grid, j3_limits, model,
+        )
+    return BatchSolution(yaws, shoulders, elbows, dist, dist == 0.0)
+
+
+def _solve_chunk(
+        xs: np.ndarray,
+        zs: np.ndarray,
+        yaws: np.ndarray,
+        j2: np.ndarray,
+        j3: np.ndarray,
+        grid_shoulders: np.ndarray,
+        grid_elbows: np.ndarray,
+        grid: analytic.LaunchGeometry,
+        j3_limits: tuple[Optional[float], Optional[float]],
+        model: ts.BallisticsModel,
+    ) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    n = len(xs)
+    grid_size = len(grid_shoulders)
+
+    # First every target tries its current shoulder, shape (n, elbows)
+    j2_best = j2.copy()
+    j3s = analytic.elbow_grid(j2, j3_limits, grid_size, model)
+    errors = analytic.impact_height(yaws[:, None], j2[:, None], j3s, xs[:, None], model) - zs[:, None]
+    crossing = errors[:, :-1] * errors[:, 1:] <= 0
+    dist = np.zeros(n)
+
+    # The rest search the shared shoulder grid, shape (m, shoulders, elbows)
+    rest = np.flatnonzero(~crossing.any(axis=1))
+    if len(rest) > 0:
+        grid_errors = analytic.impact_height_from(
+            grid, yaws[rest, None, None], xs[rest, None, None],
+        ) - zs[rest, None, None]
+        grid_crossing = grid_errors[:, :, :-1] * grid_errors[:, :, 1:] <= 0
+        has_root = grid_crossing.any(axis=2)
+
+        # The closest shoulder with a root
+        distance = np.where(has_root, np.abs(grid_shoulders - j2[rest, None]), np.inf)
+        shoulder = np.argmin(distance, axis=1)
+        found = has_root[np.arange(len(rest)), shoulder]
+
+        hit = rest[found]
+        j2_best[hit] = grid_shoulders[shoulder[found]]
+        j3s[hit] = grid_elbows[shoulder[found]]
+        crossing[hit] = grid_crossing[found, shoulder[found]]
+
+        # Targets without a root get the pose on the grid that passes closest
+        miss = rest[~found]
+        if len(miss) > 0:
+            flat = np.abs(grid_errors[~found]).reshape(len(miss), -1)
+            flat = np.where(np.isnan(flat), np.inf, flat)
+            best = np.argmin(flat, axis=1)
+            i, k = np.unravel_index(best, grid_errors.shape[1:])
+            j2_best[miss] = grid_shoulders[i]
+            j3s[miss] = np.nan_to_num(grid_elbows[i, k])[:, None]
+            dist[miss] = flat[np.arange(len(miss)), best]
+            crossing[miss] = False
+
+    # The root closest to the current elbow angle along the chosen shoulder
+    lows, highs = j3s[:, :-1], j3s[:, 1:]
+    middle = np.where(crossing, np.abs((lows + highs) / 2 - j3[:, None]), np.inf)
+    bracket = np.argmin(middle, axis=1)
+    rows = np.arange(n)
+    j3_best = _bisect(xs, zs, yaws, j2_best, lows[rows, bracket], highs[rows, bracket], model)
+
+    feasible = dist == 0.0
+    j3_best[~feasible] = j3s[~feasible, 0]
+    return j2_best, j3_best, dist
+
+
+def _bisect(
+        xs: np.ndarray,
+        zs: np.ndarray,
+        yaws: np.ndarray,
+        j2: np.ndarray,
+        low: np.ndarray,
+        high: np.ndarray,
+        model: ts.BallisticsModel,
+    ) -> np.ndarray:
+    """
+    Bisect the impact height error on [low, high] for every target at once
+    """
+    low, high = low.copy(), high.copy()
+    low_error = analytic.impact_height(yaws, j2, low, xs, model) - zs
+    for _ in range(BISECTIONS):
+        middle = (low + high) / 2
+        middle_error = analytic.impact_height(yaws, j2, middle, xs, model) - zs
+        left = low_error * middle_error <= 0
+        high = np.where(left, middle, high)
+        low = np.where(left, low, middle)
+        low_error = np.where(left, low_error, middle_error)
+    return (low + high) / 2
+
+
+if __name__ == '__main__':
+    import time
+    from baller.inverse_kinematics.benchmark import random_targets, J2_LIMITS, J3_LIMITS
+
+    targets = random_targets(10_000)
+    start = time.perf_counter()
+    solution = solve_batch(*targets.T, j2_limits=J2_LIMITS, j3_limits=J3_LIMITS)
+    elapsed = time.perf_counter() - start
+    print(f"{len(solution)} targets in {elapsed:.2f} s, {1e6 * elapsed / len(solution):.1f} us per target, {100 * solution.feasible.mean():.1f} % feasible")
@@ -0,0 +1,75 @@
+import time
+from unittest import mock
+import numpy as np
+
+from baller.inverse_kinematics import ik
+from baller.inverse_kinematics.ik import target_pos_to_joint_angles
+from baller.inverse_kinematics.warm_start import WarmStartIndex
+from baller.trajectory_solver.trajectory_solver import trajectory_solver_from_joints
+from baller.utils.hubert.constants import LAUNCH_PLANE_OFFSET
+
+
+J2_LIMITS = (0.0, np.deg2rad(60))
+J3_LIMITS = (np.deg2rad(-90), np.deg2rad(72))
+
+
+def random_targets(n: int, seed: int = 0) -> np.ndarray:
+    """
+    Targets spread over the target plane in front of Hubert
+    """
+    rng = np.random.default_rng(seed)
+    x = rng.uniform(0.4, 1.2, n)
+    y = rng.uniform(-0.4, 0.3, n) - LAUNCH_PLANE_OFFSET
+    z = rng.uniform(0.0, 0.8, n)
+    return np.stack([x, y, z], axis=1)
+
+
+def run_benchmark(backend: str, targets: np.ndarray, **options) -> dict[str, float]:
+    """
+    Solve for every target and report the time per solve and how often the solution misses
+
+    The miss is measured by flying the solution through the trajectory solver, independently
+    of the distance the backend reports. The optimizer's evaluations of the trajectory and of
+    its jacobian are counted per solve.
+    """
+    times = []
+    misses = []
+    evaluations = []
+    jacobians = []
+    for x, y, z in targets:
+        with mock.patch.object(ik, 'trajectory_solver_from_joints', wraps=trajectory_solver_from_joints) as solver, \
+                mock.patch.object(ik, 'trajectory_jacobian_from_joints', wraps=ik.trajectory_jacobian_from_joints) as jacobian:
+            start = time.perf_counter()
+            j1, j2, j3, _ = target_pos_to_joint_angles(x, y, z, j1=0.0, j2=0.0, j3=0.0, j2_limits=J2_LIMITS, j3_limits=J3_LIMITS, backend=backend, **options)
+            times.append(time.perf_counter() - start)
+        evaluations.append(solver.call_count)
+        jacobians.append(jacobian.call_count)
+
+        _, yt, zt = trajectory_solver_from_joints(j1, j2, j3, target_plane=x)
+        misses.append(np.hypot(yt - y, zt - z))
+
+    times = np.array(times)
+    misses = np.array(misses)
+    return {
+        'mean_ms': 1000 * times.mean(),
+        'p99_ms': 1000 * np.percentile(times, 99),
+        'hits': float(np.mean(misses < 0.01)),
+        'mean_miss_mm': 1000 * misses.mean(),
+        'evaluations': float(np.mean(evaluations)),
+        'jacobians': float(np.mean(jacobians)),
+    }
+
+
+if __name__ == '__main__':
+    targets = random_targets(200)
+    runs = {
+        'slsqp-fd': ('slsqp', {'gradients': False}),
+        'slsqp': ('slsqp', {}),
+        'aim': ('slsqp', {'aim': True}),
+        'warm': ('slsqp', {'warm_start': WarmStartIndex()}),
+        'analytic': ('analytic', {}),
+        'table': ('table', {}),
+    }
+    for name, (backend, options) in runs.items():
+        result = run_benchmark(backend, targets, **options)
+        print(f"{name:>8}: " + ", ".join(f"{k} {v:.3f}" for k, v in result.items()))
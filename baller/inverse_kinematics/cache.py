@@ -0,0 +1,207 @@
+import json
+from collections import OrderedDict
+from pathlib import Path
+from threading import Lock
+from typing import Callable, Optional, Sequence, Union
+
+import baller.trajectory_solver.trajectory_solver as ts
+from baller.inverse_kinematics import lookup
+from baller.inverse_kinematics.batch import solve_batch
+from baller.inverse_kinematics.ik import target_pos_to_joint_angles
+
+
+Limits = tuple[Optional[float], Optional[float]]
+Solution = tuple[float, float, float, float]
+Key = tuple
+
+MAXSIZE = 4096
+RESOLUTION = 0.005      # m, targets closer than this share a solution
+
+
+class IKCache:
+    """
+    A bounded least recently used cache of inverse kinematics solutions
+
+    Targets are quantized to a grid with spacing resolution and the cached solution is the one
+    for the center of the grid cell, so every target in a cell gets the same answer, at most
+    resolution / 2 off along each axis. The key also holds everything else the solution
+    depends on: the ballistics model, the joint limits and the backend. The solution is for the pose Hubert was
+    in when the cell was first solved, later lookups from other poses get the same branch.
+    """
+
+    def __init__(self, maxsize: int = MAXSIZE, resolution: float = RESOLUTION, path: Optional[Union[str, Path]] = None) -> None:
+        """
+        Parameters:
+        - maxsize (int):        The number of solutions to keep, the least recently used is evicted first
+        - resolution (float):   The spacing of the grid targets are quantized to in meters
+        - path (str):           Load the cache from this file if it exists and save it there with save()
+        """
+        assert maxsize > 0, "The cache must hold at least one solution"
+        assert resolution > 0, "The resolution must be positive"
+        self.maxsize = maxsize
+        self.resolution = resolution
+        self.path = None if path is None else Path(path)
+        self.lock = Lock()
+        self.entries: OrderedDict[Key, Solution] = OrderedDict()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        if self.path is not None and self.path.exists():
+            self.load(self.path)
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups > 0 else 0.0
+
+    def quantize(self, x: float, y: float, z: float) -> tuple[int, int, int]:
+        return tuple(round(c / self.resolution) for c in (x, y, z))
+
+    def center(self, cell: tuple[int, int, int]) -> tuple[float, float, float]:
+        return tuple(c * self.resolution for c in cell)
+
+    def key(
+            self,
+            x: float,
+            y: float,
+            z: float,
+            j2_limits: Limits = (None, None),
+            j3_limits: Limits = (None, None),
+            backend: str = 'slsqp',
+            model: Optional[ts.BallisticsModel] = None,
+        ) -> Key:
+        """
+        The key of a target, the target plane is x
+        """
+        if model is None:
+            model = ts.default_model()
+        assert model.scalar, "Solutions are keyed on the model, which needs a single V0"
+        return (self.quantize(x, y, z), model, tuple(j2_limits), tuple(j3_limits), backend)
+
+    def get(self, key: Key) -> Optional[Solution]:
+        with self.lock:
+            solution = self.entries.get(key)
+            if solution is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.entries.move_to_end(key)
+            return solution
+
+    def put(self, key: Key, solution: Solution):
+        with self.lock:
+            self.entries[key] = tuple(float(s) for s in solution)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def solve(
+            self,
+            x: float,
+            y: float,
+            z: float,
+            j1: Optional[float] = None,
+            j2: Optional[float] = None,
+            j3: Optional[float] = None,
+            j2_limits: Limits = (None, None),
+            j3_limits: Limits = (None, None),
+            backend: str = 'slsqp',
+            model: Optional[ts.BallisticsModel] = None,
+            solver: Callable[..., Solution] = target_pos_to_joint_angles,
+            **options,
+        ) -> Solution:
+        """
+        target_pos_to_joint_angles through the cache, options are passed on to the solver
+
+        The returned miss distance is the one for the cell center, the target itself can be
+        missed by up to sqrt(3) * resolution / 2 more.
+        """
+        key = self.key(x, y, z, j2_limits, j3_limits, backend, model)
+        solution = self.get(key)
+        if solution is None:
+            cx, cy, cz = self.center(key[0])
+            solution = solver(cx, cy, cz, j1=j1, j2=j2, j3=j3, j2_limits=j2_limits, j3_limits=j3_limits, backend=backend, model=key[1], **options)
+            self.put(key, solution)
+        return solution
+
+    def solve_batch(
+            self,
+            xs: Sequence[float],
+            ys: Sequence[float],
+            zs: Sequence[float],
+            j2: float = 0.0,
+            j3: float = 0.0,
+            j2_limits: Limits = (None, None),
+            j3_limits: Limits = (None, None),
+            model: Optional[ts.BallisticsModel] = None,
+        ) -> list[Solution]:
+        """
+        batch.solve_batch through the cache, only the targets that miss are solved
+        """
+        if model is None:
+            model = ts.default_model()
+        keys = [self.key(x, y, z, j2_limits, j3_limits, 'batch', model) for x, y, z in zip(xs, ys, zs)]
+        solutions = [self.get(key) for key in keys]
+
+        missing = [i for i, solution in enumerate(solutions) if solution is None]
+        if len(missing) > 0:
+            centers = [self.center(keys[i][0]) for i in missing]
+            solved = solve_batch(*zip(*centers), j2=j2, j3=j3, j2_limits=j2_limits, j3_limits=j3_limits, model=model)
+            for k, i in enumerate(missing):
+                solutions[i] = solved[k]
+                self.put(keys[i], solved[k])
+        return solutions
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+
+    def stats(self) -> dict[str, float]:
+        return {
+            'size': len(self),
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': self.hit_rate,
+        }
+
+    def save(self, path: Optional[Union[str, Path]] = None):
+        """
+        Write the cache as JSON, least recently used first
+
+        The file records the geometry the solutions were computed for, see load.
+        """
+        path = self.path if path is None else Path(path)
+        assert path is not None, "No path to save the cache to"
+        with self.lock:
+            entries = [
+                [list(key[0]), [float(key[1].v0), key[1].g, key[1].pitch_offset], list(key[2]), list(key[3]), key[4], list(solution)]
+                for key, solution in self.entries.items()
+            ]
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, 'w') as f:
+            json.dump({'resolution': self.resolution, 'geometry': lookup.geometry_fingerprint(), 'entries': entries}, f)
+
+    def load(self, path: Union[str, Path]) -> int:
+        """
+        Add the solutions saved in path and return how many were added
+
+        Nothing is added if the file was saved with another resolution, or for another robot
+        geometry.
+        """
+        with open(path) as f:
+            data = json.load(f)
+        if data['resolution'] != self.resolution or data['geometry'] != lookup.geometry_fingerprint():
+            return 0
+        for cell, model, j2_limits, j3_limits, backend, solution in data['entries']:
+            self.put((tuple(cell), ts.BallisticsModel(*model), tuple(j2_limits), tuple(j3_limits), backend), tuple(solution))
+        return len(data['entries'])
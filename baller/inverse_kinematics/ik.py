@@ -1,27 +1,13 @@
 import numpy as np
 from scipy.optimize import minimize
-from typing import Optional
+from typing import Literal, Optional
 
 from baller.utils.hubert.constants import LAUNCH_PLANE_OFFSET
-from baller.trajectory_solver.trajectory_solver import trajectory_solver_from_joints, launcher_pitch
-
-
-def calculate_yaw_angle(x: float, y: float) -> float:
-    """
-    Given the target positions x- and y-coordinate, return the required yaw angle of Hubert (The body angle)
-
-    Parameters:
-    - x (float): The targets x-coordinate in world coordinates in meters
-    - y (float): The targets y-coordinate in world coordinates in meters
-
-    Returns:
-    - yaw (float):  The yaw angle of Hubert in radians
-    """
-    assert x > LAUNCH_PLANE_OFFSET, "This function assumes the target plane is far away. The given x-coordinate does not satisfy this condition"
-
-    r_sq = x**2 + y**2
-    sina = (LAUNCH_PLANE_OFFSET*x + y * np.sqrt(r_sq - LAUNCH_PLANE_OFFSET**2)) / r_sq
-    return np.arcsin(sina)
+from baller.trajectory_solver.trajectory_solver import BallisticsModel, default_model, trajectory_solver_from_joints, trajectory_jacobian_from_joints, launcher_pitch, solve_launch_angle
+from baller.utils.hubert.forward_kinematics import launcher_pos
+from baller.inverse_kinematics import analytic, lookup
+from baller.inverse_kinematics.analytic import calculate_yaw_angle
+from baller.inverse_kinematics.warm_start import WarmStartIndex, HIT_DISTANCE
 
 
 def target_pos_to_joint_angles(
@@ -33,6 +19,11 @@ def target_pos_to_joint_angles(
         j3: Optional[float] = None,
         j2_limits: tuple[Optional[float], Optional[float]] = (None, None),
         j3_limits: tuple[Optional[float], Optional[float]] = (None, None),
+        backend: Literal['slsqp', 'analytic', 'table'] = 'slsqp',
+        gradients: bool = True,
+        warm_start: Optional[WarmStartIndex] = None,
+        aim: bool = False,
+        model: Optional[BallisticsModel] = None,
     ) -> tuple[float, float, float, float]:
     """
     Given a target position return the corresponding joint angles
@@ -41,6 +32,21 @@ def target_pos_to_joint_angles(
     - x (float):        The x position of the target in the absolute coordinate system
     - y (float):        The y position of the target in the absolute coordinate system
     - z (float):        The z position of the target in the absolute coordinate system
+    - j1, j2, j3:       The current pose, the solution closest to it is returned
+    - j2_limits:        Limits of the shoulder joint
+    - j3_limits:        Limits of the elbow joint
+    - backend (str):    slsqp minimizes the miss distance with scipy, analytic finds the
+                        roots of the impact height along the elbow, see analytic.py,
+                        table interpolates the precomputed table from lookup.py and falls
+                        back to analytic where the table has no answer
+    - gradients (bool): Give slsqp the analytic gradients, otherwise it estimates them
+                        with finite differences
+    - warm_start:       Start slsqp from the solution of the closest target solved before
+                        instead of the current pose, and add the solution if it hits
+    - aim (bool):       Start slsqp with the elbow that points the launcher along the low
+                        arc to the target, see aim_elbow
+    - model:            The launch speed, gravity and pitch offset, defaults to the globals
+                        in trajectory_solver
 
     Returns:
     - body rotation (float):        The rotation of the body
@@ -48,41 +54,98 @@ def target_pos_to_joint_angles(
     - elbow rotation (float):       The rotation of the elbow joint
     """
     yaw = calculate_yaw_angle(x, y)
+    if model is None:
+        model = default_model()
 
-    def func(js):
-        _, yt, zt = trajectory_solver_from_joints(yaw, js[0], js[1], target_plane=x)
-        return (yt - y)**2 + (zt - z)**2
-    
     if j2 is None:
         j2 = 0.0
     if j3 is None:
         j3 = 0.0
 
+    if backend == 'table':
+        table = lookup.default_table(model)
+        best = table.solve(x, y, z, yaw, j2_limits=j2_limits, j3_limits=j3_limits, model=model) if table is not None else None
+        if best is not None:
+            return best.j1, best.j2, best.j3, best.dist
+        backend = 'analytic'
+
+    if backend == 'analytic':
+        best = analytic.solve(x, z, yaw, j2, j3, j2_limits=j2_limits, j3_limits=j3_limits, model=model)[0]
+        return best.j1, best.j2, best.j3, best.dist
+
+    def func(js):
+        _, yt, zt = trajectory_solver_from_joints(yaw, js[0], js[1], target_plane=x, model=model)
+        return (yt - y)**2 + (zt - z)**2
+
+    def func_and_grad(js):
+        # The miss and its gradient share the trajectory
+        _, yt, zt = trajectory_solver_from_joints(yaw, js[0], js[1], target_plane=x, model=model)
+        jacobian = trajectory_jacobian_from_joints(yaw, js[0], js[1], target_plane=x, model=model)
+        return (yt - y)**2 + (zt - z)**2, 2 * (yt - y) * jacobian[0] + 2 * (zt - z) * jacobian[1]
+
+    # The pitch grows one to one with j2 and j3
+    pitch_grad = np.array([1.0, 1.0]) if gradients else None
+
+    if warm_start is not None:
+        seed = warm_start.nearest(x, y, z, model=model)
+        if seed is not None:
+            j2, j3 = seed
+        elif aim:
+            j3 = aim_elbow(x, y, z, yaw, j2, j3, model)
+    elif aim:
+        j3 = aim_elbow(x, y, z, yaw, j2, j3, model)
+
     # Constrain j2 and j3 to give a pitch that is in the range (-90, 90)
     constraints = [
         {
             'type': 'ineq',
-            'fun': lambda js: np.pi / 2 - 0.1 + launcher_pitch(js[0], js[1]),
+            'fun': lambda js: np.pi / 2 - 0.1 + launcher_pitch(js[0], js[1], model),
+            'jac': (lambda _: pitch_grad) if gradients else None,
         },
         {
             'type': 'ineq',
-            'fun': lambda js:  np.pi / 2 - 0.1 - launcher_pitch(js[0], js[1]),
+            'fun': lambda js:  np.pi / 2 - 0.1 - launcher_pitch(js[0], js[1], model),
+            'jac': (lambda _: -pitch_grad) if gradients else None,
         }
     ]
 
-    start_pitch = launcher_pitch(j2, j3)
+    start_pitch = launcher_pitch(j2, j3, model)
     if start_pitch <= -np.pi / 2:
         j2 += (-start_pitch - np.pi / 2) + 0.1
     elif start_pitch >= np.pi / 2:
         j2 -= (start_pitch - np.pi / 2) + 0.1
 
-    res = minimize(func, [j2, j3], constraints=constraints, bounds=[j2_limits, j3_limits])
+    if gradients:
+        res = minimize(func_and_grad, [j2, j3], jac=True, constraints=constraints, bounds=[j2_limits, j3_limits])
+    else:
+        res = minimize(func, [j2, j3], constraints=constraints, bounds=[j2_limits, j3_limits])
 
     dist = np.sqrt(func(res.x))
 
     sholder, elbow = res.x
+    if warm_start is not None and dist < HIT_DISTANCE:
+        warm_start.add(x, y, z, sholder, elbow, model=model)
     return yaw, sholder, elbow, dist
 
 
+AIM_ITERATIONS = 5
+
+
+def aim_elbow(x: float, y: float, z: float, yaw: float, j2: float, j3: float, model: Optional[BallisticsModel] = None) -> float:
+    """
+    The elbow angle that launches along the low arc to the target, or j3 if the target is out of range
+
+    The launcher moves with the elbow, so the closed form pitch from trajectory_solver is
+    solved again from where the launcher ends up, AIM_ITERATIONS times.
+    """
+    for _ in range(AIM_ITERATIONS):
+        xl, yl, zl = launcher_pos(yaw, j2, j3)
+        angles = solve_launch_angle(xl, yl, zl, x, y, z, model)
+        if not angles.feasible:
+            break
+        j3 = angles.low - launcher_pitch(j2, 0.0, model)
+    return float(j3)
+
+
 if __name__ == '__main__':
     print(target_pos_to_joint_angles(1.0, 0.0, 0.2))
@@ -0,0 +1,256 @@
+import argparse
+import hashlib
+import inspect
+import json
+import time
+from dataclasses import asdict, dataclass, replace
+from functools import lru_cache
+from pathlib import Path
+from typing import Optional
+import numpy as np
+
+import baller.trajectory_solver.trajectory_solver as ts
+import baller.utils.hubert.constants as constants
+from baller.inverse_kinematics import analytic
+
+
+TABLE_DIR = Path.home() / '.cache' / 'baller'
+REFINE_STEPS = 2        # Newton steps on the elbow after interpolation
+TOLERANCE = 1e-4        # m, a refined solution that misses by more than this is rejected
+DERIVATIVE_STEP = 1e-6  # rad
+
+
+@dataclass(frozen=True)
+class TableSpec:
+    """
+    The grid of a lookup table, every axis is (start, stop, number of points)
+    """
+    x: tuple[float, float, int] = (0.3, 1.5, 25)        # m, target plane
+    y: tuple[float, float, int] = (-0.8, 0.8, 33)       # m
+    z: tuple[float, float, int] = (-0.2, 1.0, 25)       # m
+    v0: tuple[float, float, int] = (1.5, 4.0, 6)        # m/s
+    j2_limits: tuple[float, float] = (0.0, float(np.deg2rad(60)))
+    j3_limits: tuple[float, float] = (float(np.deg2rad(-90)), float(np.deg2rad(72)))
+
+    def axes(self) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        return tuple(np.linspace(*axis) for axis in (self.x, self.y, self.z, self.v0))
+
+    @property
+    def shape(self) -> tuple[int, int, int, int]:
+        return (self.x[2], self.y[2], self.z[2], self.v0[2])
+
+
+@lru_cache(maxsize=None)
+def geometry_fingerprint() -> str:
+    """
+    Identify the robot geometry, which every solution depends on, hashed once per process
+    """
+    h = hashlib.sha256()
+    h.update(inspect.getsource(constants).encode())
+    return h.hexdigest()[:16]
+
+
+def fingerprint(spec: TableSpec, model: Optional[ts.BallisticsModel] = None) -> str:
+    """
+    Identify the robot geometry and ballistics a table was built for
+
+    Any change to constants.py, the launcher pitch offset, gravity or the grid gives a new
+    fingerprint, so a stale table is never used. V0 is an axis of the grid.
+    """
+    if model is None:
+        model = ts.default_model()
+    h = hashlib.sha256()
+    h.update(geometry_fingerprint().encode())
+    h.update(repr((model.pitch_offset, model.g)).encode())
+    h.update(json.dumps(asdict(spec)).encode())
+    return h.hexdigest()[:16]
+
+
+def table_path(spec: TableSpec, directory: Path = TABLE_DIR, model: Optional[ts.BallisticsModel] = None) -> Path:
+    return Path(directory) / f"ik_table_{fingerprint(spec, model)}.npy"
+
+
+def build_table(spec: TableSpec = TableSpec(), model: Optional[ts.BallisticsModel] = None) -> np.ndarray:
+    """
+    Solve for every point of the grid with the analytic backend, with the gravity and pitch
+    offset of model
+
+    Returns an array of shape spec.shape + (2,) with the shoulder and elbow angles, nan where
+    the target can not be hit. Every point starts from the pose (0, 0) so that neighbouring
+    points usually end up on the same branch.
+    """
+    if model is None:
+        model = ts.default_model()
+    xs, ys, zs, v0s = spec.axes()
+    table = np.full(spec.shape + (2,), np.nan)
+    for l, v0 in enumerate(v0s):
+        velocity = replace(model, v0=float(v0))
+        for i, x in enumerate(xs):
+            for j, y in enumerate(ys):
+                yaw = analytic.calculate_yaw_angle(x, y)
+                for k, z in enumerate(zs):
+                    best = analytic.solve(x, z, yaw, 0.0, 0.0, spec.j2_limits, spec.j3_limits, model=velocity)[0]
+                    if best.dist == 0.0:
+                        table[i, j, k, l] = best.j2, best.j3
+    return table
+
+
+def save_table(table: np.ndarray, spec: TableSpec, directory: Path = TABLE_DIR, model: Optional[ts.BallisticsModel] = None) -> Path:
+    path = table_path(spec, directory, model)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    np.save(path, table)
+    # A table that was missing may exist now
+    _tables.clear()
+    return path
+
+
+_tables: dict[tuple[Path, float, float], Optional['LookupTable']] = {}
+
+
+class LookupTable:
+    """
+    Answer inverse kinematics by interpolating a precomputed table
+
+    The interpolated elbow angle is refined with a few Newton steps on the impact height.
+    Targets outside the grid, next to unreachable points or where the interpolation lands
+    between two branches are not answered, the caller falls back to solving.
+    """
+
+    def __init__(self, table: np.ndarray, spec: TableSpec, model: Optional[ts.BallisticsModel] = None) -> None:
+        """
+        Parameters:
+        - table (np.ndarray):   Shoulder and elbow angles from build_table, may be memory mapped
+        - spec (TableSpec):     The grid of the table
+        - model:                The ballistics the table was built with, only its gravity and pitch offset matter
+        """
+        assert table.shape == spec.shape + (2,), f"The table has shape {table.shape}, the spec {spec.shape + (2,)}"
+        self.table = table
+        self.spec = spec
+        self.axes = spec.axes()
+        self.model = ts.default_model() if model is None else model
+
+    @classmethod
+    def load(cls, spec: TableSpec = TableSpec(), directory: Path = TABLE_DIR, model: Optional[ts.BallisticsModel] = None) -> Optional['LookupTable']:
+        """
+        Memory map the table for spec, or return None if it has not been built for the current constants
+        """
+        path = table_path(spec, directory, model)
+        if not path.exists():
+            return None
+        return cls(np.load(path, mmap_mode='r'), spec, model)
+
+    def interpolate(self, x: float, y: float, z: float, v0: float) -> Optional[tuple[float, float]]:
+        """
+        Multilinear interpolation of the shoulder and elbow angles, None outside the grid or next to a hole
+        """
+        index = []
+        weights = []
+        for axis, value in zip(self.axes, (x, y, z, v0)):
+            if not axis[0] <= value <= axis[-1]:
+                return None
+            i = min(int(np.searchsorted(axis, value, side='right')) - 1, len(axis) - 2)
+            index.append(i)
+            weights.append((value - axis[i]) / (axis[i + 1] - axis[i]))
+
+        (i, j, k, l), (wx, wy, wz, wv) = index, weights
+        corners = np.asarray(self.table[i:i + 2, j:j + 2, k:k + 2, l:l + 2])
+        if np.isnan(corners).any():
+            return None
+
+        w = np.einsum('a,b,c,d->abcd', [1 - wx, wx], [1 - wy, wy], [1 - wz, wz], [1 - wv, wv])
+        j2, j3 = np.einsum('abcd,abcde->e', w, corners)
+        return float(j2), float(j3)
+
+    def solve(
+            self,
+            x: float,
+            y: float,
+            z: float,
+            yaw: float,
+            j2_limits: tuple[Optional[float], Optional[float]] = (None, None),
+            j3_limits: tuple[Optional[float], Optional[float]] = (None, None),
+            model: Optional[ts.BallisticsModel] = None,
+        ) -> Optional[analytic.IKSolution]:
+        """
+        Return a pose that hits the target with the body at yaw, or None if the table can not answer
+
+        Tables only answer for the gravity and pitch offset they were built with.
+        """
+        if model is None:
+            model = ts.default_model()
+        if (model.g, model.pitch_offset) != (self.model.g, self.model.pitch_offset):
+            return None
+        guess = self.interpolate(x, y, z, model.v0)
+        if guess is None:
+            return None
+
+        # The elbow is refined first, if that leaves its limits the shoulder is refined instead
+        for joint in (1, 0):
+            pose = refine(guess, joint, x, z, yaw, model)
+            if pose is not None and feasible(pose, j2_limits, j3_limits, model):
+                j2, j3 = pose
+                return analytic.IKSolution(yaw, j2, j3, abs(float(analytic.impact_height(yaw, j2, j3, x, model)) - z))
+        return None
+
+
+def refine(guess: tuple[float, float], joint: int, x: float, z: float, yaw: float, model: Optional[ts.BallisticsModel] = None) -> Optional[tuple[float, float]]:
+    """
+    Newton steps on one joint (0 for the shoulder, 1 for the elbow) towards impact height z
+    Returns None if the pose still misses by more than TOLERANCE.
+    """
+    pose = np.array(guess)
+    step = np.zeros(2)
+    step[joint] = DERIVATIVE_STEP
+
+    def error(pose: np.ndarray) -> float:
+        return float(analytic.impact_height(yaw, pose[0], pose[1], x, model)) - z
+
+    for _ in range(REFINE_STEPS):
+        slope = (error(pose + step) - error(pose - step)) / (2 * DERIVATIVE_STEP)
+        if not np.isfinite(slope) or slope == 0:
+            return None
+        pose[joint] -= error(pose) / slope
+
+    if not abs(error(pose)) < TOLERANCE:
+        return None
+    return float(pose[0]), float(pose[1])
+
+
+def feasible(
+        pose: tuple[float, float],
+        j2_limits: tuple[Optional[float], Optional[float]],
+        j3_limits: tuple[Optional[float], Optional[float]],
+        model: Optional[ts.BallisticsModel] = None,
+    ) -> bool:
+    for angle, (low, high) in zip(pose, (j2_limits, j3_limits)):
+        if (low is not None and angle < low) or (high is not None and angle > high):
+            return False
+    return abs(ts.launcher_pitch(*pose, model)) <= np.pi / 2 - analytic.PITCH_MARGIN
+
+
+def default_table(model: Optional[ts.BallisticsModel] = None) -> Optional[LookupTable]:
+    """
+    The table for the default spec and model, loaded on first use
+
+    The table, or that there is none, is kept per directory, gravity and pitch offset, which
+    is all that the path depends on at runtime. save_table forgets the tables that were missing.
+    """
+    if model is None:
+        model = ts.default_model()
+    key = (TABLE_DIR, model.g, model.pitch_offset)
+    if key not in _tables:
+        _tables[key] = LookupTable.load(directory=TABLE_DIR, model=model)
+    return _tables[key]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Precompute the inverse kinematics lookup table")
+    parser.add_argument('--directory', type=Path, default=TABLE_DIR, help="Where to store the table")
+    args = parser.parse_args()
+
+    spec = TableSpec()
+    start = time.perf_counter()
+    table = build_table(spec)
+    path = save_table(table, spec, args.directory)
+    reachable = np.mean(~np.isnan(table[..., 0]))
+    print(f"Built {path} in {time.perf_counter() - start:.1f} s, {100 * reachable:.1f} % of the grid is reachable")
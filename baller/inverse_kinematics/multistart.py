@@ -0,0 +1,192 @@
+import math
+import os
+import time
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Literal, Optional
+import numpy as np
+
+import baller.trajectory_solver.trajectory_solver as ts
+from baller.inverse_kinematics.ik import target_pos_to_joint_angles
+
+
+Limits = tuple[Optional[float], Optional[float]]
+Solution = tuple[float, float, float, float]
+
+N_SEEDS = 16
+BUDGET = 0.5            # s, wall-clock time to wait for the seeds
+HIT_DISTANCE = 0.01     # m, stop as soon as a seed passes this close to the target
+PITCH_MARGIN = 0.1      # rad, seeds keep the pitch this far inside (-90, 90) degrees like the optimizer
+
+
+def seeds(n: int, j2_limits: Limits, j3_limits: Limits, model: Optional[ts.BallisticsModel] = None) -> list[tuple[float, float]]:
+    """
+    About n starting points spread evenly over the box of joint limits, skipping the ones
+    where the launcher points backwards
+    """
+    j2_low = -np.pi / 2 if j2_limits[0] is None else j2_limits[0]
+    j2_high = np.pi / 2 if j2_limits[1] is None else j2_limits[1]
+    j3_low = -np.pi / 2 if j3_limits[0] is None else j3_limits[0]
+    j3_high = np.pi / 2 if j3_limits[1] is None else j3_limits[1]
+
+    side = math.ceil(math.sqrt(n))
+    # Cell centers, so that no seed sits on a limit
+    j2s = j2_low + (np.arange(side) + 0.5) * (j2_high - j2_low) / side
+    j3s = j3_low + (np.arange(side) + 0.5) * (j3_high - j3_low) / side
+    points = [(float(j2), float(j3)) for j2 in j2s for j3 in j3s]
+    return [p for p in points if abs(ts.launcher_pitch(*p, model)) < np.pi / 2 - PITCH_MARGIN]
+
+
+def _solve_seed(
+        x: float,
+        y: float,
+        z: float,
+        j2: float,
+        j3: float,
+        j2_limits: Limits,
+        j3_limits: Limits,
+        model: ts.BallisticsModel,
+    ) -> Solution:
+    """
+    Run in a worker, which gets the model of the caller since it does not share its globals
+    """
+    try:
+        return target_pos_to_joint_angles(x, y, z, j2=j2, j3=j3, j2_limits=j2_limits, j3_limits=j3_limits, model=model)
+    except AssertionError:
+        # The optimizer stepped to a pose that launches backwards
+        return (0.0, j2, j3, math.inf)
+
+
+def _ready() -> int:
+    return os.getpid()
+
+
+class MultiStartSolver:
+    """
+    Solve from many starting points at once and keep the best solution
+
+    The seeds are fanned out to a pool that lives as long as the solver, so that only the
+    first use pays for starting the workers, see warm.
+    """
+
+    def __init__(
+            self,
+            n_seeds: int = N_SEEDS,
+            budget: float = BUDGET,
+            workers: Optional[int] = None,
+            executor: Literal['process', 'thread'] = 'process',
+        ) -> None:
+        """
+        Parameters:
+        - n_seeds (int):    About this many starting points are spread over the joint limits
+        - budget (float):   Return the best solution found after this many seconds
+        - workers (int):    Size of the pool, defaults to the number of CPUs
+        - executor (str):   Solve in processes, or in threads which share the GIL but start instantly
+        """
+        self.n_seeds = n_seeds
+        self.budget = budget
+        self.workers = workers if workers is not None else (os.cpu_count() or 1)
+        self.pool: Executor = (ProcessPoolExecutor if executor == 'process' else ThreadPoolExecutor)(max_workers=self.workers)
+
+        self.solves = 0
+        self.improved = 0
+        self.timeouts = 0
+
+    def warm(self):
+        """
+        Start every worker and wait until they have imported the solver
+        """
+        for future in [self.pool.submit(_ready) for _ in range(self.workers)]:
+            future.result()
+
+    def solve(
+            self,
+            x: float,
+            y: float,
+            z: float,
+            j2_limits: Limits = (None, None),
+            j3_limits: Limits = (None, None),
+            best: Optional[Solution] = None,
+            model: Optional[ts.BallisticsModel] = None,
+        ) -> Solution:
+        """
+        Solve for the target from every seed and return the solution that passes closest
+
+        Parameters:
+        - x, y, z:          The target position in the absolute coordinate system
+        - j2_limits:        Limits of the shoulder joint
+        - j3_limits:        Limits of the elbow joint
+        - best:             A solution that is already known, it is returned if no seed does better
+        - model:            The ballistics to solve with, defaults to the globals of the trajectory solver
+
+        Returns the first solution that hits within HIT_DISTANCE, or the best one after the budget.
+        Seeds that are still queued then are cancelled, but the ones already running cannot be
+        stopped and keep their workers busy until they finish. That is at most one optimizer run
+        per worker, which delays the next solve by about as long.
+        """
+        self.solves += 1
+        deadline = time.monotonic() + self.budget
+        if model is None:
+            model = ts.default_model()
+        pending: set[Future] = {
+            self.pool.submit(_solve_seed, x, y, z, j2, j3, tuple(j2_limits), tuple(j3_limits), model)
+            for j2, j3 in seeds(self.n_seeds, j2_limits, j3_limits, model)
+        }
+
+        result = best
+        while pending:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                self.timeouts += 1
+                break
+            done, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+            for future in done:
+                solution = future.result()
+                if result is None or solution[3] < result[3]:
+                    result = solution
+            if result is not None and result[3] < HIT_DISTANCE:
+                break
+
+        for future in pending:
+            future.cancel()
+
+        assert result is not None, "No seed finished within the budget"
+        if best is not None and result is not best:
+            self.improved += 1
+        return result
+
+    def close(self):
+        """
+        Shut down the pool without waiting for the seeds that are still running
+        """
+        self.pool.shutdown(wait=False, cancel_futures=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+
+if __name__ == '__main__':
+    from baller.inverse_kinematics.benchmark import random_targets, J2_LIMITS, J3_LIMITS
+
+    targets = random_targets(50)
+    with MultiStartSolver() as solver:
+        start = time.perf_counter()
+        solver.warm()
+        print(f"Warmed {solver.workers} workers in {1000 * (time.perf_counter() - start):.0f} ms")
+
+        single_hits = 0
+        multi_hits = 0
+        start = time.perf_counter()
+        for x, y, z in targets:
+            try:
+                single = target_pos_to_joint_angles(x, y, z, j2=0.0, j3=0.0, j2_limits=J2_LIMITS, j3_limits=J3_LIMITS)
+            except AssertionError:
+                single = (0.0, 0.0, 0.0, math.inf)
+            single_hits += single[3] < HIT_DISTANCE
+            if single[3] >= HIT_DISTANCE:
+                single = solver.solve(x, y, z, J2_LIMITS, J3_LIMITS, best=single)
+            multi_hits += single[3] < HIT_DISTANCE
+        elapsed = time.perf_counter() - start
+        print(f"Hits: {single_hits} of {len(targets)} from one start, {multi_hits} with multi-start on a miss, {1000 * elapsed / len(targets):.1f} ms per target")
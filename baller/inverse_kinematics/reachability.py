@@ -0,0 +1,133 @@
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Optional, Union
+import numpy as np
+
+import baller.trajectory_solver.trajectory_solver as ts
+from baller.inverse_kinematics import analytic
+
+
+Y_RANGE = (-1.0, 1.0)   # m, the part of the target plane that is mapped
+Y_SIZE = 201            # Number of columns in the map
+GRID_SIZE = 128         # Number of shoulder and elbow angles in the sweep
+TOLERANCE = 0.01        # m, a target this close to the reachable region counts as reachable
+
+
+@dataclass(frozen=True)
+class ReachabilityMap:
+    """
+    The heights that can be hit in one target plane
+
+    For every column y of the target plane the body yaw is fixed by calculate_yaw_angle, and
+    the heights that can be hit form the interval [z_low, z_high] swept out by the shoulder
+    and elbow. Between the columns the bounds are interpolated linearly. Columns that can not
+    be hit at all have nan bounds.
+    """
+    target_plane: float     # m
+    ys: np.ndarray          # m, the columns
+    z_low: np.ndarray       # m, the lowest height that can be hit in every column
+    z_high: np.ndarray      # m, the highest height that can be hit in every column
+
+    def bounds(self, y: Union[float, np.ndarray]) -> tuple[np.ndarray, np.ndarray]:
+        """
+        The reachable heights at y, nan outside the map or where nothing can be hit
+        """
+        y = np.asarray(y, dtype=float)
+        inside = (self.ys[0] <= y) & (y <= self.ys[-1])
+        low = np.where(inside, np.interp(y, self.ys, self.z_low), np.nan)
+        high = np.where(inside, np.interp(y, self.ys, self.z_high), np.nan)
+        return low, high
+
+    def distance(self, y: Union[float, np.ndarray], z: Union[float, np.ndarray]) -> Union[float, np.ndarray]:
+        """
+        How far below or above the reachable heights z is, 0 inside and inf where nothing can be hit
+        """
+        low, high = self.bounds(y)
+        distance = np.maximum(np.maximum(low - z, z - high), 0.0)
+        return np.where(np.isnan(distance), np.inf, distance)
+
+    def reachable(self, y: Union[float, np.ndarray], z: Union[float, np.ndarray], tolerance: float = TOLERANCE) -> Union[bool, np.ndarray]:
+        return self.distance(y, z) <= tolerance
+
+    def grid(self, z_range: tuple[float, float], z_size: int) -> np.ndarray:
+        """
+        The map as a boolean grid of shape (len(ys), z_size)
+        """
+        zs = np.linspace(*z_range, z_size)
+        return (self.z_low[:, None] <= zs) & (zs <= self.z_high[:, None])
+
+
+def build_map(
+        target_plane: float,
+        j2_limits: tuple[Optional[float], Optional[float]] = (None, None),
+        j3_limits: tuple[Optional[float], Optional[float]] = (None, None),
+        y_range: tuple[float, float] = Y_RANGE,
+        y_size: int = Y_SIZE,
+        grid_size: int = GRID_SIZE,
+        model: Optional[ts.BallisticsModel] = None,
+    ) -> ReachabilityMap:
+    """
+    Sweep the shoulder and elbow within their limits for every column of the target plane with the ballistics of model
+
+    The sweep is a grid, so heights that are only reached between two grid angles are
+    missed. That makes the map slightly conservative at its edges.
+    """
+    ys = np.linspace(*y_range, y_size)
+    yaws = analytic.calculate_yaw_angle(np.full_like(ys, target_plane), ys)
+
+    j2_low = -np.pi / 2 if j2_limits[0] is None else j2_limits[0]
+    j2_high = np.pi / 2 if j2_limits[1] is None else j2_limits[1]
+    shoulders = np.linspace(j2_low, j2_high, grid_size)
+    elbows = analytic.elbow_grid(shoulders, j3_limits, grid_size, model)
+
+    trajectories = ts.trajectories_from_joints(
+        yaws[:, None, None], shoulders[None, :, None], elbows[None], target_plane, model,
+    )
+    z = np.where(trajectories.feasible & ~np.isnan(elbows), trajectories.z, np.nan).reshape(y_size, -1)
+
+    hit = ~np.all(np.isnan(z), axis=1)
+    z_low = np.full(y_size, np.nan)
+    z_high = np.full(y_size, np.nan)
+    z_low[hit] = np.nanmin(z[hit], axis=1)
+    z_high[hit] = np.nanmax(z[hit], axis=1)
+    return ReachabilityMap(target_plane, ys, z_low, z_high)
+
+
+@lru_cache(maxsize=16)
+def _cached_map(target_plane: float, j2_limits: tuple, j3_limits: tuple, model: ts.BallisticsModel) -> ReachabilityMap:
+    return build_map(target_plane, j2_limits, j3_limits, model=model)
+
+
+def reachability_map(
+        target_plane: float,
+        j2_limits: tuple[Optional[float], Optional[float]] = (None, None),
+        j3_limits: tuple[Optional[float], Optional[float]] = (None, None),
+        model: Optional[ts.BallisticsModel] = None,
+    ) -> ReachabilityMap:
+    """
+    The map for the target plane, joint limits and ballistics, built on first use
+    """
+    if model is None:
+        model = ts.default_model()
+    assert model.scalar, "Maps are cached per model, which needs a single V0"
+    return _cached_map(float(target_plane), tuple(j2_limits), tuple(j3_limits), model)
+
+
+if __name__ == '__main__':
+    import time
+    from baller.inverse_kinematics.benchmark import random_targets, J2_LIMITS, J3_LIMITS
+    from baller.inverse_kinematics.batch import solve_batch
+
+    start = time.perf_counter()
+    reachability = build_map(1.0, J2_LIMITS, J3_LIMITS)
+    print(f"Built the map in {1000 * (time.perf_counter() - start):.1f} ms")
+
+    # Compare against solving
+    targets = random_targets(2000)
+    targets[:, 0] = 1.0
+    solution = solve_batch(*targets.T, j2_limits=J2_LIMITS, j3_limits=J3_LIMITS)
+    start = time.perf_counter()
+    reachable = reachability.reachable(targets[:, 1], targets[:, 2], tolerance=0.0)
+    elapsed = time.perf_counter() - start
+    print(f"Checked {len(targets)} targets in {1e6 * elapsed:.0f} us")
+    print(f"Agrees with the solver on {100 * np.mean(reachable == solution.feasible):.2f} % of the targets")
@@ -0,0 +1,103 @@
+from threading import Lock
+from typing import Optional
+import numpy as np
+from scipy.spatial import cKDTree
+
+import baller.trajectory_solver.trajectory_solver as ts
+
+
+MAXSIZE = 2048
+REBUILD_EVERY = 64      # New solutions are searched linearly until there are this many, then the tree is rebuilt
+V0_SCALE = 0.1          # m per m/s, how far apart two solutions for different V0 are in the index
+HIT_DISTANCE = 1e-3     # m, only solutions that pass at least this close to the target are added
+
+
+class WarmStartIndex:
+    """
+    Nearest neighbour index of solved targets, to seed the optimizer with the joint angles of
+    the closest target that has been hit before
+
+    Targets are indexed by (x, y, z, V0_SCALE * V0) so that solutions for another projectile
+    velocity count as further away. The index holds at most maxsize solutions, the oldest is
+    replaced first. Solutions are kept in a KD-tree that is rebuilt every REBUILD_EVERY
+    additions, the ones added since are searched linearly.
+    """
+
+    def __init__(self, maxsize: int = MAXSIZE) -> None:
+        assert maxsize > 0, "The index must hold at least one solution"
+        self.maxsize = maxsize
+        self.lock = Lock()
+
+        self.points = np.zeros((maxsize, 4))
+        self.joints = np.zeros((maxsize, 2))    # rad, shoulder and elbow
+        self.size = 0
+        self.next = 0                           # Slot of the next solution, the oldest one when the index is full
+
+        self.tree: Optional[cKDTree] = None
+        self.tree_slots = np.zeros(0, dtype=int)    # Slot of every point in the tree
+        self.pending: list[int] = []                # Slots added since the tree was built
+
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return self.size
+
+    @staticmethod
+    def point(x: float, y: float, z: float, model: Optional[ts.BallisticsModel] = None) -> np.ndarray:
+        v0 = ts.V0 if model is None else model.v0
+        assert np.ndim(v0) == 0, "Solutions are indexed by a single V0"
+        return np.array([x, y, z, V0_SCALE * v0])
+
+    def add(self, x: float, y: float, z: float, j2: float, j3: float, model: Optional[ts.BallisticsModel] = None):
+        """
+        Add the shoulder and elbow angles that hit the target (x, y, z) at the V0 of model
+        """
+        with self.lock:
+            slot = self.next
+            self.points[slot] = self.point(x, y, z, model)
+            self.joints[slot] = j2, j3
+            self.next = (self.next + 1) % self.maxsize
+            self.size = min(self.size + 1, self.maxsize)
+
+            # A replaced point may still be in the tree, it is skipped until the next rebuild
+            if slot not in self.pending:
+                self.pending.append(slot)
+            if len(self.pending) >= REBUILD_EVERY:
+                self._rebuild()
+
+    def nearest(self, x: float, y: float, z: float, max_distance: float = np.inf, model: Optional[ts.BallisticsModel] = None) -> Optional[tuple[float, float]]:
+        """
+        The shoulder and elbow angles of the closest solved target, or None if there is none within max_distance
+        """
+        with self.lock:
+            p = self.point(x, y, z, model)
+            best_slot, best_distance = -1, max_distance
+
+            if self.tree is not None:
+                # Points replaced since the rebuild are stale, ask for a few extra neighbours
+                k = min(len(self.pending) + 1, len(self.tree_slots))
+                distances, indices = self.tree.query(p, k=k, distance_upper_bound=max_distance)
+                for distance, i in zip(np.atleast_1d(distances), np.atleast_1d(indices)):
+                    if i < len(self.tree_slots) and self.tree_slots[i] not in self.pending:
+                        if distance < best_distance:
+                            best_slot, best_distance = self.tree_slots[i], distance
+                        break
+
+            if len(self.pending) > 0:
+                distances = np.linalg.norm(self.points[self.pending] - p, axis=1)
+                i = int(np.argmin(distances))
+                if distances[i] < best_distance:
+                    best_slot, best_distance = self.pending[i], distances[i]
+
+            if best_slot < 0:
+                self.misses += 1
+                return None
+            self.hits += 1
+            j2, j3 = self.joints[best_slot]
+            return float(j2), float(j3)
+
+    def _rebuild(self):
+        self.tree_slots = np.arange(self.size)
+        self.tree = cKDTree(self.points[:self.size])
+        self.pending = []
@@ -1,5 +1,6 @@
 from abc import ABC, abstractmethod
-from typing import Literal
+from concurrent.futures import Future
+from typing import Literal, Optional
 
 
 class HubertModel(ABC):
@@ -16,8 +17,42 @@ class HubertModel(ABC):
         Get Huberts pose
         """
 
-    def wait_unitl_idle(self) -> None:
+    def wait_unitl_idle(self, timeout: Optional[float] = None) -> float:
         """
         Wait until Hubert is Idle
+        Return the time spent waiting in seconds
         """
-        pass
\ No newline at end of file
+        return 0.0
+
+    def submit_pose(self, units: Literal['rad', 'deg'] = 'rad', timeout: Optional[float] = None, **joints: float) -> Future:
+        """
+        Set the pose of hubert and return a future that resolves to the time spent waiting
+        for the motion. Models without a background connection complete it before returning
+        """
+        future = Future()
+        try:
+            self.set_pose(units=units, **joints)
+            future.set_result(self.wait_unitl_idle(timeout=timeout))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+    def submit_launch(self, timeout: Optional[float] = None) -> Future:
+        """
+        Launch a projectile and return a future that resolves to the time spent waiting for
+        the launch. Models without a launcher have nothing to wait for
+        """
+        future = Future()
+        future.set_result(0.0)
+        return future
+
+    def move_sequence(self, poses: list[dict[str, float]], units: Literal['rad', 'deg'] = 'rad', timeout: Optional[float] = None) -> float:
+        """
+        Move through a sequence of poses, waiting until each one is reached
+        Return the total time spent waiting in seconds
+        """
+        wait_time = 0.0
+        for pose in poses:
+            self.set_pose(**pose, units=units)
+            wait_time += self.wait_unitl_idle(timeout=timeout)
+        return wait_time
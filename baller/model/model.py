@@ -5,8 +5,9 @@ import time
 
 from baller.utils.hubert.constants import L2, L3, L6, L8, L9
 from baller.utils.hubert.forward_kinematics import joint1pos, joint2pos, joint3pos
-from baller.trajectory_solver.trajectory_solver import trajectory_solver_from_launcher_pos, launcher_pitch
+from baller.trajectory_solver.trajectory_solver import BallisticsModel, solve_trajectories, launcher_pitch
 from baller.model.hubert import HubertModel
+from baller.communication.wait import PollSchedule, wait_until
 
 X_MIN = -L6 - L8 - L9
 X_MAX = L6 + L8 + L9
@@ -14,6 +15,7 @@ Y_MIN = -L6 - L8 - L9
 Y_MAX = L6 + L8 + L9
 Z_MIN = 0
 Z_MAX = L2 + L3 + L8 + L9
+MOTION_TIME = 1.0   # s, the model pretends that every motion takes this long
 
 
 class Model3D:
@@ -73,6 +75,8 @@ class Hubert3DModel(Model3D, HubertModel):
             'j5': 0,
         }
 
+        self.motion_end = time.monotonic()    # When the latest motion is done
+
         # Get the inital arm position
         x, y, z = self._arm_pos()
 
@@ -118,9 +122,14 @@ class Hubert3DModel(Model3D, HubertModel):
         self.artist[0].set_3d_properties(z)
 
         self.update_canvas()
+        self.motion_end = time.monotonic() + MOTION_TIME
 
-    def wait_unitl_idle(self) -> None:
-        time.sleep(1)
+    def wait_unitl_idle(self, timeout: Optional[float] = None) -> float:
+        """
+        Wait until the latest motion is done, like Hubert.wait_unitl_idle
+        Return the time spent waiting in seconds, or raise WaitTimeout after timeout seconds
+        """
+        return wait_until(lambda: time.monotonic() >= self.motion_end, PollSchedule(max_interval=0.05), timeout=timeout)
 
 
 class Launcher3DModel(Model3D):
@@ -131,6 +140,7 @@ class Launcher3DModel(Model3D):
 
         self.hubert = hubert
         self.target_plane = target_plane
+        self.model: Optional[BallisticsModel] = None   # The globals of the trajectory solver until a model is given
 
         x, y, z = self.parabola()
 
@@ -139,28 +149,26 @@ class Launcher3DModel(Model3D):
     def parabola(self) -> tuple[list[float], list[float], list[float]]:
         hand_x, hand_y, hand_z = joint3pos(**self.hubert.joints)
 
-        pitch = launcher_pitch(self.hubert.joints['j2'], self.hubert.joints['j3'])
+        pitch = launcher_pitch(self.hubert.joints['j2'], self.hubert.joints['j3'], self.model)
         yaw = self.hubert.joints['j1']
 
-        _xs = np.linspace(hand_x, self.target_plane)
-        xs = [_xs[0]]
-        ys = [hand_y]
-        zs = [hand_z]
-        for x in _xs[1:]:
-            try:
-                _, y, z = trajectory_solver_from_launcher_pos(hand_x, hand_y, hand_z, pitch=pitch, yaw=yaw, target_plane=x)
-            except AssertionError:
-                break
-            xs.append(x)
-            ys.append(y)
-            zs.append(z)
-        
-        return xs, ys, zs
-    
-    def move_launcher(self, target_plane: Optional[float] = None):
+        xs = np.linspace(hand_x, self.target_plane)
+        trajectory = solve_trajectories(hand_x, hand_y, hand_z, pitch=pitch, yaw=yaw, target_plane=xs[1:], model=self.model)
+
+        # The arc ends where the projectile stops reaching further
+        n = len(xs) - 1 if trajectory.feasible.all() else int(np.argmin(trajectory.feasible))
+        return (
+            [xs[0]] + list(xs[1:n + 1]),
+            [hand_y] + list(trajectory.y[:n]),
+            [hand_z] + list(trajectory.z[:n]),
+        )
+
+    def move_launcher(self, target_plane: Optional[float] = None, model: Optional[BallisticsModel] = None):
         # Get the arm position'
         if target_plane is not None:
             self.target_plane = target_plane
+        if model is not None:
+            self.model = model
 
         x, y, z = self.parabola()
 
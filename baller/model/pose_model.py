@@ -27,16 +27,18 @@ class StaticPose:
         with open(self.posefile, 'r') as f:
             self.posedict = yaml.safe_load(f)
 
-    def take_pose(self, posename: str) -> None:
+    def take_pose(self, posename: str, timeout: Optional[float] = None) -> float:
+        """
+        Move through every waypoint in the pose
+        Return the total time spent waiting for Hubert in seconds
+        """
         assert self.hubert is not None, "Can not take a pose when disconnected from Hubert"
 
         if posename not in self.posedict:
             raise KeyError(f"{posename} is not a recogniced pose")
         
         with self.pose_lock:
-            for pose in self.posedict[posename]:
-                self.hubert.set_pose(**pose, units='deg')
-                self.hubert.wait_unitl_idle()
+            return self.hubert.move_sequence(self.posedict[posename], units='deg', timeout=timeout)
 
     def save_pose_dict(self, posefile: Optional[str] = None) -> None:
         if posefile is not None:
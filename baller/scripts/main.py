@@ -1,19 +1,31 @@
 import matplotlib.pyplot as plt
 from argparse import ArgumentParser, Namespace, Action
 import sys
-from typing import Optional
+from typing import Optional, TYPE_CHECKING
 from threading import Thread
 import functools
+import atexit
+from dataclasses import replace
+import serial
 import numpy as np
 
 from baller.communication.hubert import Servo, Hubert
+from baller.communication.clock import ScaledClock, SYSTEM_CLOCK
+from baller.communication.metrics import LinkMetrics
+from baller.communication.session import RecordingTransport, ReplayTransport
 from baller.model.slider import SliderWindow
 from baller.model.model import Hubert3DModel, Launcher3DModel, Target3DModel
-from baller.inverse_kinematics.ik import target_pos_to_joint_angles, LAUNCH_PLANE_OFFSET
+from baller.inverse_kinematics.ik import LAUNCH_PLANE_OFFSET, target_pos_to_joint_angles
+from baller.inverse_kinematics.cache import IKCache, RESOLUTION
+from baller.inverse_kinematics.warm_start import WarmStartIndex
+from baller.inverse_kinematics.multistart import MultiStartSolver
 import baller.trajectory_solver.trajectory_solver as ts
 from baller.model.pose_model import StaticPose
 from baller.finite_state_machine.fsm import FSM
 
+if TYPE_CHECKING:
+    from baller.communication.emulator import EmulatorServer
+
 
 hubert_com: Optional[Hubert] = None                 # Handles communication with Hubert
 hubert_model: Optional[Hubert3DModel] = None        # A 3D model of Hubert
@@ -25,6 +37,9 @@ pose_recorder: Optional[StaticPose] = None          # Record a pose
 
 sw: Optional[SliderWindow] = None                   # Window for sliders
 fsm: Optional[FSM] = None
+emulator_server: Optional["EmulatorServer"] = None    # Serves a software Hubert when running without hardware
+ik_cache: Optional[IKCache] = None                  # Inverse kinematics solutions of recent targets, only with --ik-cache or --ik-resolution
+warm_start = WarmStartIndex()                       # Seeds the optimizer with the solution of the closest earlier target
 
 servos = [
     Servo([-45, 0, 90], [2070, 1620, 680]),
@@ -43,17 +58,21 @@ def ik_callback(x: float, y: float, z: float, v0: float, **_) -> None:
     assert launcher is not None
     assert target is not None
 
-    ts.V0 = v0
+    model = replace(ts.default_model(), v0=v0)
 
     target.move_target(x, y, z)
     _joints = hubert_model.get_pose(units='rad')
-    j1, j2, j3, dist = target_pos_to_joint_angles(
+    # The cache solves the center of the grid cell of the target, so it is only used when asked for
+    solve = target_pos_to_joint_angles if ik_cache is None else ik_cache.solve
+    j1, j2, j3, dist = solve(
         x, y, z, 
         j1=_joints['j1'], 
         j2=_joints['j2'], 
         j3=_joints['j3'], 
         j2_limits=(0, np.deg2rad(60)),
         j3_limits=servos[2].servo_range(units='rad'),
+        warm_start=warm_start,
+        model=model,
     )
 
     if dist > 0.01:
@@ -64,7 +83,7 @@ def ik_callback(x: float, y: float, z: float, v0: float, **_) -> None:
         launcher.update_color('g')
 
     hubert_model.set_pose(j1=j1, j2=j2, j3=j3, units='rad')
-    launcher.move_launcher(target_plane=x)
+    launcher.move_launcher(target_plane=x, model=model)
 
     if hubert_com is not None:
         joints = hubert_model.get_pose(units='deg')
@@ -75,7 +94,10 @@ def get_pos_callback() -> None:
     assert hubert_com is not None
     assert hubert_pose is not None
 
-    joints = hubert_com.get_pose(units='deg')
+    # Draw the predicted pose when there is one, it costs no serial traffic
+    joints = hubert_com.predicted_pose(units='deg')
+    if joints is None:
+        joints = hubert_com.get_pose(units='deg')
     hubert_pose.set_pose(**joints, units='deg')
 
 
@@ -101,7 +123,6 @@ def setup_target(args: Namespace):
     tx = args.x
     ty = args.y
     tz = args.z
-    ts.V0 = args.v0
 
     hubert_model = Hubert3DModel()
 
@@ -112,7 +133,7 @@ def setup_target(args: Namespace):
     sw.add_slider("x", 0.3, 2.0, tx)
     sw.add_slider("y", -0.5, 0.5, ty)
     sw.add_slider("z", 0.0, 1.0, tz)
-    sw.add_slider("v0", 1.0, 10.0, ts.V0)
+    sw.add_slider("v0", 1.0, 10.0, args.v0)
 
     sw.add_slider_callback(ik_callback)
 
@@ -120,7 +141,7 @@ def setup_target(args: Namespace):
         sw.add_button("launch", [lambda x: hubert_com.launch()])
 
     # Call the callback so that it draws correctly the first time
-    ik_callback(tx, ty, tz, ts.V0)
+    ik_callback(tx, ty, tz, args.v0)
 
 
 def record_pose(posename: str):
@@ -173,8 +194,9 @@ def setup_run(args):
     global fsm, hubert_com
 
     assert hubert_com is not None
-    ts.V0 = args.v0
-    fsm = FSM(hubert_com, target_plane=args.target_plane, interactive=args.interactive, verbose=args.verbose)
+    multistart = MultiStartSolver(n_seeds=args.ik_seeds, budget=args.ik_budget, workers=args.ik_workers)
+    atexit.register(multistart.close)
+    fsm = FSM(hubert_com, target_plane=args.target_plane, interactive=args.interactive, verbose=args.verbose, wait_timeout=args.wait_timeout, ik_cache=ik_cache, multistart=multistart, model=replace(ts.default_model(), v0=args.v0))
 
 
 class NotImplementedAction(Action):
@@ -189,6 +211,15 @@ def parse_args() -> Namespace:
     parser.add_argument('-b', '--baudrate', default=57600, type=int, help="Baudrate of the serial communication")
     parser.add_argument('--conf', action=NotImplementedAction, help="Read connection details from configuration file. Not implemented yet")
     parser.add_argument('-v', '--visual-mode', action='store_true', help="Open a window that displays Huberts real time position (only takes effect if Hubert is connected)")
+    parser.add_argument('--emulate', action='store_true', help="Connect to an emulated Hubert instead of the robot on --port")
+    parser.add_argument('--emulator-speedup', type=float, default=1.0, help="How much faster than real time the emulated Hubert runs")
+    parser.add_argument('--metrics', metavar='FILE', default=None, help="Record serial link statistics and write them as JSON to FILE at exit")
+    parser.add_argument('--record', metavar='FILE', default=None, help="Record the serial session with Hubert to FILE")
+    parser.add_argument('--replay', metavar='FILE', default=None, help="Play back a recorded serial session instead of connecting to Hubert")
+    parser.add_argument('--replay-speed', type=float, default=1.0, help="How much faster than recorded the replayed session runs")
+    parser.add_argument('--telemetry-rate', type=float, default=None, help="Sample Huberts status and pose in the background this many times per second")
+    parser.add_argument('--ik-cache', metavar='FILE', default=None, help="Keep inverse kinematics solutions in FILE between sessions")
+    parser.add_argument('--ik-resolution', type=float, default=None, help=f"Cache inverse kinematics solutions, targets closer than this many meters (default {RESOLUTION}) share a solution that may miss them by up to half of it along each axis")
     
     subparsers = parser.add_subparsers(title="subcommands", required=True)
 
@@ -217,6 +248,10 @@ def parse_args() -> Namespace:
     run_parser.add_argument('--v0', type=float, default=ts.V0, help="Projectile velocity")
     run_parser.add_argument('-i', '--interactive', action="count", default=0, help="Increase interactivity")
     run_parser.add_argument('-v', '--verbose', action="count", default=0, help="Increase verbosity")
+    run_parser.add_argument('--wait-timeout', type=float, default=None, help="Give up waiting for a motion after this many seconds")
+    run_parser.add_argument('--ik-seeds', type=int, default=16, help="Starting points to solve from when the first solve misses a target")
+    run_parser.add_argument('--ik-budget', type=float, default=0.5, help="Seconds to spend solving from the starting points")
+    run_parser.add_argument('--ik-workers', type=int, default=None, help="Processes that solve from the starting points, defaults to the number of CPUs")
 
     return parser.parse_args()
 
@@ -224,16 +259,43 @@ def parse_args() -> Namespace:
 def main():
     args = parse_args()
 
-    global hubert_com, hubert_model, hubert_pose, launcher, sw, target
+    global hubert_com, hubert_model, hubert_pose, launcher, sw, target, emulator_server, ik_cache
 
     if args.conf is not None:
         # Assing variables from configuration file
         raise NotImplementedError("This argument has not yet been implemented")
     
+    if args.ik_cache is not None or args.ik_resolution is not None:
+        ik_cache = IKCache(resolution=args.ik_resolution or RESOLUTION, path=args.ik_cache)
+    if args.ik_cache is not None:
+        atexit.register(ik_cache.save)
+
+    clock = SYSTEM_CLOCK
+    if args.emulate:
+        # Serve an emulated Hubert on a pseudo terminal and connect to it like any other port
+        from baller.communication.emulator import HubertEmulator, EmulatorServer
+        clock = ScaledClock(args.emulator_speedup)
+        emulator_server = EmulatorServer(HubertEmulator(clock=clock, baudrate=args.baudrate))
+        args.port = emulator_server.start()
+
+    transport = None
+    if args.replay is not None:
+        transport = ReplayTransport(args.replay, clock=clock, speed=args.replay_speed)
+        args.port = args.replay
+    elif args.record is not None and args.port is not None:
+        transport = RecordingTransport(serial.Serial(port=args.port, baudrate=args.baudrate, timeout=0.1), args.record, clock=clock)
+        atexit.register(transport.close)
+
     if args.port is not None:
         # Connect to Hubert
-        hubert_com = Hubert(args.port, baudrate=args.baudrate, servos=servos, timeout=0.1)
-        hubert_com.connect()
+        metrics = LinkMetrics(enabled=args.metrics is not None)
+        if metrics.enabled:
+            atexit.register(metrics.dump, args.metrics)
+        hubert_com = Hubert(args.port, baudrate=args.baudrate, servos=servos, timeout=0.1, clock=clock, metrics=metrics)
+        hubert_com.connect(transport=transport)
+        atexit.register(hubert_com.close)
+        if args.telemetry_rate is not None:
+            hubert_com.start_telemetry(rate=args.telemetry_rate)
 
     # Run the correct subcommand
     args.func(args)
@@ -1,5 +1,8 @@
+from dataclasses import dataclass
+from typing import Optional, Union
 import numpy as np
 
+from baller.utils.hubert.constants import L7, L8, L9
 from baller.utils.hubert.forward_kinematics import launcher_pos
 
 
@@ -9,7 +12,93 @@ g = 9.82    # m/s^2
 PITCH_OFFSET = -np.deg2rad(11)
 
 
-def trajectory_solver_from_launcher_pos(x: float, y: float, z: float, pitch: float, yaw: float, target_plane: float) -> tuple[float, float, float]:
+ArrayLike = Union[float, np.ndarray]
+
+
+@dataclass(frozen=True)
+class BallisticsModel:
+    """
+    The launch speed, gravity and launcher pitch offset that every solve depends on
+
+    Solvers take a model instead of reading shared state, so solves for different launch
+    speeds can run side by side in threads or processes. Solvers given no model use
+    default_model, change one field of it with dataclasses.replace.
+
+    v0 may be an array in the vectorized functions of this module, which then broadcast over
+    it to sweep many launch speeds at once. Solvers that cache or key on the model need a
+    single v0, see scalar.
+    """
+    v0: ArrayLike           # m/s
+    g: float                # m/s^2
+    pitch_offset: float     # rad
+
+    @property
+    def scalar(self) -> bool:
+        """
+        Whether the model holds a single launch speed, only then is it hashable
+        """
+        return np.ndim(self.v0) == 0
+
+
+def default_model() -> BallisticsModel:
+    """
+    The model given by the module globals V0, g and PITCH_OFFSET at the time of the call
+    """
+    return BallisticsModel(V0, g, PITCH_OFFSET)
+
+
+@dataclass(frozen=True)
+class Trajectories:
+    """
+    Where projectiles pass their target planes, every field broadcasts over the inputs
+
+    Where feasible is False the projectile never reaches the target plane and the
+    coordinates are nan.
+    """
+    x: np.ndarray           # m, always equal to the target plane
+    y: np.ndarray           # m
+    z: np.ndarray           # m
+    t: np.ndarray           # s, time of flight
+    feasible: np.ndarray    # bool
+
+
+def solve_trajectories(x: ArrayLike, y: ArrayLike, z: ArrayLike, pitch: ArrayLike, yaw: ArrayLike, target_plane: ArrayLike, model: Optional[BallisticsModel] = None) -> Trajectories:
+    """
+    Solve for the trajectories of projectiles launched from positions (x, y, z) with given pitch and yaw angles.
+    All arguments broadcast against each other, so this evaluates many launch states, many target planes
+    along one arc, or both, in one call.
+
+    Parameters:
+    - x, y, z:              The launch positions given in world coordinates (measured in meters)
+    - pitch:                The pitch of the launch (up-down) (measured in radians)
+    - yaw:                  The yaw of the launch (left-right) (measured in radians)
+    - target_plane:         The targets are assumed to be located at x=target_plane
+    - model:                The launch speed and gravity, see BallisticsModel
+
+    Returns:
+    - Trajectories:         The coordinates where the projectiles pass the target planes
+    """
+    if model is None:
+        model = default_model()
+    x, y, z, pitch, yaw, target_plane, v0 = np.broadcast_arrays(*(np.asarray(a, dtype=float) for a in (x, y, z, pitch, yaw, target_plane, model.v0)))
+
+    vx = v0 * np.cos(yaw) * np.cos(pitch)
+    vy = v0 * np.sin(yaw) * np.cos(pitch)
+    vz = v0 * np.sin(pitch)
+
+    dx = target_plane - x
+    feasible = (dx > 0) & (vx > 0)
+
+    # Calculate time of flight
+    t = np.where(feasible, dx / np.where(feasible, vx, 1.0), np.nan)
+
+    yf = y + vy * t
+    zf = z + vz * t - model.g * t**2 / 2
+
+    return Trajectories(np.where(feasible, target_plane, np.nan), yf, zf, t, feasible)
+
+
+def trajectory_solver_from_launcher_pos(x: float, y: float, z: float, pitch: float, yaw: float, target_plane: float, model: Optional[BallisticsModel] = None) -> tuple[float, float, float]:
     """
     Solve for the trajectory of a projectile launched from position (x, y, z) with given pitch and yaw angles.
     Return the coordinates of the projectile when it passes the target_plane.
@@ -21,6 +110,7 @@ def trajectory_solver_from_launcher_pos(x: float, y: float, z: float, pitch: flo
     - pitch (float):        The pitch of the launch (up-down) (measured in radians)
     - yaw: (float):         The yaw of the launch (left-right) (measured in radians)
     - target_plane (float): The target is assumed to be located at x=target_plane
+    - model:                The launch speed and gravity, see BallisticsModel
 
     Returns:
     - xp (float):           The x-coordinate of the projectile in the target plane (always equal to target_plane)
@@ -29,30 +119,133 @@ def trajectory_solver_from_launcher_pos(x: float, y: float, z: float, pitch: flo
     """
     assert target_plane > x, "This algorithm assumes that the target plane is further away than the launch position"
 
-    vx = V0 * np.cos(yaw) * np.cos(pitch)
-    vy = V0 * np.sin(yaw) * np.cos(pitch)
-    vz = V0 * np.sin(pitch)
+    trajectory = solve_trajectories(x, y, z, pitch, yaw, target_plane, model)
 
-    assert vx > 0, f"Projectile will never hit target when vx = {vx}, yaw = {np.rad2deg(yaw)} and pitch = {np.rad2deg(pitch)}"
+    assert trajectory.feasible, f"Projectile will never hit target when yaw = {np.rad2deg(yaw)} and pitch = {np.rad2deg(pitch)}"
+
+    return target_plane, float(trajectory.y), float(trajectory.z)
+
+
+@dataclass(frozen=True)
+class LaunchAngles:
+    """
+    The pitches that send projectiles from their launch positions through given points, every
+    field broadcasts over the inputs
+
+    A reachable point is hit by a low and a high arc, which meet at the edge of the range. The
+    low arc is always the faster one. Where feasible is False the point is out of range at V0,
+    or not ahead of the launcher, and the other fields are nan.
+    """
+    yaw: np.ndarray         # rad, the direction from the launcher to the point
+    low: np.ndarray         # rad, pitch of the low arc
+    high: np.ndarray        # rad, pitch of the high arc
+    t_low: np.ndarray       # s, time of flight of the low arc
+    t_high: np.ndarray      # s, time of flight of the high arc
+    feasible: np.ndarray    # bool
+
+
+def solve_launch_angles(x: ArrayLike, y: ArrayLike, z: ArrayLike, target_plane: ArrayLike, yp: ArrayLike, zp: ArrayLike, model: Optional[BallisticsModel] = None) -> LaunchAngles:
+    """
+    Solve for the pitches that launch projectiles from positions (x, y, z) through the points (target_plane, yp, zp).
+    All arguments broadcast against each other.
+
+    With d the distance along the ground and h the height of the point above the launcher,
+        h = d tan(pitch) - g d^2 (1 + tan^2 pitch) / (2 V0^2)
+    which is a quadratic in tan(pitch) with one root for each arc.
+
+    Parameters:
+    - x, y, z:              The launch positions given in world coordinates (measured in meters)
+    - target_plane:         The x-coordinate of the points
+    - yp, zp:               The y- and z-coordinates of the points in the target plane
+    - model:                The launch speed and gravity, see BallisticsModel
+
+    Returns:
+    - LaunchAngles:         The yaw, both pitches and their times of flight
+    """
+    if model is None:
+        model = default_model()
+    x, y, z, target_plane, yp, zp, v0 = np.broadcast_arrays(*(np.asarray(a, dtype=float) for a in (x, y, z, target_plane, yp, zp, model.v0)))
 
-    # Calculate time of flight
     dx = target_plane - x
-    t = dx / vx
+    d = np.hypot(dx, yp - y)
+    h = zp - z
+    k = model.g * d**2 / (2 * v0**2)
+
+    # k tan^2 + (k + h) - d tan = 0
+    discriminant = d**2 - 4 * k * (k + h)
+    feasible = (dx > 0) & (discriminant >= 0)
+    root = np.sqrt(np.where(feasible, discriminant, 0.0))
+    k = np.where(feasible, k, 1.0)
+
+    # The low root in the form that does not cancel when k is small
+    low = np.where(feasible, np.arctan(2 * (k + h) / (d + root)), np.nan)
+    high = np.where(feasible, np.arctan((d + root) / (2 * k)), np.nan)
+    yaw = np.where(feasible, np.arctan2(yp - y, dx), np.nan)
+
+    return LaunchAngles(yaw, low, high, d / (v0 * np.cos(low)), d / (v0 * np.cos(high)), feasible)
 
-    yf = y + vy * t
-    zf = z + vz * t - g * t**2 / 2
 
-    return target_plane, yf, zf
+def solve_launch_angle(x: float, y: float, z: float, target_plane: float, yp: float, zp: float, model: Optional[BallisticsModel] = None) -> LaunchAngles:
+    """
+    solve_launch_angles for one launch position and point, with floats for fields
+    """
+    angles = solve_launch_angles(x, y, z, target_plane, yp, zp, model)
+    return LaunchAngles(
+        float(angles.yaw), float(angles.low), float(angles.high),
+        float(angles.t_low), float(angles.t_high), bool(angles.feasible),
+    )
 
 
-def launcher_pitch(j2: float, j3: float) -> float:
+def launcher_pitch(j2: float, j3: float, model: Optional[BallisticsModel] = None) -> float:
     """
     Get the launcher position from the robot pose
     """
-    return j2 + j3 + PITCH_OFFSET - np.pi / 2
+    pitch_offset = PITCH_OFFSET if model is None else model.pitch_offset
+    return j2 + j3 + pitch_offset - np.pi / 2
 
 
-def trajectory_solver_from_joints(j1: float, j2: float, j3: float, target_plane: float) -> tuple[float, float, float]:
+def trajectories_from_joints(j1: ArrayLike, j2: ArrayLike, j3: ArrayLike, target_plane: ArrayLike, model: Optional[BallisticsModel] = None) -> Trajectories:
+    """
+    solve_trajectories for projectiles launched from the poses (j1, j2, j3)
+    """
     xl, yl, zl = launcher_pos(j1, j2, j3)
-    pitch = launcher_pitch(j2, j3)
-    return trajectory_solver_from_launcher_pos(xl, yl, zl, pitch, j1, target_plane=target_plane)
+    return solve_trajectories(xl, yl, zl, launcher_pitch(j2, j3, model), j1, target_plane, model)
+
+
+def trajectory_solver_from_joints(j1: float, j2: float, j3: float, target_plane: float, model: Optional[BallisticsModel] = None) -> tuple[float, float, float]:
+    xl, yl, zl = launcher_pos(j1, j2, j3)
+    pitch = launcher_pitch(j2, j3, model)
+    return trajectory_solver_from_launcher_pos(xl, yl, zl, pitch, j1, target_plane=target_plane, model=model)
+
+
+def trajectory_jacobian_from_joints(j1: float, j2: float, j3: float, target_plane: float, model: Optional[BallisticsModel] = None) -> np.ndarray:
+    """
+    The derivatives of where the projectile passes the target plane with respect to the shoulder and elbow
+
+    In the vertical plane of the launch the launcher sits at distance r from the body axis and
+    height h, and the projectile flies d along the ground to the target plane, so
+        zp = h + tan(pitch) d - g d^2 / (2 V0^2 cos^2 pitch)
+    where the pitch grows one to one with j2 and j3, and d shrinks one to one with r.
+
+    Returns:
+    - jacobian (np.ndarray):    [[dyp/dj2, dyp/dj3], [dzp/dj2, dzp/dj3]]
+    """
+    if model is None:
+        model = default_model()
+    xl, _, _ = launcher_pos(j1, j2, j3)
+    pitch = launcher_pitch(j2, j3, model)
+
+    dr = np.array([-L7 * np.sin(j2) + L8 * np.cos(j2) + L9 * np.cos(j2 + j3), L9 * np.cos(j2 + j3)])
+    dh = np.array([L7 * np.cos(j2) + L8 * np.sin(j2) + L9 * np.sin(j2 + j3), L9 * np.sin(j2 + j3)])
+
+    # The launcher moves along (cos j1, sin j1) when r grows, the yaw keeps the direction of flight
+    dx = np.cos(j1) * dr
+    dy = np.sin(j1) * dr - np.tan(j1) * dx
+
+    d = (target_plane - xl) / np.cos(j1)
+    dd = -dr
+    sec2 = 1 / np.cos(pitch)**2
+    tan = np.tan(pitch)
+    dz = dh + d * sec2 + tan * dd - model.g * sec2 * (d * dd + d**2 * tan) / model.v0**2
+
+    return np.array([dy, dz])
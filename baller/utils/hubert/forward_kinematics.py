@@ -1,5 +1,4 @@
 import numpy as np
-import math
 
 from baller.utils.hubert.constants import L2, L3, L4, L5, L6, L7, L8, L9
 from baller.utils.math.matrix import homogenous_transformation_matrix as htm
@@ -22,13 +21,13 @@ def joint2pos(j1: float, j2: float, **_) -> list[float]:
     return [P[0], P[1], P[2]]
 
 def joint3pos(j1: float, j2: float, j3: float, **_) -> list[float]:
-    x = L4*math.sin(j1) - L5*math.sin(j1) + L6*math.cos(j1) + L7*math.cos(j1)*math.cos(j2) + L8*math.sin(j2)*math.cos(j1) + L9*math.sin(j2 + j3)*math.cos(j1)
-    y = -L4*math.cos(j1) + L5*math.cos(j1) + L6*math.sin(j1) + L7*math.sin(j1)*math.cos(j2) + L8*math.sin(j1)*math.sin(j2) + L9*math.sin(j1)*math.sin(j2 + j3)
-    z = L2 + L3 + L7*math.sin(j2) - L8*math.cos(j2) - L9*math.cos(j2 + j3)
+    x = L4*np.sin(j1) - L5*np.sin(j1) + L6*np.cos(j1) + L7*np.cos(j1)*np.cos(j2) + L8*np.sin(j2)*np.cos(j1) + L9*np.sin(j2 + j3)*np.cos(j1)
+    y = -L4*np.cos(j1) + L5*np.cos(j1) + L6*np.sin(j1) + L7*np.sin(j1)*np.cos(j2) + L8*np.sin(j1)*np.sin(j2) + L9*np.sin(j1)*np.sin(j2 + j3)
+    z = L2 + L3 + L7*np.sin(j2) - L8*np.cos(j2) - L9*np.cos(j2 + j3)
     return [x, y, z]
 
 def launcher_pos(j1: float, j2: float, j3: float, **_) -> list[float]:
-    x = L4*math.sin(j1) - L5*math.sin(j1) + L6*math.cos(j1) + L7*math.cos(j1)*math.cos(j2) + L8*math.sin(j2)*math.cos(j1) + L9*math.sin(j2 + j3)*math.cos(j1)
-    y = -L4*math.cos(j1) + L5*math.cos(j1) + L6*math.sin(j1) + L7*math.sin(j1)*math.cos(j2) + L8*math.sin(j1)*math.sin(j2) + L9*math.sin(j1)*math.sin(j2 + j3)
-    z = L2 + L3 + L7*math.sin(j2) - L8*math.cos(j2) - L9*math.cos(j2 + j3)
+    x = L4*np.sin(j1) - L5*np.sin(j1) + L6*np.cos(j1) + L7*np.cos(j1)*np.cos(j2) + L8*np.sin(j2)*np.cos(j1) + L9*np.sin(j2 + j3)*np.cos(j1)
+    y = -L4*np.cos(j1) + L5*np.cos(j1) + L6*np.sin(j1) + L7*np.sin(j1)*np.cos(j2) + L8*np.sin(j1)*np.sin(j2) + L9*np.sin(j1)*np.sin(j2 + j3)
+    z = L2 + L3 + L7*np.sin(j2) - L8*np.cos(j2) - L9*np.cos(j2 + j3)
     return [x, y, z]
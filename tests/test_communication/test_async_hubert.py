@@ -0,0 +1,152 @@
+import asyncio
+import threading
+
+from baller.communication.async_hubert import AsyncHubert
+from baller.communication.hubert import Servo, HubertCommand, HubertStatus
+
+
+class FakeArduino:
+    """
+    Answers status and position requests like the firmware does
+    """
+
+    def __init__(self, pulses: list[int]) -> None:
+        self.pulses = pulses
+        self.writes: list[bytes] = []
+        self.replies = bytearray()
+        self.lock = threading.Lock()
+
+    def write(self, msg: bytes):
+        self.writes.append(msg)
+        i = 0
+        with self.lock:
+            while i < len(msg):
+                cmd = msg[i]
+                i += 1
+                if cmd == HubertCommand.GET_STATUS.value:
+                    self.replies.append(HubertStatus.MOVING)
+                elif cmd == HubertCommand.GET_POSITION.value:
+                    for p in self.pulses:
+                        self.replies.extend(p.to_bytes(2, 'big'))
+                elif cmd == HubertCommand.SET_POSITION.value:
+                    self.pulses = [int.from_bytes(msg[i + 2*j:i + 2*j + 2], 'big') for j in range(len(self.pulses))]
+                    i += 2 * len(self.pulses)
+
+    def read(self, size: int) -> bytes:
+        with self.lock:
+            bs = bytes(self.replies[:size])
+            del self.replies[:size]
+        return bs
+
+    def reset_input_buffer(self):
+        with self.lock:
+            self.replies.clear()
+
+    def close(self):
+        pass
+
+
+def test_concurrent_requests_are_matched():
+    """
+    Assert that replies to pipelined requests reach the right caller
+    """
+    servos = [
+        Servo([0, 1000], [0, 1000]),
+        Servo([0, 1000], [0, 1000]),
+    ]
+    hubert = AsyncHubert("test", 9600, servos)
+    arduino = FakeArduino([100, 200])
+
+    async def run():
+        hubert.arduino = arduino
+        hubert._start_io()
+        results = await asyncio.gather(*[
+            hubert.get_status() if i % 2 else hubert.get_pose(units='deg')
+            for i in range(20)
+        ])
+        await hubert.set_pose(j1=300, j2=400, units='deg')
+        pose = await hubert.get_pose(units='deg')
+        await hubert.close()
+        return results, pose
+
+    results, pose = asyncio.run(run())
+
+    for i, res in enumerate(results):
+        if i % 2:
+            assert res == HubertStatus.MOVING
+        else:
+            assert round(res['j1']) == 100 and round(res['j2']) == 200
+    assert round(pose['j1']) == 300 and round(pose['j2']) == 400
+
+    # The requests were pipelined, so there are fewer writes than requests
+    assert len(arduino.writes) < 22
+
+
+def test_short_read_fails_request():
+    hubert = AsyncHubert("test", 9600, [Servo([0, 1000], [0, 1000])])
+    arduino = FakeArduino([100])
+    arduino.read = lambda size: b''
+
+    async def run():
+        hubert.arduino = arduino
+        hubert._start_io()
+        try:
+            await hubert.get_status()
+        except TimeoutError:
+            return True
+        finally:
+            await hubert.close()
+        return False
+
+    assert asyncio.run(run())
+
+
+def test_read_error_fails_requests():
+    hubert = AsyncHubert("test", 9600, [Servo([0, 1000], [0, 1000])])
+    arduino = FakeArduino([100])
+
+    def read(size: int) -> bytes:
+        raise OSError("Device disconnected")
+    arduino.read = read
+
+    async def run():
+        hubert.arduino = arduino
+        hubert._start_io()
+        results = await asyncio.wait_for(asyncio.gather(hubert.get_status(), hubert.get_status(), return_exceptions=True), 1.0)
+        await hubert.close()
+        return results
+
+    assert all(isinstance(res, OSError) for res in asyncio.run(run()))
+
+
+def test_close_fails_pending_and_reconnects():
+    hubert = AsyncHubert("test", 9600, [Servo([0, 1000], [0, 1000])])
+    arduino = FakeArduino([100])
+    arduino.read = lambda size: threading.Event().wait(0.2) and b''
+
+    async def run():
+        hubert.arduino = arduino
+        hubert._start_io()
+        pending = asyncio.ensure_future(asyncio.gather(hubert.get_status(), hubert.get_status(), return_exceptions=True))
+        await asyncio.sleep(0.05)
+        await hubert.close()
+        results = await asyncio.wait_for(pending, 1.0)
+
+        assert await hubert.get_status() == HubertStatus.NOT_CONNECTED
+        try:
+            await hubert.set_pose(j1=0.0)
+            closed = False
+        except RuntimeError:
+            closed = True
+
+        # Connecting again starts a new I/O thread
+        hubert.arduino = FakeArduino([100])
+        hubert._start_io()
+        status = await hubert.get_status()
+        await hubert.close()
+        return results, closed, status
+
+    results, closed, status = asyncio.run(run())
+    assert all(isinstance(res, ConnectionError) for res in results)
+    assert closed
+    assert status == HubertStatus.MOVING
@@ -0,0 +1,36 @@
+import pytest
+
+from baller.communication.clock import VirtualClock
+from baller.communication.emulator import HubertEmulator, LegacyEmulator, INIT_POS
+from baller.communication.hubert import Servo, Hubert, HubertStatus, HubertConnectionError, PROBE_INTERVAL
+from baller.communication.protocol import PROTOCOL_VERSION, LEGACY_PROTOCOL
+
+
+def connect(mocker, emulator: HubertEmulator, clock: VirtualClock, n_servos: int = len(INIT_POS), **kwargs) -> Hubert:
+    mocker.patch('baller.communication.hubert.serial.Serial', return_value=emulator)
+    servos = [Servo([0, 3000], [0, 3000]) for _ in range(n_servos)]
+    hubert = Hubert("emulator", 57600, servos, timeout=0.1, clock=clock)
+    hubert.connect(**kwargs)
+    return hubert
+
+
+@pytest.mark.parametrize("emulator_type, version", [
+    (HubertEmulator, PROTOCOL_VERSION),
+    (LegacyEmulator, LEGACY_PROTOCOL),
+])
+@pytest.mark.parametrize("boot_time", [0.0, 1500.0])
+def test_connect_waits_for_the_firmware(mocker, emulator_type, version: int, boot_time: float):
+    clock = VirtualClock()
+    hubert = connect(mocker, emulator_type(clock=clock, boot_time=boot_time), clock)
+
+    assert hubert.protocol_version == version
+    assert boot_time / 1000 <= hubert.time_to_ready <= boot_time / 1000 + PROBE_INTERVAL
+    assert hubert.status == HubertStatus.IDLE
+
+
+def test_connect_fails_fast_without_answer(mocker):
+    clock = VirtualClock()
+    with pytest.raises(HubertConnectionError):
+        connect(mocker, HubertEmulator(clock=clock, boot_time=60_000.0), clock, ready_timeout=2.0)
+    assert clock.monotonic() == pytest.approx(2.0)
+
@@ -0,0 +1,51 @@
+import pytest
+
+from baller.communication.clock import ScaledClock, VirtualClock
+from baller.communication.emulator import (
+    HubertEmulator, EmulatorServer, INIT_POS, INTERVAL, LAUNCHER_MAX, LAUNCHER_MIN,
+    LAUNCHER_STEPS_PER_EPOCH, reload_melody_duration,
+)
+from baller.communication.hubert import Servo, Hubert, HubertStatus
+
+
+def test_launch_sequence_timing():
+    clock = VirtualClock()
+    emulator = HubertEmulator(clock=clock)
+    emulator.write(b'l')
+
+    # The launcher travels to the max position and back, one step per epoch
+    epochs = 2 * (LAUNCHER_MAX - LAUNCHER_MIN) // LAUNCHER_STEPS_PER_EPOCH
+    clock.advance((epochs - 1) * (INTERVAL + 1) / 1000)
+    emulator.write(b's')
+    assert emulator.read(1) == bytes([1])
+
+    clock.advance((INTERVAL + 1) / 1000)
+    emulator.write(b's')
+    assert emulator.read(1) == bytes([0])
+
+
+def test_reload_blocks_firmware():
+    clock = VirtualClock()
+    emulator = HubertEmulator(clock=clock)
+    emulator.write(b'rs')
+    assert emulator.read(1) == b''
+
+    clock.advance(reload_melody_duration() / 1000)
+    assert emulator.read(1) == bytes([0])
+
+
+def test_hubert_connects_through_pty():
+    pytest.importorskip("termios")
+    servos = [Servo([0, 3000], [0, 3000]) for _ in INIT_POS]
+    clock = ScaledClock(speedup=20.0)
+
+    with EmulatorServer(HubertEmulator(clock=clock)) as server:
+        hubert = Hubert(server.port, baudrate=57600, servos=servos, timeout=0.5, clock=clock)
+        hubert.connect()
+        assert hubert.status == HubertStatus.IDLE
+
+        pose = {f'j{i+1}': p for i, p in enumerate(INIT_POS)}
+        hubert.set_pose(units='deg', **{**pose, 'j1': 1700})
+        hubert.wait_unitl_idle(timeout=10.0)
+        assert round(hubert.get_pose(units='deg')['j1']) == 1700
+        hubert.arduino.close()
@@ -0,0 +1,52 @@
+import pytest
+
+from baller.communication.clock import ScaledClock, VirtualClock
+from baller.communication.emulator import (
+    HubertEmulator, INIT_POS, STEPS_PER_EPOCH, INTERVAL, LAUNCHER_MIN, LAUNCHER_MAX, LAUNCHER_STEPS_PER_EPOCH,
+)
+from baller.communication.hubert import Servo, Hubert, HubertStatus
+from baller.communication.wait import PollSchedule, WaitTimeout
+
+EPOCH = (INTERVAL + 1) / 1000
+
+
+def create_hubert(clock) -> Hubert:
+    servos = [Servo([0, 3000], [0, 3000]) for _ in INIT_POS]
+    hubert = Hubert("emulator", 57600, servos, clock=clock, poll_schedule=PollSchedule(min_interval=0.001, max_interval=0.001))
+    hubert.connect(transport=HubertEmulator(clock=clock))
+    hubert.set_pose(units='deg', **{f'j{i+1}': p for i, p in enumerate(INIT_POS)})
+    return hubert
+
+
+def test_launch_completes_before_a_longer_motion():
+    # Both futures wait at the same time, which needs a clock that runs on its own
+    clock = ScaledClock(speedup=10.0)
+    hubert = create_hubert(clock)
+    start = clock.monotonic()
+
+    moving = hubert.submit_pose(units='deg', j1=INIT_POS[0] - 600)
+    launch = hubert.submit_launch()
+    launch_time = launch.result()
+
+    # The launcher goes out and back while the arm is still on its way
+    launch_epochs = 2 * (LAUNCHER_MAX - LAUNCHER_MIN) // LAUNCHER_STEPS_PER_EPOCH
+    assert launch_time == pytest.approx(launch_epochs * EPOCH, abs=0.2)
+    assert HubertStatus.MOVING in hubert.status
+
+    moving.result()
+    assert clock.monotonic() - start == pytest.approx(600 / STEPS_PER_EPOCH * EPOCH, abs=0.2)
+    assert hubert.status == HubertStatus.IDLE
+
+
+def test_future_times_out():
+    hubert = create_hubert(VirtualClock())
+    moving = hubert.submit_pose(units='deg', j1=INIT_POS[0] - 600, timeout=0.1)
+    with pytest.raises(WaitTimeout):
+        moving.result()
+
+
+def test_close_stops_waiters():
+    hubert = create_hubert(VirtualClock())
+    hubert.close()
+    with pytest.raises(RuntimeError):
+        hubert.submit_pose(units='deg', j1=INIT_POS[0] - 10)
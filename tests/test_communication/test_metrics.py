@@ -0,0 +1,61 @@
+import json
+import pytest
+
+from baller.communication.clock import VirtualClock
+from baller.communication.emulator import HubertEmulator, INIT_POS
+from baller.communication.hubert import Servo, Hubert
+from baller.communication.metrics import Histogram, LinkMetrics
+
+
+@pytest.mark.parametrize("values, q, expected", [
+    ([], 50, 0.0),
+    ([0.002] * 10, 50, 0.002),
+    ([0.001] * 9 + [5.0], 50, 0.001),
+    ([0.001] * 9 + [5.0], 100, 5.0),
+    ([100.0], 50, 100.0),
+])
+def test_histogram_percentile(values: list[float], q: float, expected: float):
+    h = Histogram()
+    for v in values:
+        h.record(v)
+    # Percentiles are bucket bounds, which are at most a quarter decade off
+    assert expected / 10 ** 0.25 <= h.percentile(q) <= expected * 10 ** 0.25 or h.percentile(q) == expected
+
+
+def create_hubert(metrics: LinkMetrics) -> tuple[Hubert, HubertEmulator]:
+    clock = VirtualClock()
+    emulator = HubertEmulator(clock=clock, baudrate=57600)
+    servos = [Servo([0, 3000], [0, 3000]) for _ in INIT_POS]
+    hubert = Hubert("emulator", 57600, servos, clock=clock, metrics=metrics)
+    hubert.connect(transport=emulator)
+    return hubert, emulator
+
+
+def test_link_is_instrumented(tmp_path):
+    metrics = LinkMetrics()
+    hubert, emulator = create_hubert(metrics)
+    metrics.reset()
+    emulator.n_writes = emulator.n_reads = emulator.bytes_received = emulator.bytes_sent = 0
+
+    hubert.set_pose(units='rad', j1=0.5)
+    hubert.status
+    hubert.get_pose()
+
+    assert set(metrics.latency) == {'SET_POSITION', 'GET_STATUS', 'GET_POSITION'}
+    assert all(h.count == 1 and h.max > 0 for h in metrics.latency.values())
+    assert metrics.lock_wait.count == 3
+    assert metrics.bytes_out == emulator.bytes_received
+    assert metrics.bytes_in == emulator.bytes_sent
+    assert metrics.short_reads == 0
+
+    path = tmp_path / "metrics.json"
+    metrics.dump(str(path))
+    assert json.loads(path.read_text())['latency']['GET_STATUS']['count'] == 1
+
+
+def test_disabled_metrics_record_nothing():
+    metrics = LinkMetrics(enabled=False)
+    hubert, _ = create_hubert(metrics)
+    hubert.status
+    assert metrics.to_dict()['writes'] == 0
+    assert metrics.latency == {}
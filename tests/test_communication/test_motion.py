@@ -0,0 +1,70 @@
+import numpy as np
+import pytest
+
+from baller.communication.clock import VirtualClock
+from baller.communication.emulator import HubertEmulator, INIT_POS, STEPS_PER_EPOCH, reload_melody_duration
+from baller.communication.hubert import Servo, Hubert
+from baller.communication.metrics import LinkMetrics
+from baller.communication.motion import EPOCH, move_epochs
+
+
+@pytest.mark.parametrize("start, end, epochs", [
+    ((1000, 1000), (1000, 1000), 0),
+    ((1000, 1000), (1006, 1000), 1),
+    ((1000, 1000), (1007, 1003), 2),
+    ((1000, 1000), (400, 1300), 100),
+])
+def test_move_epochs(start, end, epochs: int):
+    assert move_epochs(start, end) == epochs
+
+
+def create_hubert() -> tuple[Hubert, HubertEmulator, VirtualClock]:
+    clock = VirtualClock()
+    emulator = HubertEmulator(clock=clock)
+    servos = [Servo([0, 3000], [0, 3000]) for _ in INIT_POS]
+    hubert = Hubert("emulator", 57600, servos, clock=clock, metrics=LinkMetrics())
+    hubert.connect(transport=emulator)
+    hubert.set_pose(units='deg', **{f'j{i+1}': p for i, p in enumerate(INIT_POS)})
+    hubert.status_and_pose()
+    return hubert, emulator, clock
+
+
+def emulator_pose(emulator: HubertEmulator) -> np.ndarray:
+    with emulator.lock:
+        emulator._run()
+        return np.array(emulator.curr_pos)
+
+
+def test_predicted_pose_follows_a_sequence():
+    hubert, emulator, clock = create_hubert()
+    hubert.set_pose_sequence([{'j1': 1000, 'j2': 2000}, {'j1': 1300}, {'j3': 2000}], units='deg')
+
+    for _ in range(60):
+        clock.advance(3.3 * EPOCH)
+        predicted = hubert.servo_bank.angles_to_pulses(list(hubert.predicted_pose(units='rad').values()), units='rad')
+        # The firmware runs its epochs up to one epoch before the prediction
+        assert np.max(np.abs(predicted - emulator_pose(emulator))) <= STEPS_PER_EPOCH + 1
+
+
+def test_wait_sleeps_until_the_predicted_end():
+    hubert, _, clock = create_hubert()
+    hubert.set_pose(units='deg', j1=INIT_POS[0] - 600)
+    hubert.metrics.reset()
+    waited = hubert.wait_unitl_idle()
+
+    assert waited == pytest.approx(100 * EPOCH, abs=1e-3)
+    # The completion notification or a single status read confirms the prediction
+    assert hubert.metrics.writes <= 1
+
+
+def test_reload_melody_delays_the_motion():
+    hubert, _, clock = create_hubert()
+    start = clock.monotonic()
+    hubert.set_pose(units='deg', j1=INIT_POS[0] - 600)
+    clock.advance(50 * EPOCH)
+    hubert.play_reload_sound()
+
+    assert hubert.motion.move_end - start == pytest.approx(100 * EPOCH + reload_melody_duration() / 1000, abs=EPOCH)
+    hubert.metrics.reset()
+    hubert.wait_unitl_idle()
+    assert hubert.metrics.writes <= 1
@@ -0,0 +1,48 @@
+import numpy as np
+import pytest
+
+from baller.communication.clock import ScaledClock
+from baller.communication.emulator import HubertEmulator, N_SERVOS
+from baller.communication.hubert import Servo, Hubert, HubertStatus
+from baller.communication.pool import Arm, HubertPool, LAUNCH_TIME
+
+
+def create_arm(name: str, clock, reach: tuple[float, float] = (-1.0, 1.0)) -> Arm:
+    hubert = Hubert(name, 57600, [Servo([-90, 90], [600, 2400]) for _ in range(N_SERVOS)], clock=clock)
+    hubert.connect(transport=HubertEmulator(clock=clock))
+
+    def aim(target):
+        # Aim with the body only, the y-coordinate of the target is the angle
+        return {'j1': target[1]} if reach[0] <= target[1] <= reach[1] else None
+    return Arm(name, hubert, aim)
+
+
+def test_targets_go_to_the_arm_that_is_free_first():
+    clock = ScaledClock(speedup=50.0)
+    with HubertPool([create_arm("a", clock), create_arm("b", clock)], clock=clock) as pool:
+        shots = pool.assign((1.0, 0.5, 0.0)), pool.assign((1.0, 0.5, 0.0))
+        # The second shot at the same target would have to wait for the first arm to launch
+        assert {shot.arm for shot in shots} == {"a", "b"}
+        assert shots[0].eta >= LAUNCH_TIME
+
+
+def test_unreachable_targets_are_not_assigned():
+    clock = ScaledClock(speedup=50.0)
+    with HubertPool([create_arm("a", clock, reach=(0.0, 1.0))], clock=clock) as pool:
+        assert pool.assign((1.0, -0.5, 0.0)).arm is None
+
+
+def test_dispatch_shoots_on_every_arm():
+    clock = ScaledClock(speedup=50.0)
+    arms = [create_arm("a", clock, reach=(-1.0, 0.1)), create_arm("b", clock, reach=(-0.1, 1.0))]
+    targets = [(1.0, y, 0.0) for y in (-0.6, -0.3, 0.3, 0.6)]
+
+    with HubertPool(arms, clock=clock) as pool:
+        shots = pool.dispatch(targets)
+        pool.wait(shots)
+
+        assert [shot.arm for shot in shots] == ["a", "a", "b", "b"]
+        assert pool.status == HubertStatus.IDLE
+        poses = pool.map(lambda hubert: hubert.get_pose(units='rad')['j1'])
+        assert poses["a"] == pytest.approx(-0.3, abs=np.deg2rad(0.5))
+        assert poses["b"] == pytest.approx(0.6, abs=np.deg2rad(0.5))
@@ -0,0 +1,122 @@
+import pytest
+
+from baller.communication.clock import VirtualClock
+from baller.communication.emulator import HubertEmulator, LegacyEmulator, INIT_POS
+from baller.communication.hubert import Servo, Hubert, HubertCommand, HubertStatus, HubertConnectionError
+from baller.communication.protocol import (
+    PROTOCOL_VERSION, LEGACY_PROTOCOL, Frame, HubertProtocolError, encode_frame, read_frame,
+)
+
+
+def reader(bs: bytes):
+    buffer = bytearray(bs)
+
+    def read(n: int) -> bytes:
+        out = bytes(buffer[:n])
+        del buffer[:n]
+        return out
+    return read
+
+
+def test_frame_round_trip():
+    frame = Frame(7, HubertCommand.SET_POSITION.value, b'\x01\x02\x03')
+    assert read_frame(reader(encode_frame(frame))) == frame
+
+
+def test_frame_resync_after_garbage():
+    frame = Frame(3, HubertCommand.GET_STATUS.value, b'\x02')
+    assert read_frame(reader(b'\x00\x13' + encode_frame(frame))) == frame
+
+
+def test_corrupt_frame_is_rejected():
+    bs = bytearray(encode_frame(Frame(3, HubertCommand.GET_STATUS.value, b'\x02')))
+    bs[-2] ^= 0xFF
+    with pytest.raises(HubertProtocolError):
+        read_frame(reader(bytes(bs)))
+
+
+def create_hubert(emulator_type=HubertEmulator) -> tuple[Hubert, HubertEmulator, VirtualClock]:
+    clock = VirtualClock()
+    emulator = emulator_type(clock=clock)
+    servos = [Servo([0, 3000], [0, 3000]) for _ in INIT_POS]
+    hubert = Hubert("emulator", 57600, servos, clock=clock)
+    hubert.connect(transport=emulator)
+    return hubert, emulator, clock
+
+
+@pytest.mark.parametrize(
+    ("emulator_type", "version"),
+    (
+        (HubertEmulator, PROTOCOL_VERSION),
+        (LegacyEmulator, LEGACY_PROTOCOL),
+    )
+)
+def test_compound_commands(emulator_type, version):
+    hubert, emulator, clock = create_hubert(emulator_type)
+    assert hubert.protocol_version == version
+
+    pose = {f'j{i+1}': p for i, p in enumerate(INIT_POS)}
+    status = hubert.move_and_status(units='deg', **{**pose, 'j1': 1000})
+    assert status == HubertStatus.MOVING
+
+    status, pose = hubert.status_and_pose(units='deg')
+    assert status == HubertStatus.MOVING
+    assert round(pose['j2']) == INIT_POS[1]
+
+    hubert.wait_unitl_idle()
+    status, pose = hubert.status_and_pose(units='deg')
+    assert status == HubertStatus.IDLE
+    assert round(pose['j1']) == 1000
+
+
+def test_completion_notification():
+    hubert, emulator, clock = create_hubert()
+    hubert.launch()
+
+    # Let the launch finish without polling
+    clock.advance(2.0)
+    assert hubert.poll_notifications() == HubertStatus.IDLE
+    assert list(hubert.notifications) == [HubertStatus.IDLE]
+
+
+def test_wrong_servo_count():
+    clock = VirtualClock()
+    hubert = Hubert("emulator", 57600, [Servo([0, 3000], [0, 3000])], clock=clock)
+    with pytest.raises(HubertConnectionError):
+        hubert.connect(transport=HubertEmulator(clock=clock))
+
+
+def corrupt_next_reply(emulator: HubertEmulator):
+    """
+    Flip a bit in the header of the next frame that is read from the emulator
+    """
+    read = emulator.read
+    reads = []
+
+    def corrupted(size: int = 1) -> bytes:
+        bs = read(size)
+        reads.append(bs)
+        if len(reads) == 2:
+            bs = bytes([bs[0] ^ 0x01]) + bs[1:]
+        return bs
+    emulator.read = corrupted
+
+
+def test_leftover_bytes_are_not_commands():
+    hubert, emulator, clock = create_hubert()
+    hubert.status_and_pose()
+
+    # A frame that lost its start marker, with a sequence id that reads as launch
+    emulator.write(encode_frame(Frame(ord('l'), HubertCommand.GET_STATUS.value))[1:])
+    clock.advance(0.1)
+    assert hubert.status == HubertStatus.IDLE
+
+
+def test_corrupt_reply_is_retried():
+    hubert, emulator, clock = create_hubert()
+    corrupt_next_reply(emulator)
+    assert hubert.status == HubertStatus.IDLE
+
+    corrupt_next_reply(emulator)
+    with pytest.raises(HubertProtocolError):
+        hubert.launch()
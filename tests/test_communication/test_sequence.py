@@ -0,0 +1,74 @@
+from baller.communication.clock import VirtualClock
+import io
+
+from baller.communication.emulator import HubertEmulator, LegacyEmulator, INIT_POS, STEPS_PER_EPOCH, INTERVAL
+from baller.communication.hubert import Servo, Hubert, HubertStatus, HubertCommand
+from baller.communication.protocol import read_frame
+from baller.communication.wait import PollSchedule
+
+
+def create_hubert(clock, emulator_type=HubertEmulator) -> tuple[Hubert, HubertEmulator]:
+    # Servos that map degrees directly to pulses
+    servos = [Servo([0, 3000], [0, 3000]) for _ in INIT_POS]
+    hubert = Hubert("emulator", 57600, servos, clock=clock, poll_schedule=PollSchedule(min_interval=0.001, max_interval=0.005))
+    emulator = emulator_type(clock=clock)
+    hubert.connect(transport=emulator)
+    hubert.set_pose(units='deg', **{f'j{i+1}': p for i, p in enumerate(INIT_POS)})
+    return hubert, emulator
+
+
+def test_sequence_is_one_write(mocker):
+    hubert, emulator = create_hubert(VirtualClock())
+    hubert.arduino = mocker.Mock(wraps=emulator)
+
+    hubert.set_pose_sequence([{'j1': 1000}, {'j1': 1200}, {'j2': 1000}], units='deg')
+
+    assert hubert.arduino.write.call_count == 1
+    frame = read_frame(io.BytesIO(hubert.arduino.write.call_args[0][0]).read)
+    assert frame.cmd == HubertCommand.SET_SEQUENCE.value
+    assert frame.payload[0] == 3
+    assert len(frame.payload) == 1 + 3 * 2 * len(INIT_POS)
+
+
+def test_sequence_moves_through_waypoints():
+    clock = VirtualClock()
+    hubert, emulator = create_hubert(clock)
+
+    hubert.set_pose_sequence([{'j1': 1000}, {'j1': 1300}], units='deg')
+    assert HubertStatus.MOVING in hubert.status
+
+    # First leg: 600 pulses at STEPS_PER_EPOCH pulses per epoch, one epoch every INTERVAL + 1 ms
+    clock.advance(600 // STEPS_PER_EPOCH * (INTERVAL + 1) / 1000)
+    assert round(hubert.get_pose(units='deg')['j1']) == 1000
+    assert HubertStatus.MOVING in hubert.status
+
+    # Second leg
+    clock.advance((300 // STEPS_PER_EPOCH + 1) * (INTERVAL + 1) / 1000)
+    pose = hubert.get_pose(units='deg')
+    assert round(pose['j1']) == 1300
+    assert round(pose['j2']) == INIT_POS[1]
+    assert hubert.status == HubertStatus.IDLE
+
+
+def test_move_sequence_waits_for_last_waypoint():
+    hubert, emulator = create_hubert(VirtualClock())
+
+    hubert.move_sequence([{'j1': 1000}, {'j1': 2000}, {'j3': 2000}], units='deg')
+
+    assert hubert.status == HubertStatus.IDLE
+    assert emulator.curr_pos[:3] == [2000, INIT_POS[1], 2000]
+
+
+def test_move_sequence_without_firmware_support(mocker):
+    hubert, emulator = create_hubert(VirtualClock(), LegacyEmulator)
+    assert not hubert.supports_sequences
+    hubert.arduino = mocker.Mock(wraps=emulator)
+
+    hubert.move_sequence([{'j1': 1000}, {'j1': 2000}, {'j3': 2000}], units='deg')
+
+    # One position at a time, never a queue command that the firmware would misread
+    sent = [call[0][0] for call in hubert.arduino.write.call_args_list]
+    assert all(msg[0] != HubertCommand.SET_SEQUENCE.value for msg in sent)
+    assert sum(msg[0] == HubertCommand.SET_POSITION.value for msg in sent) == 3
+    assert hubert.status == HubertStatus.IDLE
+    assert emulator.curr_pos[:3] == [2000, INIT_POS[1], 2000]
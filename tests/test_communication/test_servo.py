@@ -1,7 +1,7 @@
 import pytest
 import numpy as np
 
-from baller.communication.hubert import Servo
+from baller.communication.hubert import Servo, ServoBank
 
 
 @pytest.mark.parametrize(
@@ -18,4 +18,50 @@ from baller.communication.hubert import Servo
 def test_servo_identety(angles, pulses, angle):
     # Be very carefull with rounding in this test as angle to pulse always gives an int
     s = Servo(angles, pulses)
-    assert np.isclose(s.pulse_to_angle(s.angle_to_pulse(angle)), angle)
\ No newline at end of file
+    assert np.isclose(s.pulse_to_angle(s.angle_to_pulse(angle)), angle)
+
+
+# Calibration tables in degrees and the servos built from them
+TABLES = [
+    ([-45, 0, 90], [2070, 1620, 680]),
+    ([0, 90], [2250, 1350]),
+    ([-90, 0, 72], [600, 1570, 2300]),
+]
+SERVOS = [Servo(angles, pulses) for angles, pulses in TABLES]
+
+
+def reference_pulses(angles: list[float], pulses: list[int], angle: np.ndarray) -> np.ndarray:
+    # Interpolate the calibration table directly, angles outside of it get the closest end point
+    return np.round(np.interp(angle, angles, pulses)).astype(int)
+
+
+def reference_angles(angles: list[float], pulses: list[int], pulse: np.ndarray) -> np.ndarray:
+    order = np.argsort(pulses)
+    return np.interp(pulse, np.asarray(pulses)[order], np.asarray(angles)[order])
+
+
+def test_servo_array_conversion():
+    (table_angles, table_pulses), s = TABLES[0], SERVOS[0]
+    angles = np.linspace(-60, 100, 50)
+    pulses = s.angle_to_pulse(angles)
+    assert list(pulses) == list(reference_pulses(table_angles, table_pulses, angles))
+    assert list(pulses) == [s.angle_to_pulse(a) for a in angles]
+    assert np.allclose(s.pulse_to_angle(pulses), reference_angles(table_angles, table_pulses, pulses))
+
+
+def test_servo_bank_matches_servos():
+    bank = ServoBank(SERVOS)
+    rng = np.random.default_rng(0)
+    angles = rng.uniform(-2.0, 2.0, (100, len(SERVOS)))
+
+    pulses = bank.angles_to_pulses(angles)
+    assert pulses.shape == angles.shape
+    expected = np.column_stack([reference_pulses(a, p, np.rad2deg(angles[:, i])) for i, (a, p) in enumerate(TABLES)])
+    assert np.all(pulses == expected)
+
+    back = bank.pulses_to_angles(pulses)
+    expected = np.column_stack([np.deg2rad(reference_angles(a, p, pulses[:, i])) for i, (a, p) in enumerate(TABLES)])
+    assert np.allclose(back, expected)
+
+    # A single pose converts to a single row
+    assert list(bank.angles_to_pulses(angles[0])) == list(pulses[0])
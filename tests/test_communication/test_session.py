@@ -0,0 +1,56 @@
+import pytest
+
+from baller.communication.clock import VirtualClock
+from baller.communication.emulator import HubertEmulator, INIT_POS
+from baller.communication.hubert import Servo, Hubert
+from baller.communication.session import RecordingTransport, ReplayTransport, SessionMismatchError, load_session, READ
+
+
+def run(transport, clock: VirtualClock) -> tuple[list[float], dict[str, float]]:
+    servos = [Servo([0, 3000], [0, 3000]) for _ in INIT_POS]
+    hubert = Hubert("session", 57600, servos, clock=clock)
+    hubert.connect(transport=transport)
+
+    pose = {f'j{i+1}': p for i, p in enumerate(INIT_POS)}
+    waits = []
+    hubert.set_pose(units='deg', **{**pose, 'j1': 1300})
+    waits.append(hubert.wait_unitl_idle())
+    hubert.launch()
+    waits.append(hubert.wait_unitl_idle())
+    return waits, hubert.get_pose(units='deg')
+
+
+@pytest.fixture
+def session(tmp_path) -> tuple[str, list[float], dict[str, float]]:
+    path = str(tmp_path / "session.bin")
+    clock = VirtualClock()
+    transport = RecordingTransport(HubertEmulator(clock=clock, baudrate=57600), path, clock=clock)
+    waits, pose = run(transport, clock)
+    transport.close()
+    return path, waits, pose
+
+
+def test_replay_reproduces_the_session(session):
+    path, waits, pose = session
+    clock = VirtualClock(start=100.0)
+    transport = ReplayTransport(path, clock=clock)
+
+    replay_waits, replay_pose = run(transport, clock)
+    # Durations are stored with single precision
+    assert replay_waits == pytest.approx(waits, abs=1e-6)
+    assert replay_pose == pose
+    assert transport.done
+
+
+def test_session_file_records_replies(session):
+    path, _, _ = session
+    events = load_session(path)
+    assert any(e.direction == READ and len(e.data) > 0 for e in events)
+    assert all(b.timestamp >= a.timestamp for a, b in zip(events, events[1:]))
+
+
+def test_replay_rejects_other_commands(session):
+    path, _, _ = session
+    transport = ReplayTransport(path, clock=VirtualClock())
+    with pytest.raises(SessionMismatchError):
+        transport.write(b'l')
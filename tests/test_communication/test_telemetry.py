@@ -0,0 +1,57 @@
+import time
+import pytest
+
+from baller.communication.clock import VirtualClock
+from baller.communication.emulator import HubertEmulator, INIT_POS
+from baller.communication.hubert import Servo, Hubert, HubertStatus
+from baller.communication.telemetry import TelemetryService
+
+
+def create_hubert() -> tuple[Hubert, HubertEmulator, VirtualClock]:
+    clock = VirtualClock()
+    emulator = HubertEmulator(clock=clock)
+    servos = [Servo([0, 3000], [0, 3000]) for _ in INIT_POS]
+    hubert = Hubert("emulator", 57600, servos, clock=clock)
+    hubert.connect(transport=emulator)
+
+    # Sample by hand instead of on a background thread so the virtual clock stays deterministic
+    hubert.telemetry = TelemetryService(hubert._sample_telemetry, rate=20.0, clock=clock)
+    hubert.telemetry_max_age = 0.1
+    return hubert, emulator, clock
+
+
+def test_queries_are_served_from_the_snapshot():
+    hubert, emulator, _ = create_hubert()
+    hubert.telemetry.sample_once()
+    writes = emulator.n_writes
+
+    assert hubert.status == HubertStatus.IDLE
+    assert hubert.get_pose(units='deg')['j1'] == pytest.approx(hubert.get_pose(units='rad')['j1'] * 180 / 3.141592653589793)
+    assert emulator.n_writes == writes
+
+
+@pytest.mark.parametrize("invalidate", ["age", "command"])
+def test_stale_snapshot_falls_back_to_the_link(invalidate: str):
+    hubert, emulator, clock = create_hubert()
+    hubert.telemetry.sample_once()
+
+    if invalidate == "age":
+        clock.advance(0.2)
+    else:
+        hubert.set_pose(units='rad', j1=0.0)
+    writes = emulator.n_writes
+
+    hubert.status
+    assert emulator.n_writes == writes + 1
+
+
+def test_service_samples_in_the_background():
+    samples = []
+    service = TelemetryService(lambda: samples.append(None) or len(samples), rate=200.0)
+    with service:
+        deadline = time.monotonic() + 2.0
+        while len(samples) < 3 and time.monotonic() < deadline:
+            time.sleep(0.005)
+    assert not service.running
+    assert service.latest().value >= 3
+    assert service.latest(max_age=-1.0) is None
@@ -0,0 +1,40 @@
+import pytest
+
+from baller.communication.hubert import Hubert, HubertStatus
+from baller.communication.wait import PollSchedule, WaitTimeout, wait_until
+
+
+def test_poll_schedule_backoff():
+    schedule = PollSchedule(initial_delay=0.0, min_interval=0.01, max_interval=0.04, backoff=2.0)
+    intervals = schedule.intervals()
+    assert [next(intervals) for _ in range(6)] == [0.0, 0.01, 0.02, 0.04, 0.04, 0.04]
+
+
+def test_wait_until_polls_until_true():
+    answers = iter([False, False, True])
+    schedule = PollSchedule(min_interval=0.001, max_interval=0.001)
+    elapsed = wait_until(lambda: next(answers), schedule)
+    assert elapsed >= 0.0
+
+
+def test_wait_until_timeout():
+    schedule = PollSchedule(min_interval=0.001, max_interval=0.005)
+    with pytest.raises(WaitTimeout):
+        wait_until(lambda: False, schedule, timeout=0.02)
+
+
+def test_hubert_wait_until_idle(mocker):
+    """
+    Assert that Hubert polls the status until the moving flag is cleared
+    """
+    mock_arduino = mocker.Mock()
+    mock_arduino.read.side_effect = [
+        bytes([HubertStatus.MOVING]),
+        bytes([HubertStatus.MOVING]),
+        bytes([0]),
+    ]
+    hubert = Hubert("test", 9600, [], poll_schedule=PollSchedule(min_interval=0.001, max_interval=0.001))
+    hubert.arduino = mock_arduino
+
+    hubert.wait_unitl_idle()
+    assert mock_arduino.read.call_count == 3
@@ -0,0 +1,53 @@
+import itertools
+import pytest
+import numpy as np
+
+from baller.communication.motion import move_time
+from baller.finite_state_machine.schedule import (
+    travel_times, path_time, order_shots, held_karp, nearest_neighbour, two_opt, schedule, EXACT_LIMIT,
+)
+
+
+def random_times(n: int, end: bool, seed: int) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    return travel_times(rng.integers(600, 2400, size=(n + 1 + int(end), 5)))
+
+
+def test_travel_times_match_motion_model():
+    rng = np.random.default_rng(0)
+    pulses = rng.integers(600, 2400, size=(4, 5))
+    times = travel_times(pulses)
+    for i, j in itertools.product(range(4), repeat=2):
+        assert np.isclose(times[i, j], move_time(pulses[i], pulses[j]))
+
+
+@pytest.mark.parametrize(("n", "end"), ((2, False), (4, True), (6, False), (6, True)))
+def test_held_karp_is_optimal(n, end):
+    times = random_times(n, end, seed=n)
+    best = min(path_time(times, list(order), end) for order in itertools.permutations(range(n)))
+
+    order = held_karp(times, end)
+    assert sorted(order) == list(range(n))
+    assert np.isclose(path_time(times, order, end), best)
+
+
+@pytest.mark.parametrize("end", (False, True))
+def test_heuristic_improves_on_detection_order(end):
+    n = EXACT_LIMIT + 10
+    times = random_times(n, end, seed=1)
+
+    greedy = nearest_neighbour(times, end)
+    order = order_shots(times, end)
+    assert sorted(order) == list(range(n))
+    assert path_time(times, order, end) <= path_time(times, greedy, end)
+    assert path_time(times, order, end) < path_time(times, list(range(n)), end)
+    assert two_opt(times, order, end) == order
+
+
+def test_schedule_ends_close_to_end_pose():
+    start = np.full(5, 1500)
+    shots = np.array([[1500, 2000, 1500, 1500, 1500], [1500, 1000, 1500, 1500, 1500]])
+
+    assert schedule(start, shots, end=np.array([1500, 900, 1500, 1500, 1500])) == [0, 1]
+    assert schedule(start, shots, end=np.array([1500, 2100, 1500, 1500, 1500])) == [1, 0]
+    assert schedule(start, shots[:1]) == [0]
@@ -0,0 +1,61 @@
+import pytest
+import numpy as np
+
+import baller.trajectory_solver.trajectory_solver as ts
+from baller.inverse_kinematics import analytic
+from baller.inverse_kinematics.ik import target_pos_to_joint_angles, LAUNCH_PLANE_OFFSET
+from baller.trajectory_solver.trajectory_solver import trajectory_solver_from_joints, launcher_pitch
+
+
+J2_LIMITS = (0.0, np.deg2rad(60))
+J3_LIMITS = (np.deg2rad(-90), np.deg2rad(72))
+MODEL = ts.BallisticsModel(v0=2.4, g=9.82, pitch_offset=-np.deg2rad(11))
+
+
+@pytest.mark.parametrize(
+        ("x", "y", "z"),
+        (
+            (1.0, -LAUNCH_PLANE_OFFSET, 0.2),
+            (0.8, 0.1, 0.0),
+            (0.6, -0.3, 0.4),
+        )
+)
+def test_analytic_hits_target(x, y, z):
+    j1, j2, j3, dist = target_pos_to_joint_angles(x, y, z, j2_limits=J2_LIMITS, j3_limits=J3_LIMITS, backend='analytic', model=MODEL)
+    _, yt, zt = trajectory_solver_from_joints(j1, j2, j3, target_plane=x, model=MODEL)
+
+    assert dist == 0.0
+    assert np.isclose(yt, y, atol=1e-6)
+    assert np.isclose(zt, z, atol=1e-6)
+    assert J2_LIMITS[0] <= j2 <= J2_LIMITS[1]
+    assert J3_LIMITS[0] <= j3 <= J3_LIMITS[1]
+    assert -np.pi / 2 < launcher_pitch(j2, j3, MODEL) < np.pi / 2
+
+
+def test_analytic_returns_every_branch():
+    yaw = 0.0
+    solutions = analytic.solve(1.0, 0.2, yaw, 0.0, 0.0, model=MODEL)
+    assert len(solutions) >= 2
+    for s in solutions:
+        assert np.isclose(analytic.impact_height(yaw, s.j2, s.j3, 1.0, MODEL), 0.2, atol=1e-6)
+
+    # The branch closest to the current pose comes first
+    closest = analytic.solve(1.0, 0.2, yaw, 0.0, solutions[-1].j3, model=MODEL)
+    assert closest[0] == solutions[-1]
+
+
+def test_analytic_unreachable_target():
+    j1, j2, j3, dist = target_pos_to_joint_angles(50.0, 0.0, 10.0, j2_limits=J2_LIMITS, j3_limits=J3_LIMITS, backend='analytic', model=MODEL)
+    assert dist > 0
+    assert J2_LIMITS[0] <= j2 <= J2_LIMITS[1]
+    assert J3_LIMITS[0] <= j3 <= J3_LIMITS[1]
+
+
+@pytest.mark.parametrize("gradients", (True, False))
+def test_slsqp_hits_target(gradients):
+    x, y, z = 0.6, -0.1, 0.1
+    j1, j2, j3, dist = target_pos_to_joint_angles(x, y, z, j2_limits=J2_LIMITS, j3_limits=J3_LIMITS, gradients=gradients, model=MODEL)
+    _, yt, zt = trajectory_solver_from_joints(j1, j2, j3, target_plane=x, model=MODEL)
+
+    assert dist < 1e-3
+    assert np.isclose(zt, z, atol=1e-3)
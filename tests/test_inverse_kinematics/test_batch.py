@@ -0,0 +1,33 @@
+import pytest
+import numpy as np
+
+from baller.inverse_kinematics import analytic
+from baller.inverse_kinematics.batch import solve_batch
+from baller.inverse_kinematics.benchmark import random_targets, J2_LIMITS, J3_LIMITS
+
+
+@pytest.mark.parametrize(("j2", "j3"), ((0.0, 0.0), (0.3, 0.5)))
+def test_batch_matches_analytic(j2, j3):
+    targets = random_targets(50, seed=1)
+    solution = solve_batch(*targets.T, j2=j2, j3=j3, j2_limits=J2_LIMITS, j3_limits=J3_LIMITS)
+
+    assert len(solution) == len(targets)
+    for i, (x, y, z) in enumerate(targets):
+        yaw = analytic.calculate_yaw_angle(x, y)
+        best = analytic.solve(x, z, yaw, j2, j3, J2_LIMITS, J3_LIMITS)[0]
+        assert np.allclose(solution[i], (best.j1, best.j2, best.j3, best.dist), atol=1e-6)
+        assert solution.feasible[i] == (best.dist == 0.0)
+
+
+def test_batch_per_target_pose():
+    xs, ys, zs = np.full(2, 0.5), np.zeros(2), np.full(2, 0.1)
+    solution = solve_batch(xs, ys, zs, j2=np.array([0.2, 0.8]), j3=0.0, j2_limits=J2_LIMITS, j3_limits=J3_LIMITS)
+
+    assert solution.feasible.all()
+    assert np.allclose(solution.j2, [0.2, 0.8])
+    assert np.allclose(analytic.impact_height(solution.j1, solution.j2, solution.j3, xs), zs)
+
+
+def test_batch_empty():
+    solution = solve_batch([], [], [])
+    assert len(solution) == 0
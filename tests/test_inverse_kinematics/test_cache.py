@@ -0,0 +1,103 @@
+import pytest
+import numpy as np
+
+import baller.trajectory_solver.trajectory_solver as ts
+from baller.inverse_kinematics.cache import IKCache
+from baller.inverse_kinematics.benchmark import J2_LIMITS, J3_LIMITS
+
+
+class CountingSolver:
+
+    def __init__(self) -> None:
+        self.calls = []
+
+    def __call__(self, x, y, z, **_):
+        self.calls.append((x, y, z))
+        return (x, y, z, 0.0)
+
+
+@pytest.fixture(autouse=True)
+def velocity(monkeypatch):
+    monkeypatch.setattr(ts, 'V0', 2.4)
+
+
+@pytest.mark.parametrize(
+        ("a", "b", "same"),
+        (
+            ((1.0, 0.0, 0.2), (1.001, -0.001, 0.2019), True),
+            ((1.0, 0.0, 0.2), (1.0, 0.0, 0.21), False),
+        )
+)
+def test_cache_quantizes_targets(a, b, same):
+    cache = IKCache(resolution=0.005)
+    solver = CountingSolver()
+
+    first = cache.solve(*a, solver=solver)
+    second = cache.solve(*b, solver=solver)
+
+    assert (first == second) == same
+    assert len(solver.calls) == (1 if same else 2)
+    assert cache.hits == (1 if same else 0)
+    # The cell center is solved
+    assert np.allclose(solver.calls[0], np.round(np.array(a) / 0.005) * 0.005)
+
+
+def test_cache_key_includes_velocity_and_limits(monkeypatch):
+    cache = IKCache()
+    solver = CountingSolver()
+
+    cache.solve(1.0, 0.0, 0.2, solver=solver)
+    cache.solve(1.0, 0.0, 0.2, j2_limits=J2_LIMITS, solver=solver)
+    monkeypatch.setattr(ts, 'V0', 3.0)
+    cache.solve(1.0, 0.0, 0.2, solver=solver)
+
+    assert len(solver.calls) == 3
+    assert cache.misses == 3
+
+
+def test_cache_evicts_least_recently_used():
+    cache = IKCache(maxsize=2)
+    solver = CountingSolver()
+
+    cache.solve(1.0, 0.0, 0.1, solver=solver)
+    cache.solve(1.0, 0.0, 0.2, solver=solver)
+    cache.solve(1.0, 0.0, 0.1, solver=solver)
+    cache.solve(1.0, 0.0, 0.3, solver=solver)
+
+    assert len(cache) == 2
+    assert cache.evictions == 1
+    assert cache.key(1.0, 0.0, 0.1) in cache.entries
+    assert cache.key(1.0, 0.0, 0.2) not in cache.entries
+
+
+def test_cache_persists(tmp_path, monkeypatch):
+    path = tmp_path / "ik.json"
+    cache = IKCache(path=path)
+    cache.solve(1.0, 0.0, 0.2, j2_limits=J2_LIMITS, j3_limits=J3_LIMITS, solver=CountingSolver())
+    cache.save()
+
+    solver = CountingSolver()
+    restored = IKCache(path=path)
+    restored.solve(1.0, 0.0, 0.2, j2_limits=J2_LIMITS, j3_limits=J3_LIMITS, solver=solver)
+    assert restored.hits == 1
+    assert len(solver.calls) == 0
+
+    # Solutions for another launcher are not used
+    monkeypatch.setattr(ts, 'PITCH_OFFSET', ts.PITCH_OFFSET + 0.01)
+    other = IKCache(path=path)
+    other.solve(1.0, 0.0, 0.2, j2_limits=J2_LIMITS, j3_limits=J3_LIMITS, solver=solver)
+    assert other.hits == 0
+    assert len(solver.calls) == 1
+
+
+def test_cache_solve_batch():
+    cache = IKCache()
+    xs, ys, zs = [0.5, 0.5, 0.501], [0.0, 0.0, 0.0], [0.1, 0.2, 0.1]
+
+    first = cache.solve_batch(xs, ys, zs, j2_limits=J2_LIMITS, j3_limits=J3_LIMITS)
+    assert cache.misses == 3
+    assert first[0] == first[2]
+
+    second = cache.solve_batch(xs, ys, zs, j2_limits=J2_LIMITS, j3_limits=J3_LIMITS)
+    assert cache.hits == 3
+    assert second == first
@@ -1,7 +1,8 @@
 import pytest
 import numpy as np
 
-from baller.inverse_kinematics.ik import calculate_yaw_angle, LAUNCH_PLANE_OFFSET
+import baller.trajectory_solver.trajectory_solver as ts
+from baller.inverse_kinematics.ik import calculate_yaw_angle, aim_elbow, target_pos_to_joint_angles, LAUNCH_PLANE_OFFSET
 
 
 @pytest.mark.parametrize(
@@ -16,3 +17,42 @@ from baller.inverse_kinematics.ik import calculate_yaw_angle, LAUNCH_PLANE_OFFSE
 def test_yaw_angle(x, y, expected_yaw):
     yaw = calculate_yaw_angle(x, y)
     assert np.isclose(yaw, expected_yaw)
+
+
+@pytest.mark.parametrize(
+        ("x", "y", "z", "j2"),
+        (
+            (1.0, 0.0, 0.2, 0.2),
+            (0.8, -0.2, 0.4, 0.0),
+            (1.2, 0.1, 0.1, 0.5),
+        )
+)
+def test_aim_elbow_hits_target(monkeypatch, x, y, z, j2):
+    monkeypatch.setattr(ts, 'V0', 3.0)
+    monkeypatch.setattr(ts, 'g', 9.82)
+    monkeypatch.setattr(ts, 'PITCH_OFFSET', -np.deg2rad(11))
+    yaw = calculate_yaw_angle(x, y)
+
+    j3 = aim_elbow(x, y, z, yaw, j2, 1.0)
+
+    _, yt, zt = ts.trajectory_solver_from_joints(yaw, j2, j3, target_plane=x)
+    assert np.isclose(yt, y) and abs(zt - z) < 0.01
+    *_, dist = target_pos_to_joint_angles(x, y, z, j2=j2, j3=1.0, aim=True)
+    assert dist < 0.01
+
+
+def test_concurrent_solves_with_different_models():
+    from concurrent.futures import ThreadPoolExecutor
+
+    models = [ts.BallisticsModel(v0=v0, g=9.82, pitch_offset=-np.deg2rad(11)) for v0 in (2.4, 2.8, 3.2, 3.6)]
+    target = (1.0, 0.0, 0.2)
+
+    def solve(model):
+        return target_pos_to_joint_angles(*target, j2=0.2, j3=1.2, j2_limits=(0, np.deg2rad(60)), model=model)
+
+    expected = [solve(model) for model in models]
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        solutions = list(pool.map(solve, models * 4))
+
+    assert solutions == expected * 4
+    assert len({round(s[2], 6) for s in expected}) == len(models)
@@ -0,0 +1,82 @@
+import pytest
+import numpy as np
+from dataclasses import replace
+
+import baller.trajectory_solver.trajectory_solver as ts
+from baller.inverse_kinematics import analytic, lookup
+
+
+SPEC = lookup.TableSpec(x=(0.8, 1.0, 3), y=(-0.2, 0.0, 3), z=(0.1, 0.3, 3), v0=(2.3, 2.5, 3))
+
+
+@pytest.fixture
+def table(tmp_path, monkeypatch):
+    monkeypatch.setattr(ts, 'V0', 2.4)
+    lookup.save_table(lookup.build_table(SPEC), SPEC, tmp_path)
+    return lookup.LookupTable.load(SPEC, tmp_path)
+
+
+@pytest.mark.parametrize(
+        ("x", "y", "z"),
+        (
+            (0.9, -0.1, 0.15),
+            (0.85, -0.15, 0.12),
+            (0.95, -0.05, 0.18),
+        )
+)
+def test_table_hits_target(table, x, y, z):
+    yaw = analytic.calculate_yaw_angle(x, y)
+    solution = table.solve(x, y, z, yaw, SPEC.j2_limits, SPEC.j3_limits)
+
+    assert solution is not None
+    assert solution.dist < lookup.TOLERANCE
+    _, yt, zt = ts.trajectory_solver_from_joints(solution.j1, solution.j2, solution.j3, target_plane=x)
+    assert np.isclose(yt, y, atol=1e-6)
+    assert np.isclose(zt, z, atol=lookup.TOLERANCE)
+
+
+def test_table_is_memory_mapped(table):
+    assert isinstance(table.table, np.memmap)
+
+
+def test_table_outside_grid(table):
+    yaw = analytic.calculate_yaw_angle(1.2, 0.0)
+    assert table.solve(1.2, 0.0, 0.2, yaw) is None
+
+
+def test_table_invalidated(tmp_path, monkeypatch):
+    lookup.save_table(np.zeros(SPEC.shape + (2,)), SPEC, tmp_path)
+    assert lookup.LookupTable.load(SPEC, tmp_path) is not None
+
+    monkeypatch.setattr(ts, 'PITCH_OFFSET', ts.PITCH_OFFSET + 0.01)
+    assert lookup.LookupTable.load(SPEC, tmp_path) is None
+
+
+def test_table_answers_for_model_velocity(table):
+    x, y, z = 0.9, -0.1, 0.15
+    yaw = analytic.calculate_yaw_angle(x, y)
+    model = replace(ts.default_model(), v0=2.45)
+    solution = table.solve(x, y, z, yaw, SPEC.j2_limits, SPEC.j3_limits, model=model)
+
+    assert solution is not None
+    _, _, zt = ts.trajectory_solver_from_joints(solution.j1, solution.j2, solution.j3, target_plane=x, model=model)
+    assert np.isclose(zt, z, atol=lookup.TOLERANCE)
+    # Not for another launcher
+    other = replace(model, pitch_offset=model.pitch_offset + 0.01)
+    assert table.solve(x, y, z, yaw, SPEC.j2_limits, SPEC.j3_limits, model=other) is None
+
+
+def test_default_table_found_once_saved(tmp_path, monkeypatch):
+    monkeypatch.setattr(lookup, 'TABLE_DIR', tmp_path)
+    monkeypatch.setattr(lookup, '_tables', {})
+    assert lookup.default_table() is None
+
+    # The miss is remembered until a table is saved through save_table
+    spec = lookup.TableSpec()
+    np.save(lookup.table_path(spec, tmp_path), np.zeros(spec.shape + (2,)))
+    assert lookup.default_table() is None
+
+    lookup.save_table(np.zeros(spec.shape + (2,)), spec, tmp_path)
+    table = lookup.default_table()
+    assert table is not None
+    assert lookup.default_table() is table
@@ -0,0 +1,62 @@
+import pytest
+import numpy as np
+
+import baller.trajectory_solver.trajectory_solver as ts
+from baller.inverse_kinematics import multistart
+from baller.inverse_kinematics.batch import solve_batch
+from baller.inverse_kinematics.ik import target_pos_to_joint_angles
+from baller.inverse_kinematics.multistart import MultiStartSolver, seeds
+from baller.inverse_kinematics.benchmark import J2_LIMITS, J3_LIMITS
+
+
+@pytest.fixture(autouse=True)
+def velocity(monkeypatch):
+    monkeypatch.setattr(ts, 'V0', 2.4)
+
+
+@pytest.fixture(scope='module')
+def threads():
+    with MultiStartSolver(executor='thread', workers=2) as solver:
+        yield solver
+
+
+@pytest.mark.parametrize("n", (4, 16, 30))
+def test_seeds_are_inside_limits(n):
+    points = np.array(seeds(n, J2_LIMITS, J3_LIMITS))
+
+    assert 0 < len(points) <= np.ceil(np.sqrt(n)) ** 2
+    assert np.all((J2_LIMITS[0] < points[:, 0]) & (points[:, 0] < J2_LIMITS[1]))
+    assert np.all((J3_LIMITS[0] < points[:, 1]) & (points[:, 1] < J3_LIMITS[1]))
+    for j2, j3 in points:
+        assert abs(ts.launcher_pitch(j2, j3)) < np.pi / 2
+
+
+def test_escapes_local_minimum(threads):
+    x, y, z = 1.09, 0.0, 0.05
+    first = target_pos_to_joint_angles(x, y, z, j2=0.0, j3=0.0, j2_limits=J2_LIMITS, j3_limits=J3_LIMITS)
+    assert first[3] > 1.0
+
+    solution = threads.solve(x, y, z, J2_LIMITS, J3_LIMITS, best=first)
+
+    assert solution[3] < multistart.HIT_DISTANCE
+    assert threads.improved == 1
+
+
+def test_keeps_best_without_budget():
+    first = (0.1, 0.2, 0.3, 1.0)
+    with MultiStartSolver(executor='thread', workers=1, budget=0.0) as solver:
+        assert solver.solve(0.8, 0.0, 0.4, J2_LIMITS, J3_LIMITS, best=first) == first
+        assert solver.timeouts == 1
+
+
+def test_processes_solve_at_callers_velocity(monkeypatch):
+    monkeypatch.setattr(ts, 'V0', 3.0)
+    x, y, z = 0.8, -0.1, 0.4
+    assert solve_batch([x], [y], [z], j2_limits=J2_LIMITS, j3_limits=J3_LIMITS).feasible[0]
+
+    with MultiStartSolver(workers=2) as solver:
+        solver.warm()
+        j1, j2, j3, dist = solver.solve(x, y, z, J2_LIMITS, J3_LIMITS)
+
+    assert dist < multistart.HIT_DISTANCE
+    assert np.allclose(ts.trajectory_solver_from_joints(j1, j2, j3, x)[1:], (y, z), atol=multistart.HIT_DISTANCE)
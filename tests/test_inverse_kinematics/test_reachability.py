@@ -0,0 +1,58 @@
+import pytest
+import numpy as np
+
+import baller.trajectory_solver.trajectory_solver as ts
+from baller.inverse_kinematics.batch import solve_batch
+from baller.inverse_kinematics.benchmark import random_targets, J2_LIMITS, J3_LIMITS
+from baller.inverse_kinematics.reachability import build_map, reachability_map
+
+
+@pytest.fixture(autouse=True)
+def velocity(monkeypatch):
+    monkeypatch.setattr(ts, 'V0', 2.4)
+    monkeypatch.setattr(ts, 'g', 9.82)
+    monkeypatch.setattr(ts, 'PITCH_OFFSET', -np.deg2rad(11))
+
+
+@pytest.mark.parametrize("target_plane", (0.6, 1.0))
+def test_map_agrees_with_solver(target_plane):
+    reachability = build_map(target_plane, J2_LIMITS, J3_LIMITS, y_size=51, grid_size=64)
+    targets = random_targets(300, seed=2)
+    solution = solve_batch(np.full(len(targets), target_plane), targets[:, 1], targets[:, 2], j2_limits=J2_LIMITS, j3_limits=J3_LIMITS)
+
+    reachable = reachability.reachable(targets[:, 1], targets[:, 2], tolerance=0.0)
+    assert np.mean(reachable == solution.feasible) > 0.98
+    # Solutions that miss are at least as far off as the map says
+    misses = ~solution.feasible
+    assert np.all(solution.dist[misses] >= reachability.distance(targets[misses, 1], targets[misses, 2]) - 0.01)
+
+
+def test_map_outside():
+    reachability = build_map(1.0, J2_LIMITS, J3_LIMITS, y_size=11, grid_size=32)
+    assert reachability.distance(5.0, 0.2) == np.inf
+    assert not reachability.reachable(5.0, 0.2)
+    assert reachability.distance(0.0, 100.0) > 90
+
+
+def test_map_grid():
+    reachability = build_map(1.0, J2_LIMITS, J3_LIMITS, y_size=11, grid_size=32)
+    grid = reachability.grid((-0.5, 1.0), 16)
+    assert grid.shape == (11, 16)
+    assert grid.dtype == bool
+    assert grid.any()
+
+
+def test_map_is_cached_per_velocity(monkeypatch):
+    first = reachability_map(1.0, J2_LIMITS, J3_LIMITS)
+    assert reachability_map(1.0, J2_LIMITS, J3_LIMITS) is first
+
+    monkeypatch.setattr(ts, 'V0', 3.0)
+    faster = reachability_map(1.0, J2_LIMITS, J3_LIMITS)
+    assert faster is not first
+    assert np.nanmax(faster.z_high) > np.nanmax(first.z_high)
+
+
+def test_map_needs_single_velocity():
+    model = ts.BallisticsModel(v0=np.array([2.4, 3.0]), g=9.82, pitch_offset=-np.deg2rad(11))
+    with pytest.raises(AssertionError):
+        reachability_map(1.0, J2_LIMITS, J3_LIMITS, model)
@@ -0,0 +1,61 @@
+import pytest
+import numpy as np
+
+import baller.trajectory_solver.trajectory_solver as ts
+from baller.inverse_kinematics import warm_start
+from baller.inverse_kinematics.ik import target_pos_to_joint_angles
+from baller.inverse_kinematics.warm_start import WarmStartIndex
+from baller.inverse_kinematics.benchmark import J2_LIMITS, J3_LIMITS
+
+
+@pytest.fixture(autouse=True)
+def velocity(monkeypatch):
+    monkeypatch.setattr(ts, 'V0', 2.4)
+
+
+@pytest.mark.parametrize("n", (10, 300))
+def test_nearest_matches_brute_force(n):
+    rng = np.random.default_rng(0)
+    targets = rng.uniform(0, 1, (n, 3))
+    index = WarmStartIndex()
+    for i, (x, y, z) in enumerate(targets):
+        index.add(x, y, z, i, -i)
+
+    for query in rng.uniform(0, 1, (20, 3)):
+        expected = int(np.argmin(np.linalg.norm(targets - query, axis=1)))
+        assert index.nearest(*query) == (expected, -expected)
+
+
+def test_nearest_is_bounded():
+    index = WarmStartIndex(maxsize=warm_start.REBUILD_EVERY + 2)
+    for i in range(2 * warm_start.REBUILD_EVERY):
+        index.add(float(i), 0.0, 0.0, i, i)
+
+    assert len(index) == warm_start.REBUILD_EVERY + 2
+    # The oldest solutions have been replaced
+    assert index.nearest(0.0, 0.0, 0.0) == (warm_start.REBUILD_EVERY - 2, warm_start.REBUILD_EVERY - 2)
+    assert index.nearest(1000.0, 0.0, 0.0, max_distance=1.0) is None
+
+
+def test_nearest_prefers_same_velocity(monkeypatch):
+    index = WarmStartIndex()
+    index.add(1.0, 0.0, 0.2, 1.0, 1.0)
+    monkeypatch.setattr(ts, 'V0', 3.4)
+    index.add(1.0, 0.0, 0.25, 2.0, 2.0)
+
+    assert index.nearest(1.0, 0.0, 0.2) == (2.0, 2.0)
+    monkeypatch.setattr(ts, 'V0', 2.4)
+    assert index.nearest(1.0, 0.0, 0.2) == (1.0, 1.0)
+
+
+def test_warm_start_learns_solutions():
+    index = WarmStartIndex()
+    x, y, z = 0.6, -0.1, 0.1
+
+    first = target_pos_to_joint_angles(x, y, z, j2_limits=J2_LIMITS, j3_limits=J3_LIMITS, warm_start=index)
+    assert first[3] < warm_start.HIT_DISTANCE
+    assert len(index) == 1
+
+    second = target_pos_to_joint_angles(x, y, z + 0.01, j2_limits=J2_LIMITS, j3_limits=J3_LIMITS, warm_start=index)
+    assert second[3] < warm_start.HIT_DISTANCE
+    assert index.hits == 1
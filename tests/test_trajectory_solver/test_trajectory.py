@@ -1,5 +1,6 @@
 import pytest
 import numpy as np
+from dataclasses import replace
 
 from baller.trajectory_solver.trajectory_solver import trajectory_solver_from_launcher_pos, trajectory_solver_from_joints
 import baller.trajectory_solver.trajectory_solver as ts
@@ -7,6 +8,7 @@ from baller.utils.hubert.constants import LAUNCH_PLANE_OFFSET, L2, L3, L8, L9
 
 
 Z_REST = L2 + L3 - L8 - L9
+MODEL = ts.BallisticsModel(v0=2.4, g=9.82, pitch_offset=-np.deg2rad(11))
 
 
 @pytest.mark.parametrize(
@@ -18,10 +20,10 @@ Z_REST = L2 + L3 - L8 - L9
         (1, 1, 5, 0, 0, 2, 1, 0),
     )
 )
-def test_trajectory_solver_from_launcher_pos(x1, y1, z1, pitch, yaw, target_plane, y2, z2):
+def test_trajectory_solver_from_launcher_pos(monkeypatch, x1, y1, z1, pitch, yaw, target_plane, y2, z2):
     # Set velocity and gravity to easy to use constants
-    ts.V0 = 1.0
-    ts.g = 10.0
+    monkeypatch.setattr(ts, 'V0', 1.0)
+    monkeypatch.setattr(ts, 'g', 10.0)
     assert np.all(np.isclose(trajectory_solver_from_launcher_pos(x1, y1, z1, pitch, yaw, target_plane), (target_plane, y2, z2)))
 
 
@@ -31,9 +33,122 @@ def test_trajectory_solver_from_launcher_pos(x1, y1, z1, pitch, yaw, target_plan
         (0, 0, 0, 1.0, -LAUNCH_PLANE_OFFSET, Z_REST),
     )
 )
-def test_trajectory_solver_from_joints(j1, j2, j3, target_plane, y2, z2):
+def test_trajectory_solver_from_joints(monkeypatch, j1, j2, j3, target_plane, y2, z2):
     # Set velocity, gravity and pitch offset to easy to use constants
-    ts.V0 = 1.0
-    ts.g = 0.0
-    ts.PITCH_OFFSET = np.pi / 2
-    assert np.all(np.isclose(trajectory_solver_from_joints(j1, j2, j3, target_plane=target_plane), (target_plane, y2, z2)))
\ No newline at end of file
+    monkeypatch.setattr(ts, 'V0', 1.0)
+    monkeypatch.setattr(ts, 'g', 0.0)
+    monkeypatch.setattr(ts, 'PITCH_OFFSET', np.pi / 2)
+    assert np.all(np.isclose(trajectory_solver_from_joints(j1, j2, j3, target_plane=target_plane), (target_plane, y2, z2)))
+
+def test_solve_trajectories_matches_scalar():
+    rng = np.random.default_rng(0)
+    j1 = rng.uniform(-0.5, 0.5, 20)
+    j2 = rng.uniform(0.0, 0.5, 20)
+    j3 = rng.uniform(1.0, 1.6, 20)
+
+    trajectories = ts.trajectories_from_joints(j1, j2, j3, target_plane=1.0, model=MODEL)
+
+    assert trajectories.feasible.all()
+    for i in range(20):
+        assert np.allclose(
+            trajectory_solver_from_joints(j1[i], j2[i], j3[i], target_plane=1.0, model=MODEL),
+            (trajectories.x[i], trajectories.y[i], trajectories.z[i]),
+        )
+
+
+def test_solve_trajectories_along_arc():
+    model = ts.BallisticsModel(v0=1.0, g=10.0, pitch_offset=0.0)
+    planes = np.array([-1.0, 0.0, 0.5, 1.0])
+    trajectories = ts.solve_trajectories(0, 0, 5, 0, 0, planes, model)
+
+    assert list(trajectories.feasible) == [False, False, True, True]
+    assert np.all(np.isnan(trajectories.z[:2]))
+    assert np.allclose(trajectories.z[2:], [5 - 10 * 0.5**2 / 2, 0.0])
+
+
+def test_solve_trajectories_backwards():
+    trajectories = ts.solve_trajectories(0, 0, 0, [0, np.pi], 0, 1.0, MODEL)
+    assert list(trajectories.feasible) == [True, False]
+
+    with pytest.raises(AssertionError):
+        trajectory_solver_from_launcher_pos(0, 0, 0, np.pi, 0, 1.0, MODEL)
+
+
+@pytest.mark.parametrize(
+    ("j1", "j2", "j3", "target_plane"),
+    (
+        (0.1, 0.2, 1.2, 1.0),
+        (-0.3, 0.5, 1.0, 0.8),
+        (0.4, 0.0, 1.5, 1.5),
+    )
+)
+def test_trajectory_jacobian(j1, j2, j3, target_plane):
+    eps = 1e-6
+
+    numeric = np.zeros((2, 2))
+    for k, step in enumerate(([eps, 0], [0, eps])):
+        _, y1, z1 = trajectory_solver_from_joints(j1, j2 + step[0], j3 + step[1], target_plane, MODEL)
+        _, y0, z0 = trajectory_solver_from_joints(j1, j2 - step[0], j3 - step[1], target_plane, MODEL)
+        numeric[:, k] = (y1 - y0) / (2 * eps), (z1 - z0) / (2 * eps)
+
+    assert np.allclose(ts.trajectory_jacobian_from_joints(j1, j2, j3, target_plane, MODEL), numeric, atol=1e-6)
+
+
+@pytest.mark.parametrize(
+    ("x", "y", "z", "target_plane", "yp", "zp"),
+    (
+        (0.1, 0.0, 0.2, 1.0, 0.0, 0.2),
+        (0.0, 0.1, 0.3, 0.8, -0.2, 0.35),
+        (0.2, -0.1, 0.4, 0.6, 0.1, -0.3),
+    )
+)
+def test_solve_launch_angle_hits_point(x, y, z, target_plane, yp, zp):
+    model = ts.BallisticsModel(v0=3.0, g=9.82, pitch_offset=0.0)
+    angles = ts.solve_launch_angle(x, y, z, target_plane, yp, zp, model)
+
+    assert angles.feasible
+    assert angles.low < angles.high
+    assert angles.t_low < angles.t_high
+    for pitch, t in ((angles.low, angles.t_low), (angles.high, angles.t_high)):
+        trajectory = ts.solve_trajectories(x, y, z, pitch, angles.yaw, target_plane, model)
+        assert np.allclose((trajectory.y, trajectory.z, trajectory.t), (yp, zp, t))
+
+
+def test_solve_launch_angles_feasibility():
+    model = ts.BallisticsModel(v0=1.0, g=10.0, pitch_offset=0.0)
+    # The range on flat ground is V0^2 / g = 0.1 m, where both arcs meet at 45 degrees
+    angles = ts.solve_launch_angles(0, 0, 0, [-0.05, 0.05, 0.1 - 1e-12, 0.2], 0, 0, model)
+
+    assert list(angles.feasible) == [False, True, True, False]
+    assert np.isnan(angles.low[[0, 3]]).all()
+    assert np.allclose(angles.low[2], np.pi / 4, atol=1e-4) and np.allclose(angles.high[2], np.pi / 4, atol=1e-4)
+    assert np.isclose(angles.low[1] + angles.high[1], np.pi / 2)
+
+
+def test_model_matches_globals(monkeypatch):
+    monkeypatch.setattr(ts, 'V0', 3.1)
+    monkeypatch.setattr(ts, 'g', 9.0)
+    monkeypatch.setattr(ts, 'PITCH_OFFSET', -0.3)
+    expected = trajectory_solver_from_joints(0.1, 0.2, 1.2, target_plane=1.0)
+    expected_jacobian = ts.trajectory_jacobian_from_joints(0.1, 0.2, 1.2, 1.0)
+    assert ts.default_model() == ts.BallisticsModel(v0=3.1, g=9.0, pitch_offset=-0.3)
+
+    monkeypatch.setattr(ts, 'V0', 2.4)
+    monkeypatch.setattr(ts, 'g', 9.82)
+    monkeypatch.setattr(ts, 'PITCH_OFFSET', -np.deg2rad(11))
+    model = ts.BallisticsModel(v0=3.1, g=9.0, pitch_offset=-0.3)
+    assert np.allclose(trajectory_solver_from_joints(0.1, 0.2, 1.2, target_plane=1.0, model=model), expected)
+    assert np.allclose(ts.trajectory_jacobian_from_joints(0.1, 0.2, 1.2, 1.0, model=model), expected_jacobian)
+    assert ts.launcher_pitch(0.2, 1.2, model) == pytest.approx(0.2 + 1.2 - 0.3 - np.pi / 2)
+
+
+def test_solve_trajectories_sweeps_velocity():
+    v0s = np.array([2.0, 2.5, 3.0])
+    sweep = replace(MODEL, v0=v0s)
+    trajectories = ts.trajectories_from_joints(0.1, 0.2, 1.2, 1.0, model=sweep)
+
+    assert not sweep.scalar
+    assert trajectories.z.shape == (3,)
+    for i, v0 in enumerate(v0s):
+        _, y, z = trajectory_solver_from_joints(0.1, 0.2, 1.2, target_plane=1.0, model=replace(MODEL, v0=v0))
+        assert np.isclose(trajectories.y[i], y) and np.isclose(trajectories.z[i], z)